@@ -13,8 +13,10 @@ from alembic import context
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# This line sets up loggers basically. Migrations run from inside the app
+# (src/main.py migrate_database) have no config file and keep the app's logging.
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
 
 # add project directory to sys.path
 PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,44 @@
+"""create the base user and note tables
+
+The tables as they were before 0001, so `alembic upgrade head` builds the whole
+schema on an empty database (the app no longer runs db.create_all() at
+startup). Databases that already have the tables skip the creation.
+
+Revision ID: 0000_create_base_tables
+Revises: 
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0000_create_base_tables'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('username', sa.String(80), nullable=False, unique=True),
+            sa.Column('email', sa.String(120), nullable=False, unique=True),
+        )
+    if 'note' not in existing:
+        op.create_table(
+            'note',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('title', sa.String(200), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table('note')
+    op.drop_table('user')
@@ -1,7 +1,7 @@
 """add note metadata fields
 
 Revision ID: 0001_add_note_metadata_fields
-Revises: 
+Revises: 0000_create_base_tables
 Create Date: 2025-10-18 00:00:00
 """
 
@@ -10,7 +10,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '0001_add_note_metadata_fields'
-down_revision = None
+down_revision = '0000_create_base_tables'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,23 @@
+"""add (updated_at, id) index for keyset pagination
+
+Revision ID: 0002_add_note_updated_at_index
+Revises: 0001_add_note_metadata_fields
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0002_add_note_updated_at_index'
+down_revision = '0001_add_note_metadata_fields'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GET /api/notes pages through notes ordered by (updated_at, id) desc
+    op.create_index('ix_note_updated_at_id', 'note', ['updated_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_note_updated_at_id', table_name='note')
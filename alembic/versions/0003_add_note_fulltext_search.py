@@ -0,0 +1,100 @@
+"""add full-text search index for notes
+
+SQLite gets an external-content FTS5 table kept in sync by triggers.
+Postgres gets a generated, weighted tsvector column with a GIN index, plus a
+search_notes() function so Supabase clients can run ranked searches via RPC.
+
+Revision ID: 0003_add_note_fulltext_search
+Revises: 0002_add_note_updated_at_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003_add_note_fulltext_search'
+down_revision = '0002_add_note_updated_at_index'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE note_fts USING fts5(
+        title, content, content='note', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER note_fts_ai AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER note_fts_au AFTER UPDATE OF title, content ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    # index the notes that already exist
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS note_fts_au",
+    "DROP TRIGGER IF EXISTS note_fts_ad",
+    "DROP TRIGGER IF EXISTS note_fts_ai",
+    "DROP TABLE IF EXISTS note_fts",
+]
+
+POSTGRES_UPGRADE = [
+    # 'simple' config: notes are multilingual, so no language-specific stemming
+    """ALTER TABLE note ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(content, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_note_search_vector ON note USING GIN (search_vector)",
+    """CREATE OR REPLACE FUNCTION search_notes(q text, lim integer DEFAULT 50, off integer DEFAULT 0)
+    RETURNS TABLE (
+        id integer, title varchar, content text, tags text, event_date date, start_time time,
+        created_at timestamp, updated_at timestamp, rank real, snippet text
+    )
+    LANGUAGE sql STABLE AS $$
+        SELECT n.id, n.title, n.content, n.tags, n.event_date, n.start_time, n.created_at, n.updated_at,
+               hits.rank,
+               ts_headline('simple', n.content, to_tsquery('simple', q),
+                           'StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=20, MinWords=5')
+        FROM (
+            SELECT note.id, ts_rank_cd(note.search_vector, to_tsquery('simple', q)) AS rank
+            FROM note
+            WHERE note.search_vector @@ to_tsquery('simple', q)
+            ORDER BY rank DESC, note.updated_at DESC
+            LIMIT lim OFFSET off
+        ) hits
+        JOIN note n ON n.id = hits.id
+        ORDER BY hits.rank DESC, n.updated_at DESC
+    $$""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP FUNCTION IF EXISTS search_notes(text, integer, integer)",
+    "DROP INDEX IF EXISTS ix_note_search_vector",
+    "ALTER TABLE note DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements):
+    for stmt in statements:
+        op.execute(stmt)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        _run(POSTGRES_UPGRADE)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        _run(POSTGRES_DOWNGRADE)
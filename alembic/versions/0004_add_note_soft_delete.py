@@ -0,0 +1,71 @@
+"""add note.deleted_at for soft deletes and the change feed
+
+Deleted notes stay behind as tombstones so GET /api/notes/changes can tell
+clients about them. The Postgres search_notes() function and the SQLite
+full-text triggers are updated to leave tombstones out of search results.
+
+Revision ID: 0004_add_note_soft_delete
+Revises: 0003_add_note_fulltext_search
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_add_note_soft_delete'
+down_revision = '0003_add_note_fulltext_search'
+branch_labels = None
+depends_on = None
+
+
+POSTGRES_SEARCH_FUNCTION = """CREATE OR REPLACE FUNCTION search_notes(q text, lim integer DEFAULT 50, off integer DEFAULT 0)
+    RETURNS TABLE (
+        id integer, title varchar, content text, tags text, event_date date, start_time time,
+        created_at timestamp, updated_at timestamp, rank real, snippet text
+    )
+    LANGUAGE sql STABLE AS $$
+        SELECT n.id, n.title, n.content, n.tags, n.event_date, n.start_time, n.created_at, n.updated_at,
+               hits.rank,
+               ts_headline('simple', n.content, to_tsquery('simple', q),
+                           'StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=20, MinWords=5')
+        FROM (
+            SELECT note.id, ts_rank_cd(note.search_vector, to_tsquery('simple', q)) AS rank
+            FROM note
+            WHERE note.search_vector @@ to_tsquery('simple', q) AND note.deleted_at IS NULL
+            ORDER BY rank DESC, note.updated_at DESC
+            LIMIT lim OFFSET off
+        ) hits
+        JOIN note n ON n.id = hits.id
+        ORDER BY hits.rank DESC, n.updated_at DESC
+    $$"""
+
+# a soft-deleted note leaves the FTS index like a hard-deleted one
+SQLITE_SOFT_DELETE_TRIGGER = """CREATE TRIGGER note_fts_soft_delete AFTER UPDATE OF deleted_at ON note
+    WHEN old.deleted_at IS NULL AND new.deleted_at IS NOT NULL BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END"""
+
+
+def upgrade():
+    with op.batch_alter_table('note') as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(SQLITE_SOFT_DELETE_TRIGGER)
+    elif dialect == 'postgresql':
+        op.execute(POSTGRES_SEARCH_FUNCTION)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS note_fts_soft_delete")
+        # note_fts_ad (0003) sends FTS5 a 'delete' for each row; tombstones must be in the index for it
+        op.execute("""INSERT INTO note_fts(rowid, title, content)
+            SELECT id, title, content FROM note WHERE deleted_at IS NOT NULL""")
+    # tombstones have nowhere to go once the column is gone
+    op.execute("DELETE FROM note WHERE deleted_at IS NOT NULL")
+    with op.batch_alter_table('note') as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,55 @@
+"""add note.version for optimistic concurrency
+
+Every write bumps the version. PATCH /api/notes/<id> only applies when the
+client's version matches. On Postgres a trigger bumps the version for writers
+that don't set it themselves (e.g. plain PostgREST updates).
+
+Revision ID: 0005_add_note_version
+Revises: 0004_add_note_soft_delete
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_add_note_version'
+down_revision = '0004_add_note_soft_delete'
+branch_labels = None
+depends_on = None
+
+
+POSTGRES_UPGRADE = [
+    """CREATE OR REPLACE FUNCTION note_bump_version() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF NEW.version IS NOT DISTINCT FROM OLD.version THEN
+            NEW.version := OLD.version + 1;
+        END IF;
+        RETURN NEW;
+    END
+    $$""",
+    """CREATE TRIGGER note_bump_version BEFORE UPDATE ON note
+    FOR EACH ROW EXECUTE FUNCTION note_bump_version()""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS note_bump_version ON note",
+    "DROP FUNCTION IF EXISTS note_bump_version()",
+]
+
+
+def upgrade():
+    with op.batch_alter_table('note') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    if op.get_bind().dialect.name == 'postgresql':
+        for stmt in POSTGRES_UPGRADE:
+            op.execute(stmt)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for stmt in POSTGRES_DOWNGRADE:
+            op.execute(stmt)
+    with op.batch_alter_table('note') as batch_op:
+        batch_op.drop_column('version')
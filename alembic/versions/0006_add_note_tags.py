@@ -0,0 +1,186 @@
+"""add normalized tag and note_tag tables
+
+Note.tags stays the JSON array the API reads and writes. Database triggers
+mirror it into tag (one row per distinct name, lowercased and trimmed) and
+note_tag (one row per live note and tag), so every writer keeps them current:
+the SQL store, bulk batches and plain PostgREST updates from Supabase. Notes
+that are soft-deleted leave note_tag. Existing notes are backfilled here.
+
+On Postgres, notes_by_tags() and tag_counts() let Supabase clients run the
+tag filter and facet counts through RPC.
+
+Revision ID: 0006_add_note_tags
+Revises: 0005_add_note_version
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_add_note_tags'
+down_revision = '0005_add_note_version'
+branch_labels = None
+depends_on = None
+
+
+# the distinct tag names of a live note row, from its JSON tags (invalid JSON counts as no tags)
+_SQLITE_NAMES = """SELECT DISTINCT lower(trim(value)) FROM json_each(CASE WHEN json_valid({row}.tags) THEN {row}.tags END)
+            WHERE {row}.deleted_at IS NULL AND json_each.type = 'text' AND trim(value) <> ''"""
+
+
+def _sqlite_link(row):
+    names = _SQLITE_NAMES.format(row=row)
+    return f"""INSERT OR IGNORE INTO tag(name) {names};
+        INSERT OR IGNORE INTO note_tag(note_id, tag_id) SELECT {row}.id, tag.id FROM tag WHERE tag.name IN ({names});"""
+
+
+SQLITE_UPGRADE = [
+    f"""CREATE TRIGGER note_tag_ai AFTER INSERT ON note BEGIN
+        {_sqlite_link('new')}
+    END""",
+    f"""CREATE TRIGGER note_tag_au AFTER UPDATE OF tags, deleted_at ON note BEGIN
+        DELETE FROM note_tag WHERE note_id = old.id;
+        {_sqlite_link('new')}
+    END""",
+    # foreign keys are not enforced on SQLite by default, so ON DELETE CASCADE can't be relied on
+    """CREATE TRIGGER note_tag_ad AFTER DELETE ON note BEGIN
+        DELETE FROM note_tag WHERE note_id = old.id;
+    END""",
+    # backfill
+    """INSERT OR IGNORE INTO tag(name)
+        SELECT DISTINCT lower(trim(j.value)) FROM note, json_each(CASE WHEN json_valid(note.tags) THEN note.tags END) j
+        WHERE note.deleted_at IS NULL AND j.type = 'text' AND trim(j.value) <> ''""",
+    """INSERT OR IGNORE INTO note_tag(note_id, tag_id)
+        SELECT note.id, tag.id FROM note, json_each(CASE WHEN json_valid(note.tags) THEN note.tags END) j
+        JOIN tag ON tag.name = lower(trim(j.value))
+        WHERE note.deleted_at IS NULL AND j.type = 'text'""",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS note_tag_ad",
+    "DROP TRIGGER IF EXISTS note_tag_au",
+    "DROP TRIGGER IF EXISTS note_tag_ai",
+]
+
+POSTGRES_UPGRADE = [
+    """CREATE OR REPLACE FUNCTION note_tag_names(tags text) RETURNS SETOF text
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        parsed json;
+    BEGIN
+        BEGIN
+            parsed := tags::json;
+        EXCEPTION WHEN others THEN
+            RETURN;
+        END;
+        IF parsed IS NULL OR json_typeof(parsed) <> 'array' THEN
+            RETURN;
+        END IF;
+        RETURN QUERY SELECT DISTINCT lower(btrim(e.value #>> '{}')) FROM json_array_elements(parsed) e
+            WHERE json_typeof(e.value) = 'string' AND btrim(e.value #>> '{}') <> '';
+    END
+    $$""",
+    """CREATE OR REPLACE FUNCTION note_sync_tags() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' THEN
+            IF NEW.tags IS NOT DISTINCT FROM OLD.tags AND NEW.deleted_at IS NOT DISTINCT FROM OLD.deleted_at THEN
+                RETURN NULL;
+            END IF;
+            DELETE FROM note_tag WHERE note_id = OLD.id;
+        END IF;
+        IF NEW.deleted_at IS NULL THEN
+            INSERT INTO tag(name) SELECT note_tag_names(NEW.tags) ON CONFLICT (name) DO NOTHING;
+            INSERT INTO note_tag(note_id, tag_id)
+                SELECT NEW.id, tag.id FROM tag WHERE tag.name IN (SELECT note_tag_names(NEW.tags))
+                ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END
+    $$""",
+    """CREATE TRIGGER note_sync_tags AFTER INSERT OR UPDATE OF tags, deleted_at ON note
+    FOR EACH ROW EXECUTE FUNCTION note_sync_tags()""",
+    # backfill
+    """INSERT INTO tag(name)
+        SELECT DISTINCT note_tag_names(tags) FROM note WHERE deleted_at IS NULL
+        ON CONFLICT (name) DO NOTHING""",
+    """INSERT INTO note_tag(note_id, tag_id)
+        SELECT n.id, tag.id FROM note n CROSS JOIN LATERAL note_tag_names(n.tags) AS t(name)
+        JOIN tag ON tag.name = t.name
+        WHERE n.deleted_at IS NULL
+        ON CONFLICT DO NOTHING""",
+    # live notes carrying every (match_any: any) of the given tags, newest first, after a keyset cursor
+    """CREATE OR REPLACE FUNCTION notes_by_tags(
+        tag_names text[], match_any boolean DEFAULT false, lim integer DEFAULT NULL,
+        after_updated_at timestamp DEFAULT NULL, after_id integer DEFAULT NULL
+    ) RETURNS SETOF note
+    LANGUAGE sql STABLE AS $$
+        SELECT n.* FROM note n
+        WHERE n.deleted_at IS NULL
+          AND n.id IN (
+            SELECT nt.note_id FROM note_tag nt JOIN tag t ON t.id = nt.tag_id
+            WHERE t.name = ANY(tag_names)
+            GROUP BY nt.note_id
+            HAVING match_any OR count(*) = (SELECT count(DISTINCT x) FROM unnest(tag_names) x)
+          )
+          AND (after_updated_at IS NULL
+               OR n.updated_at < after_updated_at
+               OR (n.updated_at = after_updated_at AND n.id < after_id))
+        ORDER BY n.updated_at DESC, n.id DESC
+        LIMIT lim
+    $$""",
+    """CREATE OR REPLACE FUNCTION tag_counts() RETURNS TABLE (tag text, count bigint)
+    LANGUAGE sql STABLE AS $$
+        SELECT t.name::text, count(*) FROM note_tag nt JOIN tag t ON t.id = nt.tag_id
+        GROUP BY t.name
+        ORDER BY count(*) DESC, t.name
+    $$""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP FUNCTION IF EXISTS tag_counts()",
+    "DROP FUNCTION IF EXISTS notes_by_tags(text[], boolean, integer, timestamp, integer)",
+    "DROP TRIGGER IF EXISTS note_sync_tags ON note",
+    "DROP FUNCTION IF EXISTS note_sync_tags()",
+    "DROP FUNCTION IF EXISTS note_tag_names(text)",
+]
+
+
+def _run(statements):
+    for stmt in statements:
+        op.execute(stmt)
+
+
+def upgrade():
+    op.create_table(
+        'tag',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+    )
+    op.create_index('ux_tag_name', 'tag', ['name'], unique=True)
+    op.create_table(
+        'note_tag',
+        sa.Column('note_id', sa.Integer(), sa.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('tag_id', sa.Integer(), sa.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    )
+    # the primary key serves lookups by note; this one serves lookups and counts by tag
+    op.create_index('ix_note_tag_tag_id_note_id', 'note_tag', ['tag_id', 'note_id'])
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        _run(POSTGRES_UPGRADE)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        _run(POSTGRES_DOWNGRADE)
+    op.drop_index('ix_note_tag_tag_id_note_id', table_name='note_tag')
+    op.drop_table('note_tag')
+    op.drop_index('ux_tag_name', table_name='tag')
+    op.drop_table('tag')
@@ -0,0 +1,39 @@
+"""add agenda index over (event_date, start_time, id)
+
+GET /api/notes/agenda walks live notes that have an event_date in
+(event_date, start_time, id) order, untimed notes last within a day. The
+index is partial, so notes without a date and tombstones take no space in it,
+and a page is one index range scan that starts at the cursor.
+
+Postgres sorts NULLs last in ascending order, matching a plain index. SQLite
+sorts them first, so there the index leads with `start_time IS NULL` and the
+SQL store orders by the same expression.
+
+Revision ID: 0007_add_note_agenda_index
+Revises: 0006_add_note_tags
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_add_note_agenda_index'
+down_revision = '0006_add_note_tags'
+branch_labels = None
+depends_on = None
+
+AGENDA_WHERE = sa.text('event_date IS NOT NULL AND deleted_at IS NULL')
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        columns = ['event_date', sa.text('(start_time IS NULL)'), 'start_time', 'id']
+    else:
+        columns = ['event_date', 'start_time', 'id']
+    op.create_index('ix_note_agenda', 'note', columns,
+                    sqlite_where=AGENDA_WHERE, postgresql_where=AGENDA_WHERE)
+
+
+def downgrade():
+    op.drop_index('ix_note_agenda', table_name='note')
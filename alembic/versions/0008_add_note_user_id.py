@@ -0,0 +1,227 @@
+"""add note.user_id and scope the note indexes by owner
+
+Every note belongs to one user, or to nobody (user_id IS NULL) for notes written
+without an X-User-Id header, which is what all existing notes become. Every read
+filters on the owner, so the indexes lead with user_id and a request scans only
+its owner's range:
+
+- ix_note_user_id_updated_at_id replaces ix_note_updated_at_id (lists, change feed)
+- ix_note_agenda is rebuilt as (user_id, event_date, ...)
+- note_tag gets a copy of the note's user_id, filled in by the tag triggers, with
+  (tag_id, user_id, note_id) for tag filters and (user_id, tag_id) for tag counts
+
+On SQLite the columns are added with plain ALTER TABLE: a batch (copy and move)
+migration would drop the full-text, tag and version triggers defined on note.
+The Postgres RPC functions notes_by_tags(), tag_counts() and search_notes() take
+an owner_id argument (NULL: notes without an owner).
+
+Revision ID: 0008_add_note_user_id
+Revises: 0007_add_note_agenda_index
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_add_note_user_id'
+down_revision = '0007_add_note_agenda_index'
+branch_labels = None
+depends_on = None
+
+AGENDA_WHERE = sa.text('event_date IS NOT NULL AND deleted_at IS NULL')
+
+
+# same names query as alembic 0006
+_SQLITE_NAMES = """SELECT DISTINCT lower(trim(value)) FROM json_each(CASE WHEN json_valid({row}.tags) THEN {row}.tags END)
+            WHERE {row}.deleted_at IS NULL AND json_each.type = 'text' AND trim(value) <> ''"""
+
+
+def _sqlite_link(row, with_owner):
+    names = _SQLITE_NAMES.format(row=row)
+    if with_owner:
+        link = f"""INSERT OR IGNORE INTO note_tag(note_id, tag_id, user_id)
+            SELECT {row}.id, tag.id, {row}.user_id FROM tag WHERE tag.name IN ({names});"""
+    else:
+        link = f"""INSERT OR IGNORE INTO note_tag(note_id, tag_id)
+            SELECT {row}.id, tag.id FROM tag WHERE tag.name IN ({names});"""
+    return f"""INSERT OR IGNORE INTO tag(name) {names};
+        {link}"""
+
+
+def _sqlite_triggers(with_owner):
+    columns = 'tags, deleted_at, user_id' if with_owner else 'tags, deleted_at'
+    return [
+        "DROP TRIGGER IF EXISTS note_tag_ai",
+        "DROP TRIGGER IF EXISTS note_tag_au",
+        f"""CREATE TRIGGER note_tag_ai AFTER INSERT ON note BEGIN
+            {_sqlite_link('new', with_owner)}
+        END""",
+        f"""CREATE TRIGGER note_tag_au AFTER UPDATE OF {columns} ON note BEGIN
+            DELETE FROM note_tag WHERE note_id = old.id;
+            {_sqlite_link('new', with_owner)}
+        END""",
+    ]
+
+
+# owner_id = NULL selects the notes without an owner; each call is planned with the
+# argument's value, so this reduces to one index condition
+_OWNED = '({col} = owner_id OR (owner_id IS NULL AND {col} IS NULL))'
+
+
+def _postgres_functions(with_owner):
+    owner_param = 'owner_id integer DEFAULT NULL' if with_owner else ''
+    owner_arg = f', {owner_param}' if with_owner else ''
+    owned_note = f' AND {_OWNED.format(col="n.user_id")}' if with_owner else ''
+    owned_link = f' AND {_OWNED.format(col="nt.user_id")}' if with_owner else ''
+    owned_search = f' AND {_OWNED.format(col="note.user_id")}' if with_owner else ''
+    owner_insert = ('INSERT INTO note_tag(note_id, tag_id, user_id) SELECT NEW.id, tag.id, NEW.user_id'
+                    if with_owner else 'INSERT INTO note_tag(note_id, tag_id) SELECT NEW.id, tag.id')
+    owner_changed = ' AND NEW.user_id IS NOT DISTINCT FROM OLD.user_id' if with_owner else ''
+    owned_counts = f'WHERE {_OWNED.format(col="nt.user_id")}' if with_owner else ''
+    trigger_columns = 'tags, deleted_at, user_id' if with_owner else 'tags, deleted_at'
+    return [
+        f"""CREATE OR REPLACE FUNCTION note_sync_tags() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' THEN
+                IF NEW.tags IS NOT DISTINCT FROM OLD.tags
+                   AND NEW.deleted_at IS NOT DISTINCT FROM OLD.deleted_at{owner_changed} THEN
+                    RETURN NULL;
+                END IF;
+                DELETE FROM note_tag WHERE note_id = OLD.id;
+            END IF;
+            IF NEW.deleted_at IS NULL THEN
+                INSERT INTO tag(name) SELECT note_tag_names(NEW.tags) ON CONFLICT (name) DO NOTHING;
+                {owner_insert} FROM tag WHERE tag.name IN (SELECT note_tag_names(NEW.tags))
+                    ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$""",
+        "DROP TRIGGER IF EXISTS note_sync_tags ON note",
+        f"""CREATE TRIGGER note_sync_tags AFTER INSERT OR UPDATE OF {trigger_columns} ON note
+        FOR EACH ROW EXECUTE FUNCTION note_sync_tags()""",
+        f"""CREATE OR REPLACE FUNCTION notes_by_tags(
+            tag_names text[], match_any boolean DEFAULT false, lim integer DEFAULT NULL,
+            after_updated_at timestamp DEFAULT NULL, after_id integer DEFAULT NULL{owner_arg}
+        ) RETURNS SETOF note
+        LANGUAGE sql STABLE AS $$
+            SELECT n.* FROM note n
+            WHERE n.deleted_at IS NULL{owned_note}
+              AND n.id IN (
+                SELECT nt.note_id FROM note_tag nt JOIN tag t ON t.id = nt.tag_id
+                WHERE t.name = ANY(tag_names){owned_link}
+                GROUP BY nt.note_id
+                HAVING match_any OR count(*) = (SELECT count(DISTINCT x) FROM unnest(tag_names) x)
+              )
+              AND (after_updated_at IS NULL
+                   OR n.updated_at < after_updated_at
+                   OR (n.updated_at = after_updated_at AND n.id < after_id))
+            ORDER BY n.updated_at DESC, n.id DESC
+            LIMIT lim
+        $$""",
+        f"""CREATE OR REPLACE FUNCTION tag_counts({owner_param}) RETURNS TABLE (tag text, count bigint)
+        LANGUAGE sql STABLE AS $$
+            SELECT t.name::text, count(*) FROM note_tag nt JOIN tag t ON t.id = nt.tag_id
+            {owned_counts}
+            GROUP BY t.name
+            ORDER BY count(*) DESC, t.name
+        $$""",
+        f"""CREATE OR REPLACE FUNCTION search_notes(q text, lim integer DEFAULT 50, off integer DEFAULT 0{owner_arg})
+        RETURNS TABLE (
+            id integer, title varchar, content text, tags text, event_date date, start_time time,
+            created_at timestamp, updated_at timestamp, rank real, snippet text
+        )
+        LANGUAGE sql STABLE AS $$
+            SELECT n.id, n.title, n.content, n.tags, n.event_date, n.start_time, n.created_at, n.updated_at,
+                   hits.rank,
+                   ts_headline('simple', n.content, to_tsquery('simple', q),
+                               'StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=20, MinWords=5')
+            FROM (
+                SELECT note.id, ts_rank_cd(note.search_vector, to_tsquery('simple', q)) AS rank
+                FROM note
+                WHERE note.search_vector @@ to_tsquery('simple', q) AND note.deleted_at IS NULL{owned_search}
+                ORDER BY rank DESC, note.updated_at DESC
+                LIMIT lim OFFSET off
+            ) hits
+            JOIN note n ON n.id = hits.id
+            ORDER BY hits.rank DESC, n.updated_at DESC
+        $$""",
+    ]
+
+
+# the argument lists change, so the functions are dropped rather than replaced
+POSTGRES_DROP_OLD = [
+    "DROP FUNCTION IF EXISTS notes_by_tags(text[], boolean, integer, timestamp, integer)",
+    "DROP FUNCTION IF EXISTS tag_counts()",
+    "DROP FUNCTION IF EXISTS search_notes(text, integer, integer)",
+]
+
+POSTGRES_DROP_NEW = [
+    "DROP FUNCTION IF EXISTS notes_by_tags(text[], boolean, integer, timestamp, integer, integer)",
+    "DROP FUNCTION IF EXISTS tag_counts(integer)",
+    "DROP FUNCTION IF EXISTS search_notes(text, integer, integer, integer)",
+]
+
+
+def _run(statements):
+    for stmt in statements:
+        op.execute(stmt)
+
+
+def _agenda_columns(dialect, with_owner):
+    # see alembic 0007 for the SQLite IS NULL flag
+    columns = ['event_date', sa.text('(start_time IS NULL)'), 'start_time', 'id'] if dialect == 'sqlite' else \
+        ['event_date', 'start_time', 'id']
+    return ['user_id'] + columns if with_owner else columns
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('ALTER TABLE note ADD COLUMN user_id INTEGER REFERENCES "user" (id) ON DELETE CASCADE')
+    else:
+        op.add_column('note', sa.Column('user_id', sa.Integer(),
+                                        sa.ForeignKey('user.id', name='fk_note_user_id', ondelete='CASCADE'),
+                                        nullable=True))
+    # existing notes have no owner, so neither do their note_tag rows: nothing to backfill
+    op.add_column('note_tag', sa.Column('user_id', sa.Integer(), nullable=True))
+
+    op.drop_index('ix_note_updated_at_id', table_name='note')
+    op.create_index('ix_note_user_id_updated_at_id', 'note', ['user_id', 'updated_at', 'id'])
+    op.drop_index('ix_note_agenda', table_name='note')
+    op.create_index('ix_note_agenda', 'note', _agenda_columns(dialect, True),
+                    sqlite_where=AGENDA_WHERE, postgresql_where=AGENDA_WHERE)
+    op.drop_index('ix_note_tag_tag_id_note_id', table_name='note_tag')
+    op.create_index('ix_note_tag_tag_id_user_id_note_id', 'note_tag', ['tag_id', 'user_id', 'note_id'])
+    op.create_index('ix_note_tag_user_id_tag_id', 'note_tag', ['user_id', 'tag_id'])
+
+    if dialect == 'sqlite':
+        _run(_sqlite_triggers(with_owner=True))
+    elif dialect == 'postgresql':
+        _run(POSTGRES_DROP_OLD)
+        _run(_postgres_functions(with_owner=True))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _run(_sqlite_triggers(with_owner=False))
+    elif dialect == 'postgresql':
+        _run(POSTGRES_DROP_NEW)
+        _run(_postgres_functions(with_owner=False))
+
+    op.drop_index('ix_note_tag_user_id_tag_id', table_name='note_tag')
+    op.drop_index('ix_note_tag_tag_id_user_id_note_id', table_name='note_tag')
+    op.create_index('ix_note_tag_tag_id_note_id', 'note_tag', ['tag_id', 'note_id'])
+    op.drop_index('ix_note_agenda', table_name='note')
+    op.create_index('ix_note_agenda', 'note', _agenda_columns(dialect, False),
+                    sqlite_where=AGENDA_WHERE, postgresql_where=AGENDA_WHERE)
+    op.drop_index('ix_note_user_id_updated_at_id', table_name='note')
+    op.create_index('ix_note_updated_at_id', 'note', ['updated_at', 'id'])
+    # SQLite 3.35+ drops a column in place, leaving the note triggers alone
+    op.execute('ALTER TABLE note_tag DROP COLUMN user_id')
+    if dialect != 'sqlite':
+        op.drop_constraint('fk_note_user_id', 'note', type_='foreignkey')
+    op.execute('ALTER TABLE note DROP COLUMN user_id')
@@ -0,0 +1,70 @@
+"""keep tombstones out of the SQLite full-text triggers
+
+Since 0004 a soft delete removes the note from note_fts (note_fts_soft_delete),
+but note_fts_ad and note_fts_au still sent FTS5 a 'delete' for every row, so a
+hard DELETE of a tombstone (deleting a user, the 0004 downgrade) or an update
+of one deleted a row the index no longer held and corrupted it ("database disk
+image is malformed" on every search afterwards). Both triggers now skip
+tombstones, and the index is rebuilt from the live notes to repair databases
+that already hit this.
+
+Postgres has a generated tsvector column instead of triggers: nothing to do.
+
+Revision ID: 0009_fix_note_fts_tombstones
+Revises: 0008_add_note_user_id
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0009_fix_note_fts_tombstones'
+down_revision = '0008_add_note_user_id'
+branch_labels = None
+depends_on = None
+
+SQLITE_UPGRADE = [
+    "DROP TRIGGER IF EXISTS note_fts_ad",
+    "DROP TRIGGER IF EXISTS note_fts_au",
+    """CREATE TRIGGER note_fts_ad AFTER DELETE ON note WHEN old.deleted_at IS NULL BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    # a tombstone is not in the index: nothing to take out, nothing to put back
+    """CREATE TRIGGER note_fts_au AFTER UPDATE OF title, content ON note
+    WHEN old.deleted_at IS NULL AND new.deleted_at IS NULL BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    # 'rebuild' indexes every row of note, tombstones included; take those out again
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+    """INSERT INTO note_fts(note_fts, rowid, title, content)
+        SELECT 'delete', id, title, content FROM note WHERE deleted_at IS NOT NULL""",
+]
+
+# the 0003 triggers
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS note_fts_ad",
+    "DROP TRIGGER IF EXISTS note_fts_au",
+    """CREATE TRIGGER note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER note_fts_au AFTER UPDATE OF title, content ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+
+def _run(statements):
+    for stmt in statements:
+        op.execute(stmt)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _run(SQLITE_UPGRADE)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _run(SQLITE_DOWNGRADE)
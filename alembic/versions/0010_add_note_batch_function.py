@@ -0,0 +1,105 @@
+"""add apply_note_batch() so Supabase batches run in one transaction
+
+POST /api/notes/batch on the Supabase backend used to be three PostgREST
+requests, and its updates read whole rows and upserted them back: the upsert
+wrote the generated search_vector column (which Postgres rejects), lost edits
+made between the read and the write, and skipped the version bump. The
+function applies the creates, the updates and the soft deletes of a batch in
+one call, so in one transaction. Updates change only the keys they carry, in
+place, so the note_bump_version trigger (alembic 0005) bumps each note's
+version. Everything is scoped to owner_id like the functions of alembic 0008.
+
+Returns {"created": [...], "updated": [...]}: the created notes in input
+order (ids are handed out in that order) and the updated ones, as note rows
+without search_vector, deleted_at and user_id.
+
+SQLite has no PostgREST in front of it: the SQL store runs its batch in one
+session transaction.
+
+Revision ID: 0010_add_note_batch_function
+Revises: 0009_fix_note_fts_tombstones
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0010_add_note_batch_function'
+down_revision = '0009_fix_note_fts_tombstones'
+branch_labels = None
+depends_on = None
+
+# see alembic 0008
+_OWNED = '(note.user_id = owner_id OR (owner_id IS NULL AND note.user_id IS NULL))'
+
+
+def _changed(column, cast=''):
+    return f"{column} = CASE WHEN input.f ? '{column}' THEN (input.f->>'{column}'){cast} ELSE note.{column} END"
+
+
+POSTGRES_UPGRADE = [
+    f"""CREATE OR REPLACE FUNCTION apply_note_batch(
+        creates jsonb DEFAULT '[]', updates jsonb DEFAULT '[]', deletes integer[] DEFAULT '{{}}',
+        owner_id integer DEFAULT NULL
+    ) RETURNS jsonb
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        ts timestamp := now() AT TIME ZONE 'utc';
+        created jsonb;
+        updated jsonb;
+    BEGIN
+        WITH inserted AS (
+            INSERT INTO note (title, content, tags, event_date, start_time, created_at, updated_at, user_id)
+            SELECT input.f->>'title', input.f->>'content', input.f->>'tags', (input.f->>'event_date')::date,
+                   (input.f->>'start_time')::time, ts, ts, owner_id
+            FROM jsonb_array_elements(creates) WITH ORDINALITY AS input(f, n)
+            ORDER BY input.n
+            RETURNING note.*
+        )
+        SELECT coalesce(jsonb_agg(to_jsonb(inserted) - 'search_vector' - 'deleted_at' - 'user_id'
+                                  ORDER BY inserted.id), '[]'::jsonb)
+        INTO created FROM inserted;
+
+        WITH input AS (
+            SELECT (u.f->>'id')::integer AS id, u.f FROM jsonb_array_elements(updates) AS u(f)
+        ), changed AS (
+            UPDATE note SET
+                {_changed('title')},
+                {_changed('content')},
+                {_changed('tags')},
+                {_changed('event_date', '::date')},
+                {_changed('start_time', '::time')},
+                updated_at = ts
+            FROM input
+            WHERE note.id = input.id AND note.deleted_at IS NULL AND {_OWNED}
+            RETURNING note.*
+        )
+        SELECT coalesce(jsonb_agg(to_jsonb(changed) - 'search_vector' - 'deleted_at' - 'user_id'), '[]'::jsonb)
+        INTO updated FROM changed;
+
+        UPDATE note SET deleted_at = ts, updated_at = ts
+        WHERE note.id = ANY(deletes) AND note.deleted_at IS NULL AND {_OWNED};
+
+        RETURN jsonb_build_object('created', created, 'updated', updated);
+    END
+    $$""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP FUNCTION IF EXISTS apply_note_batch(jsonb, jsonb, integer[], integer)",
+]
+
+
+def _run(statements):
+    for stmt in statements:
+        op.execute(stmt)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _run(POSTGRES_UPGRADE)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _run(POSTGRES_DOWNGRADE)
@@ -0,0 +1,69 @@
+"""return the note version from search_notes()
+
+Search hits are note dicts like every other read, and clients PATCH them with
+the version they hold, but the search_notes() function of 0008 left version
+out of its result table, so Supabase hits had none while SQL hits did. The
+result type changes, so the function is dropped and created again.
+
+SQLite searches note_fts from the SQL store and reads the whole note: nothing
+to do.
+
+Revision ID: 0011_add_search_notes_version
+Revises: 0010_add_note_batch_function
+Create Date: 2026-10-17 00:00:00
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0011_add_search_notes_version'
+down_revision = '0010_add_note_batch_function'
+branch_labels = None
+depends_on = None
+
+# see alembic 0008
+_OWNED = '(note.user_id = owner_id OR (owner_id IS NULL AND note.user_id IS NULL))'
+
+
+def _search_function(with_version):
+    version_column = ' version integer,' if with_version else ''
+    version_value = ' n.version,' if with_version else ''
+    return f"""CREATE FUNCTION search_notes(q text, lim integer DEFAULT 50, off integer DEFAULT 0,
+                                       owner_id integer DEFAULT NULL)
+    RETURNS TABLE (
+        id integer, title varchar, content text, tags text, event_date date, start_time time,
+        created_at timestamp, updated_at timestamp,{version_column} rank real, snippet text
+    )
+    LANGUAGE sql STABLE AS $$
+        SELECT n.id, n.title, n.content, n.tags, n.event_date, n.start_time, n.created_at, n.updated_at,{version_value}
+               hits.rank,
+               ts_headline('simple', n.content, to_tsquery('simple', q),
+                           'StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=20, MinWords=5')
+        FROM (
+            SELECT note.id, ts_rank_cd(note.search_vector, to_tsquery('simple', q)) AS rank
+            FROM note
+            WHERE note.search_vector @@ to_tsquery('simple', q) AND note.deleted_at IS NULL AND {_OWNED}
+            ORDER BY rank DESC, note.updated_at DESC
+            LIMIT lim OFFSET off
+        ) hits
+        JOIN note n ON n.id = hits.id
+        ORDER BY hits.rank DESC, n.updated_at DESC
+    $$"""
+
+
+_DROP = "DROP FUNCTION IF EXISTS search_notes(text, integer, integer, integer)"
+
+
+def _run(statements):
+    for stmt in statements:
+        op.execute(stmt)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _run([_DROP, _search_function(True)])
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        _run([_DROP, _search_function(False)])
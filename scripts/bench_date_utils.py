@@ -0,0 +1,349 @@
+"""Benchmark and golden check for src/utils/date_utils.py.
+
+The date/time parser used to rebuild its tables and run a long chain of regex
+searches on every call. This script keeps a frozen copy of that original
+implementation (the legacy_* functions below) and checks that the compiled
+engine returns exactly the same results on a golden corpus, for several
+reference days, before timing both.
+
+Usage:
+  python scripts/bench_date_utils.py            # golden check + timings
+  python scripts/bench_date_utils.py --check    # golden check only
+
+Exits with status 1 if any output differs.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+import os
+from datetime import datetime, date as date_cls, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import date_utils  # noqa: E402
+
+# reference days: every weekday, a month end, a year end and a leap day
+DAYS = [date_cls(2025, 10, 13) + timedelta(days=i) for i in range(7)] + \
+       [date_cls(2025, 1, 31), date_cls(2025, 12, 31), date_cls(2028, 2, 29)]
+
+DATE_FIELDS = [
+    '', ' ', None, '2025-10-20', '2025 - 10 - 20', ' 2025-10-20T09:30:00 ', '20251020', '2025-W42-1', '2025-1-5',
+    'tomorrow', 'Tomorrow.', 'tmr', 'tomorow', '明天', '明天。', 'yesterday', 'yday', '昨天', 'today', 'tonight', '今天',
+    'in 2 days', 'in 10 days time', 'within 3 days', 'in  1 day', 'next monday', 'Next Friday!', 'next sunday',
+    'monday', 'Sunday', 'mondays', 'this monday', '周一', '周日', '星期三', '星期天', '下周五', '星期二和周四', '周三星期一',
+    'on 20 Oct', 'on 1st jan', 'on 31 feb', 'on 3rd sept', 'on 12dec', 'on 123 oct', 'meet on 5 may',
+    '20/10/2025', '20-10-2025', '2025/10/20', '5/1/2025', ' 5/ 1/2025', '31/02/2025', '2025/13/01',
+    'soon', 'whenever', 'Oct 20', '20 October', '１２/１０/２０２５', '２０２５-１０-２０', "'friday'", 'FRIDAY',
+]
+TIME_FIELDS = [
+    '', None, '17:00', '5:30', '5pm', '5 PM', '5:30pm', '12am', '12pm', '12:15 a.m.', '1730', '0900', '25:99',
+    'noon', '7', '07:5', ' 09:00. ', '１７:００', '5.30pm',
+]
+PROMPTS = [
+    'Badminton tmr 5pm @polyu', 'Lunch 12:30pm tomorrow', 'Get up tomorrow 7am', 'dentist next monday 9:15am',
+    'call mom on 20 oct', 'team sync in 3 days at 10:00', 'party saturday 8pm', 'mondays are for planning',
+    'sundayday', 'todays plan', 'yesterdays news', 'the tmrw plan', '明天下午3点开会', '周五晚上聚会', '星期天去爬山',
+    '星期三和周一', 'holiday in 2 days', 'on 31 feb meet', 'on 3 sept', 'meeting at 14:00 or 3pm', '123:45 deadline',
+    'no date here at all', '', 'Tonight 8PM dinner', 'thursday and tuesday', 'friday-ish', 'next  wednesday 7 am',
+    '会议在今天', '昨天的记录', 'within 5 days by 6pm', '５pm run', 'We meet on 1st jan and on 2nd feb',
+]
+WORDS = ['meet', 'the', 'team', 'on', 'in', 'next', 'day', 'days', 'tmr', 'today', 'monday', 'sunday', 'yday',
+         '5pm', '10:30', '3', 'oct', 'sept', '周三', '星期天', '明天', 'at', 'lunch', 'tonight', 'holiday', '@polyu']
+
+
+def golden_corpus(seed=42, size=3000):
+    rng = random.Random(seed)
+    texts = list(PROMPTS)
+    for _ in range(size):
+        texts.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))))
+    fields = list(DATE_FIELDS) + [rng.choice(WORDS) + rng.choice(['', ' ', '.']) for _ in range(500)]
+    return texts, fields
+
+
+def check():
+    texts, fields = golden_corpus()
+    mismatches = []
+    for today in DAYS:
+        for value in fields:
+            expected, got = legacy_normalize_date(value, today), date_utils.normalize_date(value, today)
+            if expected != got:
+                mismatches.append(('normalize_date', today, value, expected, got))
+        batch = date_utils.normalize_many(fields, 'date', today)
+        if batch != [legacy_normalize_date(v, today) for v in fields]:
+            mismatches.append(('normalize_many', today, '<fields>', None, None))
+        for text in texts:
+            expected, got = legacy_extract_date_from_text(text, today), date_utils.extract_date_from_text(text, today)
+            if expected != got:
+                mismatches.append(('extract_date_from_text', today, text, expected, got))
+    for value in TIME_FIELDS + texts:
+        if legacy_normalize_time(value) != date_utils.normalize_time(value):
+            mismatches.append(('normalize_time', None, value, legacy_normalize_time(value), date_utils.normalize_time(value)))
+    for text in texts:
+        if legacy_extract_time_from_text(text) != date_utils.extract_time_from_text(text):
+            mismatches.append(('extract_time_from_text', None, text, legacy_extract_time_from_text(text),
+                               date_utils.extract_time_from_text(text)))
+    for m in mismatches[:20]:
+        print('MISMATCH', m)
+    total = len(DAYS) * (len(fields) + len(texts)) + len(TIME_FIELDS) + 2 * len(texts)
+    print(f'golden corpus: {total} cases, {len(mismatches)} mismatches')
+    return not mismatches
+
+
+def timed(fn, items, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench():
+    texts, fields = golden_corpus()
+    today = date_cls.today()
+    long_notes = [' '.join(texts[i:i + 60]) * 3 for i in range(0, 600, 60)]
+    plain_notes = ['Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40] * 10
+    # an import column: few distinct values, many rows
+    column = [random.Random(1).choice(DATE_FIELDS[1:40]) for _ in range(20000)]
+    cases = [
+        ('normalize_date (fields)', lambda xs: [legacy_normalize_date(x, today) for x in xs],
+         lambda xs: [date_utils.normalize_date(x) for x in xs], fields * 5),
+        ('normalize_date (cold cache)', lambda xs: [legacy_normalize_date(x, today) for x in xs],
+         lambda xs: date_utils._normalize_date.cache_clear() or [date_utils.normalize_date(x) for x in xs], fields),
+        ('normalize_many (20k-row column)', lambda xs: [legacy_normalize_date(x, today) for x in xs],
+         lambda xs: date_utils.normalize_many(xs), column),
+        ('extract_date_from_text (prompts)', lambda xs: [legacy_extract_date_from_text(x, today) for x in xs],
+         lambda xs: [date_utils.extract_date_from_text(x) for x in xs], texts),
+        ('extract_date_from_text (long notes)', lambda xs: [legacy_extract_date_from_text(x, today) for x in xs],
+         lambda xs: [date_utils.extract_date_from_text(x) for x in xs], long_notes * 10),
+        ('extract_date_from_text (no dates)', lambda xs: [legacy_extract_date_from_text(x, today) for x in xs],
+         lambda xs: [date_utils.extract_date_from_text(x) for x in xs], plain_notes * 10),
+        ('extract_time_from_text (prompts)', lambda xs: [legacy_extract_time_from_text(x) for x in xs],
+         lambda xs: [date_utils.extract_time_from_text(x) for x in xs], texts),
+    ]
+    print(f"{'case':40} {'items':>7} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for name, legacy, engine, items in cases:
+        before, after = timed(legacy, items), timed(engine, items)
+        print(f'{name:40} {len(items):7d} {before * 1000:10.2f} {after * 1000:10.2f} {before / after:7.1f}x')
+
+
+# ---------------------------------------------------------------------------
+# Frozen copy of the original implementation (only `today` is passed in).
+# ---------------------------------------------------------------------------
+
+
+def _legacy_strip_edge_punct(s):
+    if s is None:
+        return ''
+    # strip whitespace and common punctuation from start/end
+    return s.strip().strip(" \t\n\r,.;:!，。！？'")
+
+
+def legacy_normalize_date(date_str, today):
+    if not date_str:
+        return None
+    ds = str(date_str)
+    if not ds.strip():
+        return None
+    s = _legacy_strip_edge_punct(ds).lower()
+
+    # direct ISO-like formats (allow spaces around hyphens)
+    iso_candidate = re.sub(r"\s+", "", ds)
+    try:
+        parsed = datetime.fromisoformat(iso_candidate)
+        return parsed.date().isoformat()
+    except Exception:
+        pass
+
+    # common keywords (english and chinese)
+    if s in ('tomorrow', 'tmr', 'tomorow', '明天'):
+        return (today + timedelta(days=1)).isoformat()
+    if s in ('yesterday', 'yday', '昨天'):
+        return (today - timedelta(days=1)).isoformat()
+    if s in ('today', 'tonight', '今天'):
+        return today.isoformat()
+
+    # phrases like 'in 2 days'
+    m = re.search(r'in\s+(\d+)\s+day', s)
+    if m:
+        days = int(m.group(1))
+        return (today + timedelta(days=days)).isoformat()
+
+    # 'next monday' or just weekday name
+    weekdays = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+                '周一': 0, '周二': 1, '周三': 2, '周四': 3, '周五': 4, '周六': 5, '周日': 6, '星期一': 0, '星期二': 1,
+                '星期三': 2, '星期四': 3, '星期五': 4, '星期六': 5, '星期日': 6}
+    m = re.search(r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', s)
+    if m:
+        wd = weekdays[m.group(1)]
+        days_ahead = (wd - today.weekday() + 7) % 7
+        days_ahead = days_ahead if days_ahead != 0 else 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+
+    # plain weekday like 'monday' - pick nearest upcoming (including today)
+    m = re.match(r'^(monday|tuesday|wednesday|thursday|friday|saturday|sunday)$', s)
+    if m:
+        wd = weekdays[m.group(1)]
+        days_ahead = (wd - today.weekday() + 7) % 7
+        if days_ahead == 0:
+            return today.isoformat()
+        return (today + timedelta(days=days_ahead)).isoformat()
+
+    # chinese weekday names
+    for name in ('星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日', '星期天', '周一', '周二', '周三', '周四', '周五', '周六', '周日'):
+        if name in s:
+            wd = weekdays.get(name.replace('星期', '星期').replace('周', '周')) if name in weekdays else None
+            # fallback: match by mapping
+            for k, v in weekdays.items():
+                if k in ('星期一','星期二','星期三','星期四','星期五','星期六','星期日','周一','周二','周三','周四','周五','周六','周日') and k in s:
+                    wd = v
+                    break
+            if wd is not None:
+                days_ahead = (wd - today.weekday() + 7) % 7
+                return (today + timedelta(days=days_ahead)).isoformat()
+
+    # 'on 20 Oct' or numeric date patterns
+    m = re.search(r'on\s+(\d{1,2})(?:st|nd|rd|th)?\s*(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)', s)
+    if m:
+        day = int(m.group(1))
+        mon_str = m.group(2)
+        mon_map = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9,
+                   'oct': 10, 'nov': 11, 'dec': 12}
+        mon = mon_map.get(mon_str, None)
+        if mon:
+            year = today.year
+            try:
+                d = date_cls(year, mon, day)
+                if d < today:
+                    d = date_cls(year + 1, mon, day)
+                return d.isoformat()
+            except Exception:
+                pass
+
+    # try common numeric date formats
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d'):
+        try:
+            parsed = datetime.strptime(s, fmt)
+            return parsed.date().isoformat()
+        except Exception:
+            pass
+
+    # fallback: return original (trimmed) string so frontend can handle free-form
+    return _legacy_strip_edge_punct(ds)
+
+
+def legacy_normalize_time(time_str):
+    if not time_str:
+        return None
+    ts = str(time_str)
+    if not ts.strip():
+        return None
+    s = _legacy_strip_edge_punct(ts).lower().replace('.', '')
+    # if already HH:MM
+    m = re.match(r'^(\d{1,2}):(\d{2})$', s)
+    if m:
+        hh = int(m.group(1))
+        mm = int(m.group(2))
+        return f"{hh:02d}:{mm:02d}"
+    # am/pm like '5pm' or '5:30pm'
+    m = re.match(r'^(\d{1,2})(?::(\d{2}))?\s*(am|pm)$', s)
+    if m:
+        hh = int(m.group(1))
+        mm = int(m.group(2) or 0)
+        ampm = m.group(3)
+        if ampm == 'pm' and hh != 12:
+            hh += 12
+        if ampm == 'am' and hh == 12:
+            hh = 0
+        return f"{hh:02d}:{mm:02d}"
+    # 24h without colon like '1730'
+    m = re.match(r'^(\d{2})(\d{2})$', s)
+    if m:
+        return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
+    return _legacy_strip_edge_punct(ts)
+
+
+def legacy_extract_date_from_text(text, today):
+    if not text:
+        return None
+    s = text.lower()
+    # english keywords
+    if re.search(r'\btomorrow\b', s) or 'tmr' in s or '明天' in s:
+        return (today + timedelta(days=1)).isoformat()
+    if re.search(r'\byesterday\b', s) or 'yday' in s or '昨天' in s:
+        return (today - timedelta(days=1)).isoformat()
+    if re.search(r'\btoday\b', s) or 'tonight' in s or '今天' in s:
+        return today.isoformat()
+    m = re.search(r'in\s+(\d+)\s+day', s)
+    if m:
+        days = int(m.group(1))
+        return (today + timedelta(days=days)).isoformat()
+    # next weekday
+    weekdays = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6}
+    m = re.search(r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', s)
+    if m:
+        wd = weekdays[m.group(1)]
+        days_ahead = (wd - today.weekday() + 7) % 7
+        days_ahead = days_ahead if days_ahead != 0 else 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+    m = re.search(r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', s)
+    if m:
+        wd = weekdays[m.group(1)]
+        days_ahead = (wd - today.weekday() + 7) % 7
+        return (today + timedelta(days=days_ahead)).isoformat()
+    # chinese weekdays
+    for idx, names in enumerate([('monday', '星期一', '周一'), ('tuesday', '星期二', '周二'), ('wednesday', '星期三', '周三'),
+                                 ('thursday', '星期四', '周四'), ('friday', '星期五', '周五'), ('saturday', '星期六', '周六'),
+                                 ('sunday', '星期日', '周日', '星期天')]):
+        for name in names:
+            if name in s:
+                wd = idx
+                days_ahead = (wd - today.weekday() + 7) % 7
+                return (today + timedelta(days=days_ahead)).isoformat()
+    # english 'on 20 Oct'
+    m = re.search(r'on\s+(\d{1,2})(?:st|nd|rd|th)?\s*(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)', s)
+    if m:
+        day = int(m.group(1))
+        mon_str = m.group(2)
+        mon_map = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9,
+                   'oct': 10, 'nov': 11, 'dec': 12}
+        mon = mon_map.get(mon_str, None)
+        if mon:
+            year = today.year
+            try:
+                d = date_cls(year, mon, day)
+                if d < today:
+                    d = date_cls(year + 1, mon, day)
+                return d.isoformat()
+            except Exception:
+                pass
+    return None
+
+
+def legacy_extract_time_from_text(text):
+    if not text:
+        return None
+    s = text.lower()
+    # look for patterns like 5pm, 7:30pm, 19:00
+    m = re.search(r'(\d{1,2}:\d{2}\s*(am|pm)?)', s)
+    if m:
+        return legacy_normalize_time(m.group(1))
+    m = re.search(r'(\d{1,2}\s*(am|pm))', s)
+    if m:
+        return legacy_normalize_time(m.group(1))
+    m = re.search(r'(\b\d{2}:\d{2}\b)', s)
+    if m:
+        return legacy_normalize_time(m.group(1))
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--check', action='store_true', help='only run the golden comparison')
+    args = parser.parse_args()
+    ok = check()
+    if ok and not args.check:
+        bench()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,150 @@
+"""In-flight benchmark: many concurrent slow note reads, thread per request against the ASGI mode.
+
+Serves GET /api/notes/<id> from the in-memory Supabase fake with --latency
+seconds (default 0.2) per round trip and the read cache off, so every request
+waits on "the network". --requests requests (default 300) are sent at once:
+
+- wsgi: the sync views in a pool of --threads threads (default 16), as under a
+  threaded WSGI server; at most --threads requests are in flight.
+- asgi: src/asgi.py with the async store; every request is a coroutine on one
+  event loop.
+
+For each mode it reports the wall time, the throughput, the median and p99
+latency (from the moment all requests are sent, so waiting for a free thread
+counts) and the peak number of threads in the process.
+
+    python scripts/benchmark/asgi_inflight.py --requests 300 --latency 0.2 --output inflight.json
+
+Everything runs in this process; no network access or credentials are needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _setup(size, latency):
+    workdir = tempfile.mkdtemp(prefix='notes-inflight-')
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'app.db')}", NOTE_STORE='supabase',
+                      NOTE_CACHE='0', JOB_QUEUE_PATH=os.path.join(workdir, 'jobs.db'))
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    from fake_supabase import FakeAsyncSupabaseClient, FakeSupabaseClient
+    from run_benchmark import make_corpus
+    from src.main import app, migrate_database
+    from src.store.note_store import set_async_note_store, set_note_store
+    from src.store.supabase_store import AsyncSupabaseNoteStore, SupabaseNoteStore
+
+    migrate_database()
+    fake = FakeSupabaseClient(latency=latency)
+    corpus = make_corpus(size)
+    fake.load('note', corpus)
+    set_note_store(SupabaseNoteStore(fake))
+    set_async_note_store(AsyncSupabaseNoteStore(FakeAsyncSupabaseClient(fake)))
+    return app, [note['id'] for note in corpus if not note['deleted_at']]
+
+
+class _PeakThreads:
+    """Samples threading.active_count() while the block runs."""
+
+    def __enter__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+        # the sampler itself is not part of the measurement
+        self.peak -= 1
+
+
+def _report(latencies, wall, peak):
+    latencies = sorted(latencies)
+    return {'wall_s': round(wall, 3), 'requests_per_s': round(len(latencies) / wall, 1),
+            'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+            'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+            'peak_threads': peak}
+
+
+def bench_wsgi(app, requests, ids, threads):
+    client = app.test_client()
+
+    def get(i):
+        url = f'/api/notes/{ids[i % len(ids)]}'
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f'wsgi GET {url}: {response.status_code}')
+        return time.perf_counter() - start
+
+    with _PeakThreads() as peak, ThreadPoolExecutor(max_workers=threads) as pool:
+        start = time.perf_counter()
+        latencies = list(pool.map(get, range(requests)))
+        wall = time.perf_counter() - start
+    return _report(latencies, wall, peak.peak)
+
+
+def bench_asgi(requests, ids):
+    import httpx
+    from src.asgi import app as asgi_app
+
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            async def get(i):
+                url = f'/api/notes/{ids[i % len(ids)]}'
+                response = await client.get(url)
+                if response.status_code != 200:
+                    raise SystemExit(f'asgi GET {url}: {response.status_code}')
+                return time.perf_counter() - start
+
+            # the first request builds the async view table and the event loop's client
+            await client.get(f'/api/notes/{ids[0]}')
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(get(i) for i in range(requests)))
+            return latencies, time.perf_counter() - start
+
+    with _PeakThreads() as peak:
+        latencies, wall = asyncio.run(run())
+    return _report(latencies, wall, peak.peak)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='concurrent requests per mode')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per Supabase round trip')
+    parser.add_argument('--threads', type=int, default=16, help='worker threads of the wsgi mode')
+    parser.add_argument('--size', type=int, default=1000, help='notes in the fake database')
+    parser.add_argument('--output', default='-', help='JSON result file ("-" for stdout)')
+    args = parser.parse_args(argv)
+
+    app, ids = _setup(args.size, args.latency)
+    report = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                       'requests': args.requests, 'latency': args.latency, 'threads': args.threads},
+              'wsgi': bench_wsgi(app, args.requests, ids, args.threads),
+              'asgi': bench_asgi(args.requests, ids)}
+    data = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(data)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare two run_benchmark.py result files.
+
+    python scripts/benchmark/compare.py bench-main.json bench-branch.json --threshold 10
+
+Prints the change in p50/p99 latency and throughput for every (route, corpus
+size, concurrency) present in both files and exits with status 1 if any p99 or
+throughput got worse by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report.get('meta', {}), {(r['route'], r['corpus_size'], r['concurrency']): r for r in report['results']}
+
+
+def _change(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def _fmt(value):
+    return '      n/a' if value is None else f'{value:+8.1f}%'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent by which p99 or throughput may get worse before it counts as a regression')
+    args = parser.parse_args(argv)
+
+    base_meta, base = _load(args.baseline)
+    cand_meta, cand = _load(args.candidate)
+    print(f"baseline  {base_meta.get('commit') or '?'}{' (dirty)' if base_meta.get('dirty') else ''}")
+    print(f"candidate {cand_meta.get('commit') or '?'}{' (dirty)' if cand_meta.get('dirty') else ''}")
+    print(f"{'route':<40} {'size':>7} {'conc':>4} {'p50':>9} {'p99':>9} {'req/s':>9}")
+
+    regressions = []
+    for key in sorted(base.keys() & cand.keys(), key=lambda k: (k[1], k[0], k[2])):
+        old, new = base[key], cand[key]
+        p50 = _change(old['p50_ms'], new['p50_ms'])
+        p99 = _change(old['p99_ms'], new['p99_ms'])
+        rps = _change(old['throughput_rps'], new['throughput_rps'])
+        worse = (p99 is not None and p99 > args.threshold) or (rps is not None and rps < -args.threshold) \
+            or new['errors'] > old['errors']
+        if worse:
+            regressions.append(key)
+        route, size, concurrency = key
+        print(f"{route:<40} {size:>7} {concurrency:>4} {_fmt(p50)} {_fmt(p99)} {_fmt(rps)}{'  <-- worse' if worse else ''}")
+
+    missing = sorted(base.keys() - cand.keys())
+    if missing:
+        print(f'{len(missing)} measurement(s) only in the baseline, e.g. {missing[0]}')
+    if regressions:
+        print(f'{len(regressions)} regression(s) above {args.threshold:g}%')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,506 @@
+"""In-memory stand-in for the Supabase client, for offline benchmarks.
+
+Implements the part of the supabase-py / postgrest-py query builder that
+src/store/supabase_store.py uses: select/insert/update/upsert, the eq, is_,
+in_ and or_ filters (PostgREST filter syntax, including nested and()/or()),
+order, limit, range, and the functions of the migrations called through RPC:
+search_notes(), notes_by_tags(), tag_counts() and apply_note_batch().
+Rows come back as JSON-like dicts, as they would from PostgREST: note rows hold
+what the Postgres columns would, i.e. tags as JSON text, start_time as
+HH:MM:SS and a generated search_vector that rejects writes.
+
+An optional per-request latency models the network round trip to Supabase.
+FakeAsyncSupabaseClient is the async PostgREST client over the same tables, for
+the async store of the ASGI mode; its round trips wait with asyncio.sleep.
+"""
+import asyncio
+import copy
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+NOTE_DEFAULTS = {'title': None, 'content': None, 'tags': None, 'event_date': None, 'start_time': None,
+                 'created_at': None, 'updated_at': None, 'deleted_at': None, 'version': 1,
+                 'user_id': None}
+# the columns of search_notes()' result table (alembic 0011)
+SEARCH_COLUMNS = ('id', 'title', 'content', 'tags', 'event_date', 'start_time', 'created_at', 'updated_at',
+                  'version', 'rank', 'snippet')
+
+
+def _as_stored(row):
+    """Note values as the Postgres columns hold them."""
+    tags = row.get('tags')
+    if tags is not None and not isinstance(tags, str):
+        # a JSON array sent for the text column is stored as its JSON text
+        row['tags'] = json.dumps(tags, ensure_ascii=False)
+    start_time = row.get('start_time')
+    if isinstance(start_time, str) and len(start_time) == 5:
+        row['start_time'] = start_time + ':00'
+    # the generated tsvector column of alembic 0003
+    row['search_vector'] = ' '.join(sorted(set(
+        re.findall(r'\w+', f"{row.get('title') or ''} {row.get('content') or ''}".lower()))))
+    return row
+
+
+def _reject_generated(rows):
+    if any('search_vector' in row for row in rows):
+        from postgrest.exceptions import APIError
+        raise APIError({'message': 'column "search_vector" can only be updated to DEFAULT', 'code': '428C9'})
+
+
+def _split_top_level(expr):
+    """Split a PostgREST logic expression on commas outside parentheses and double quotes."""
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for ch in expr:
+        if escaped:
+            escaped = False
+        elif quoted and ch == '\\':
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ',':
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append(''.join(current))
+    return parts
+
+
+def _unquote(value):
+    # inside double quotes a backslash escapes the next character
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', value[1:-1], flags=re.DOTALL)
+    return value
+
+
+_TIME = re.compile(r'^\d\d:\d\d(:\d\d)?$')
+
+
+def _coerce(row_value, value):
+    """Compare like Postgres would: numbers as numbers, everything else as text."""
+    if isinstance(row_value, bool):
+        return row_value, value.lower() == 'true'
+    if isinstance(row_value, int):
+        return row_value, int(value)
+    if _TIME.match(str(row_value)) and _TIME.match(value):
+        # time columns: '08:15' and '08:15:00' are the same time
+        return (str(row_value) + ':00')[:8], (value + ':00')[:8]
+    return str(row_value), value
+
+
+def _like(pattern, case_insensitive):
+    # % and * (PostgREST's alias) match any run, _ one character; a backslash makes the next one literal
+    parts = re.findall(r'\\.|.', pattern, re.DOTALL)
+    regex = ''.join(re.escape(p[1]) if len(p) == 2 else '.*' if p in '%*' else '.' if p == '_' else re.escape(p)
+                    for p in parts)
+    return re.compile(f'^{regex}$', re.DOTALL | (re.IGNORECASE if case_insensitive else 0))
+
+
+def _condition(column, op, value):
+    if op == 'is':
+        expected = {'null': None, 'true': True, 'false': False}[value.lower()]
+        return lambda row: row.get(column) is expected
+    if op == 'in':
+        values = [_unquote(v) for v in _split_top_level(value.strip('()'))]
+        return lambda row: row.get(column) is not None and any(
+            a == b for a, b in (_coerce(row[column], v) for v in values))
+    if op in ('like', 'ilike'):
+        regex = _like(value, op == 'ilike')
+        return lambda row: row.get(column) is not None and regex.match(str(row[column])) is not None
+    compare = {
+        'eq': lambda a, b: a == b, 'neq': lambda a, b: a != b,
+        'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+        'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+    }[op]
+    # NULL never compares true, as in SQL
+    return lambda row: row.get(column) is not None and compare(*_coerce(row[column], value))
+
+
+def parse_filter(expr, mode='or'):
+    """Turn a PostgREST or=(...)/and=(...) body into a row predicate."""
+    predicates = []
+    for part in _split_top_level(expr):
+        part = part.strip()
+        nested = re.match(r'^(and|or)\((.*)\)$', part, re.DOTALL)
+        if nested:
+            predicates.append(parse_filter(nested.group(2), nested.group(1)))
+            continue
+        column, op, value = part.split('.', 2)
+        predicates.append(_condition(column, op, _unquote(value)))
+    combine = any if mode == 'or' else all
+    return lambda row: combine(p(row) for p in predicates)
+
+
+class _Query:
+    def __init__(self, db, table, action, payload=None, columns='*', on_conflict=None):
+        self.db = db
+        self.table = table
+        self.action = action
+        self.payload = payload
+        self.columns = columns
+        self.on_conflict = on_conflict
+        self.filters = []
+        self.orders = []
+        self.offset = 0
+        self.count = None
+        self._negate = False
+
+    def _filter(self, predicate):
+        if self._negate:
+            self._negate = False
+            self.filters.append(lambda row: not predicate(row))
+        else:
+            self.filters.append(predicate)
+        return self
+
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def eq(self, column, value):
+        return self._filter(_condition(column, 'eq', str(value)))
+
+    def neq(self, column, value):
+        return self._filter(_condition(column, 'neq', str(value)))
+
+    def gt(self, column, value):
+        return self._filter(_condition(column, 'gt', str(value)))
+
+    def gte(self, column, value):
+        return self._filter(_condition(column, 'gte', str(value)))
+
+    def lte(self, column, value):
+        return self._filter(_condition(column, 'lte', str(value)))
+
+    def is_(self, column, value):
+        return self._filter(_condition(column, 'is', str(value)))
+
+    def in_(self, column, values):
+        return self._filter(_condition(column, 'in', '(' + ','.join(str(v) for v in values) + ')'))
+
+    def or_(self, expr):
+        self.filters.append(parse_filter(expr, 'or'))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def range(self, start, end):
+        self.offset, self.count = start, end - start + 1
+        return self
+
+    def _matches(self, row):
+        return all(f(row) for f in self.filters)
+
+    def _project(self, row):
+        if self.columns == '*':
+            return copy.deepcopy(row)
+        return {c: copy.deepcopy(row.get(c)) for c in self.columns.split(',')}
+
+    def execute(self):
+        return SimpleNamespace(data=self.db.execute(self), count=None)
+
+
+class _AsyncQuery(_Query):
+    async def execute(self):
+        await self.db.async_round_trip()
+        return SimpleNamespace(data=self.db.apply(self), count=None)
+
+
+class _Table:
+    query_class = _Query
+
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def select(self, columns='*', count=None):
+        return self.query_class(self.db, self.name, 'select', columns=columns.replace(' ', ''))
+
+    def insert(self, rows):
+        return self.query_class(self.db, self.name, 'insert', rows)
+
+    def update(self, values):
+        return self.query_class(self.db, self.name, 'update', values)
+
+    def upsert(self, rows, on_conflict='id'):
+        return self.query_class(self.db, self.name, 'upsert', rows, on_conflict=on_conflict)
+
+    def delete(self):
+        return self.query_class(self.db, self.name, 'delete')
+
+
+class _AsyncTable(_Table):
+    query_class = _AsyncQuery
+
+
+class _Rpc:
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params
+        self.columns = None
+
+    def select(self, columns):
+        # ?select= on a function returning table rows
+        self.columns = columns.replace(' ', '').split(',')
+        return self
+
+    def _project(self, rows):
+        if self.columns is None:
+            return rows
+        return [{c: r.get(c) for c in self.columns} for r in rows]
+
+    def execute(self):
+        return SimpleNamespace(data=self._project(self.db.rpc_execute(self.name, self.params)), count=None)
+
+
+class _AsyncRpc(_Rpc):
+    async def execute(self):
+        await self.db.async_round_trip()
+        return SimpleNamespace(data=self._project(self.db.rpc_apply(self.name, self.params)), count=None)
+
+
+class FakeSupabaseClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self.next_id = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return _Table(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return _Rpc(self, name, params or {})
+
+    def rpc_execute(self, name, params):
+        self._round_trip()
+        return self.rpc_apply(name, params)
+
+    def rpc_apply(self, name, params):
+        handler = {'search_notes': self._search_notes, 'notes_by_tags': self._notes_by_tags,
+                   'tag_counts': self._tag_counts, 'apply_note_batch': self._apply_note_batch}.get(name)
+        if handler is None:
+            from postgrest.exceptions import APIError
+            raise APIError({'message': f'function {name} does not exist', 'code': '42883'})
+        with self._lock:
+            return handler(params)
+
+    def _round_trip(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def async_round_trip(self):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def load(self, table, rows):
+        """Bulk-insert rows (with ids) without the per-request latency, e.g. to seed a corpus."""
+        with self._lock:
+            data = self.tables.setdefault(table, {})
+            for row in rows:
+                data[row['id']] = _as_stored(dict(NOTE_DEFAULTS, **row)) if table == 'note' else dict(row)
+            self.next_id[table] = max(data, default=0) + 1
+
+    def _new_row(self, table, row):
+        row = _as_stored(dict(NOTE_DEFAULTS, **row)) if table == 'note' else dict(row)
+        if row.get('id') is None:
+            row['id'] = self.next_id.get(table, 1)
+        self.next_id[table] = max(self.next_id.get(table, 1), row['id'] + 1)
+        return row
+
+    def execute(self, query):
+        self._round_trip()
+        return self.apply(query)
+
+    def apply(self, query):
+        with self._lock:
+            data = self.tables.setdefault(query.table, {})
+            if query.table == 'note' and query.action in ('insert', 'upsert', 'update'):
+                _reject_generated(query.payload if isinstance(query.payload, list) else [query.payload])
+            if query.action == 'insert':
+                rows = query.payload if isinstance(query.payload, list) else [query.payload]
+                inserted = []
+                for row in rows:
+                    row = self._new_row(query.table, copy.deepcopy(row))
+                    data[row['id']] = row
+                    inserted.append(copy.deepcopy(row))
+                return inserted
+            if query.action == 'upsert':
+                key = query.on_conflict or 'id'
+                out = []
+                for row in query.payload:
+                    existing = next((r for r in data.values() if r.get(key) == row.get(key)), None) \
+                        if key != 'id' else data.get(row.get('id'))
+                    if existing is not None:
+                        existing.update(copy.deepcopy(self._with_version(existing, row)))
+                        if query.table == 'note':
+                            _as_stored(existing)
+                        out.append(copy.deepcopy(existing))
+                    else:
+                        new = self._new_row(query.table, copy.deepcopy(row))
+                        data[new['id']] = new
+                        out.append(copy.deepcopy(new))
+                return out
+
+            rows = [r for r in data.values() if query._matches(r)]
+            if query.action == 'update':
+                for row in rows:
+                    row.update(copy.deepcopy(self._with_version(row, query.payload)))
+                    if query.table == 'note':
+                        _as_stored(row)
+                return [copy.deepcopy(r) for r in rows]
+            if query.action == 'delete':
+                for row in rows:
+                    del data[row['id']]
+                return [copy.deepcopy(r) for r in rows]
+
+            for column, desc in reversed(query.orders):
+                # NULLs sort last ascending and first descending, like Postgres
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else 0),
+                          reverse=desc)
+            end = None if query.count is None else query.offset + query.count
+            return [query._project(r) for r in rows[query.offset:end]]
+
+    @staticmethod
+    def _with_version(row, values):
+        # the note_bump_version trigger (alembic 0005): an update that leaves version alone bumps it
+        if 'version' in row and values.get('version', row['version']) == row['version']:
+            return dict(values, version=row['version'] + 1)
+        return values
+
+    def _search_notes(self, params):
+        terms = [t.strip() for t in params.get('q', '').split('&') if t.strip()]
+        prefix = [t.endswith(':*') for t in terms]
+        terms = [t[:-2] if p else t for t, p in zip(terms, prefix)]
+        hits = []
+        for row in self.tables.get('note', {}).values():
+            if row.get('deleted_at') or not self._owned(row, params):
+                continue
+            text = f"{row.get('title') or ''} {row.get('content') or ''}".lower()
+            words = re.findall(r'\w+', text)
+            rank = 0
+            for term, is_prefix in zip(terms, prefix):
+                count = sum(1 for w in words if (w.startswith(term) if is_prefix else w == term))
+                if not count:
+                    break
+                rank += count
+            else:
+                if terms:
+                    hits.append((rank / (1 + len(words)), row))
+        hits.sort(key=lambda h: (h[0], h[1].get('updated_at') or ''), reverse=True)
+        lim, off = params.get('lim', 50), params.get('off', 0)
+        out = []
+        for rank, row in hits[off:off + lim]:
+            content = row.get('content') or ''
+            snippet = content[:160]
+            for term in terms:
+                snippet = re.sub(f'(?i)\\b({re.escape(term)}\\w*)', r'<mark>\1</mark>', snippet, count=1)
+            hit = dict(row, rank=rank, snippet=snippet)
+            out.append({c: copy.deepcopy(hit[c]) for c in SEARCH_COLUMNS})
+        return out
+
+    def _apply_note_batch(self, params):
+        # apply_note_batch() of alembic 0010: creates, in-place updates (bumping version) and soft deletes
+        now = datetime.utcnow().isoformat()
+        notes = self.tables.setdefault('note', {})
+        created = []
+        for fields in params.get('creates') or []:
+            row = self._new_row('note', dict(copy.deepcopy(fields), created_at=now, updated_at=now,
+                                             user_id=params.get('owner_id')))
+            notes[row['id']] = row
+            created.append(row)
+        updated = []
+        for fields in params.get('updates') or []:
+            row = notes.get(fields['id'])
+            if row is None or row.get('deleted_at') or not self._owned(row, params):
+                continue
+            row.update(copy.deepcopy({k: v for k, v in fields.items() if k != 'id'}), updated_at=now,
+                       version=row['version'] + 1)
+            updated.append(_as_stored(row))
+        for note_id in params.get('deletes') or []:
+            row = notes.get(note_id)
+            if row is not None and not row.get('deleted_at') and self._owned(row, params):
+                row.update(deleted_at=now, updated_at=now, version=row['version'] + 1)
+        hidden = ('search_vector', 'deleted_at', 'user_id')
+        return {'created': [{k: copy.deepcopy(v) for k, v in r.items() if k not in hidden} for r in created],
+                'updated': [{k: copy.deepcopy(v) for k, v in r.items() if k not in hidden} for r in updated]}
+
+    @staticmethod
+    def _owned(row, params):
+        # the owner_id argument of the RPC functions (alembic 0008); None selects notes without an owner
+        return row.get('user_id') == params.get('owner_id')
+
+    @staticmethod
+    def _tag_names(row):
+        # what the note_tag triggers (alembic 0006) would index for this row
+        tags = row.get('tags')
+        if isinstance(tags, str):
+            try:
+                tags = json.loads(tags)
+            except ValueError:
+                return set()
+        if not isinstance(tags, list) or row.get('deleted_at'):
+            return set()
+        return {t.strip().lower() for t in tags if isinstance(t, str) and t.strip()}
+
+    def _notes_by_tags(self, params):
+        wanted = set(params['tag_names'])
+        after = (params.get('after_updated_at'), params.get('after_id'))
+        rows = []
+        for row in self.tables.get('note', {}).values():
+            if not self._owned(row, params):
+                continue
+            names = self._tag_names(row)
+            if not (names & wanted if params.get('match_any') else wanted <= names):
+                continue
+            if after[0] is not None and (row['updated_at'], row['id']) >= (after[0], after[1]):
+                continue
+            rows.append(row)
+        rows.sort(key=lambda r: (r['updated_at'], r['id']), reverse=True)
+        return [copy.deepcopy(r) for r in rows[:params.get('lim')]]
+
+    def _tag_counts(self, params):
+        counts = {}
+        for row in self.tables.get('note', {}).values():
+            if not self._owned(row, params):
+                continue
+            for name in self._tag_names(row):
+                counts[name] = counts.get(name, 0) + 1
+        return [{'tag': t, 'count': n} for t, n in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))]
+
+
+class FakeAsyncSupabaseClient:
+    """The async client: same tables and latency as `fake`, awaited execute()."""
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def table(self, name):
+        return _AsyncTable(self.fake, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return _AsyncRpc(self.fake, name, params or {})
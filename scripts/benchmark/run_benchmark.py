@@ -0,0 +1,551 @@
+"""Offline load benchmark for the /api/notes* and /api/users* routes.
+
+The app runs in-process behind a threaded WSGI server, with Supabase replaced by
+an in-memory PostgREST fake (scripts/benchmark/fake_supabase.py) and the model
+by a local stub endpoint (scripts/benchmark/stub_openai.py), both with
+configurable latency. Each corpus size runs in a fresh subprocess, so caches,
+indexes and singletons start cold for every size. For every route, corpus size
+and concurrency level it records p50/p95/p99 latency and throughput as JSON;
+compare two runs with scripts/benchmark/compare.py.
+
+    python scripts/benchmark/run_benchmark.py --sizes 100,1000,10000 --concurrency 1,8,32 \\
+        --output bench-$(git rev-parse --short HEAD).json
+
+No network access or credentials are needed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabaseClient  # noqa: E402
+from stub_openai import start_server  # noqa: E402
+
+# a fixed "now" keeps the corpus identical between runs and commits
+BASE_TIME = datetime(2025, 6, 1, 12, 0, 0)
+
+EN_WORDS = ('meeting', 'project', 'report', 'review', 'budget', 'design', 'deadline', 'client', 'team', 'launch',
+            'groceries', 'dentist', 'flight', 'hotel', 'badminton', 'gym', 'lecture', 'exam', 'homework', 'dinner',
+            'birthday', 'party', 'invoice', 'draft', 'slides', 'release', 'bug', 'feature', 'coffee', 'library',
+            'train', 'ticket', 'weekend', 'garden', 'recipe', 'movie', 'concert', 'museum', 'laundry', 'rent')
+EN_FILLER = ('the', 'a', 'with', 'for', 'before', 'after', 'about', 'and', 'on', 'to', 'need', 'remember', 'check')
+ZH_PHRASES = ('开会讨论项目进度', '准备季度报告', '和客户沟通需求', '去超市买菜', '预约牙医', '订机票和酒店',
+              '羽毛球训练', '复习期末考试', '完成作业', '朋友生日聚会', '整理发票', '修改设计稿', '周末去图书馆',
+              '看电影', '交房租', '学习新框架', '写周报', '准备演讲幻灯片')
+TAGS = ('work', 'personal', 'study', 'sports', 'food', 'travel', 'health', 'shopping', 'finance', 'social', 'urgent',
+        'idea', 'reading', 'family', '工作', '学习', '生活')
+SEARCH_QUERIES = ('meeting', 'project report', 'budget', 'dent', 'flight hotel', 'review', 'team launch', 'gym')
+PROMPTS_LLM = ('Plan the quarterly budget review with finance, collect the spreadsheets from every team '
+               'and prepare three slides on the hiring plan before the board meeting',
+               'Write down the ideas from today\'s brainstorm about the onboarding redesign and who owns each one',
+               '把这周和客户讨论的需求整理成文档，包括优先级、负责人和预计完成时间，然后发给项目组')
+PROMPTS_LOCAL = ('Badminton tmr 5pm @polyu', 'Dentist next monday 10am', 'Team meeting friday 3pm #work',
+                 'Dinner tonight 7pm @mongkok', 'Gym tomorrow 6pm')
+
+
+def _sentence(rng):
+    words = [rng.choice(EN_WORDS if rng.random() < 0.6 else EN_FILLER) for _ in range(rng.randint(5, 14))]
+    return ' '.join(words).capitalize() + '.'
+
+
+def make_note(rng, note_id=None):
+    """One realistic note row: mostly english, about a fifth chinese, some with tags, a date and a time."""
+    chinese = rng.random() < 0.2
+    if chinese:
+        title = rng.choice(ZH_PHRASES)
+        content = '，'.join(rng.choice(ZH_PHRASES) for _ in range(rng.randint(2, 12))) + '。'
+    else:
+        title = ' '.join(rng.choice(EN_WORDS) for _ in range(rng.randint(2, 5))).title()
+        content = ' '.join(_sentence(rng) for _ in range(rng.randint(1, 12)))
+        if rng.random() < 0.15:
+            content += '\n\n' + '\n'.join(f'- {_sentence(rng)}' for _ in range(rng.randint(2, 6)))
+    created = BASE_TIME - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+    updated = created + timedelta(seconds=rng.randint(0, 30 * 24 * 3600))
+    row = {
+        'title': title,
+        'content': content,
+        'tags': rng.sample(TAGS, rng.randint(0, 3)),
+        'event_date': (BASE_TIME.date() + timedelta(days=rng.randint(-60, 60))).isoformat()
+        if rng.random() < 0.5 else None,
+        'start_time': f'{rng.randint(7, 21):02d}:{rng.choice((0, 15, 30, 45)):02d}' if rng.random() < 0.4 else None,
+        'created_at': created.isoformat(),
+        'updated_at': min(updated, BASE_TIME).isoformat(),
+        'deleted_at': None,
+        'version': 1,
+    }
+    if note_id is not None:
+        row['id'] = note_id
+        # a few tombstones, as a synced database has them
+        if rng.random() < 0.02:
+            row['deleted_at'] = row['updated_at']
+    return row
+
+
+def make_corpus(size, seed=0):
+    rng = random.Random(seed)
+    return [make_note(rng, i) for i in range(1, size + 1)]
+
+
+def _note_body(rng):
+    note = make_note(rng)
+    return {k: note[k] for k in ('title', 'content', 'tags', 'event_date', 'start_time')}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+# ---------------------------------------------------------------------------
+# scenarios: name -> prepare(ctx, n) returning n request specs (method, path, kwargs).
+# prepare runs before the clock starts, so setup requests (creating notes to delete,
+# reading versions to patch) are not measured.
+
+class Context:
+    def __init__(self, base_url, size, seed):
+        self.base_url = base_url
+        self.size = size
+        self.rng = random.Random(seed)
+        self.client = httpx.Client(base_url=base_url, timeout=120)
+        self.serial = 0
+
+    def unique(self):
+        self.serial += 1
+        return self.serial
+
+    def live_ids(self):
+        notes = self.client.get('/api/notes', params={'fields': 'id'}).json()
+        return [n['id'] for n in notes]
+
+    def fresh_notes(self, n):
+        """Create n notes (untimed) and return them; writes that change or delete notes use these."""
+        notes = []
+        for start in range(0, n, 500):
+            ops = [{'op': 'create', 'note': _note_body(self.rng)} for _ in range(min(500, n - start))]
+            results = self.client.post('/api/notes/batch', json={'operations': ops}).json()['results']
+            notes.extend(r['note'] for r in results)
+        return notes
+
+    def user_ids(self, n):
+        ids = []
+        for _ in range(n):
+            k = self.unique()
+            response = self.client.post('/api/users', json={'username': f'bench-prep-{k}',
+                                                             'email': f'bench-prep-{k}@example.com'})
+            ids.append(response.json()['id'])
+        return ids
+
+
+def _list_all(ctx, n):
+    return [('GET', '/api/notes', {})] * n
+
+
+def _list_page(ctx, n):
+    return [('GET', '/api/notes', {'params': {'limit': 50}})] * n
+
+
+def _list_next_page(ctx, n):
+    cursor = ctx.client.get('/api/notes', params={'limit': 50}).json()['next_cursor']
+    return [('GET', '/api/notes', {'params': {'limit': 50, 'cursor': cursor}})] * n if cursor else []
+
+
+def _list_fields(ctx, n):
+    return [('GET', '/api/notes', {'params': {'limit': 50, 'fields': 'id,title,preview,updated_at'}})] * n
+
+
+def _list_tagged(ctx, n):
+    specs = []
+    for i in range(n):
+        tags = ctx.rng.sample(TAGS, 2)
+        params = [('limit', 50), ('tag', tags[0])] + ([('tag', tags[1]), ('match', 'any')] if i % 2 else [])
+        specs.append(('GET', '/api/notes', {'params': params}))
+    return specs
+
+
+def _agenda(ctx, n):
+    return [('GET', '/api/notes/agenda', {'params': {'from': '2025-01-01', 'to': '2025-12-31', 'limit': 50}})] * n
+
+
+def _upcoming(ctx, n):
+    return [('GET', '/api/notes/agenda', {'params': {'upcoming': 10, 'now': '2025-06-01T09:00'}})] * n
+
+
+def _tags(ctx, n):
+    return [('GET', '/api/tags', {})] * n
+
+
+def _changes(ctx, n):
+    since = ctx.client.get('/api/notes', params={'limit': 1}).json()['sync_cursor']
+    specs = [('GET', '/api/notes/changes', {}), ('GET', '/api/notes/changes', {'params': {'since': since}})]
+    return (specs * (n // 2 + 1))[:n]
+
+
+def _get_one(ctx, n):
+    ids = ctx.live_ids()
+    return [('GET', f'/api/notes/{ctx.rng.choice(ids)}', {}) for _ in range(n)]
+
+
+def _search(ctx, n):
+    return [('GET', '/api/notes/search', {'params': {'q': SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}})
+            for i in range(n)]
+
+
+def _export(ctx, n):
+    return [('GET', '/api/notes/export', {'params': {'gzip': i % 2}}) for i in range(n)]
+
+
+def _import(ctx, n):
+    specs = []
+    for _ in range(n):
+        lines = [json.dumps(_note_body(ctx.rng), ensure_ascii=False) for _ in range(100)]
+        specs.append(('POST', '/api/notes/import', {'content': '\n'.join(lines).encode(),
+                                                     'headers': {'Content-Type': 'application/x-ndjson'}}))
+    return specs
+
+
+def _llm_cache(ctx, n):
+    return [('GET', '/api/llm/cache', {})] * n
+
+
+def _create(ctx, n):
+    return [('POST', '/api/notes', {'json': _note_body(ctx.rng)}) for _ in range(n)]
+
+
+def _batch(ctx, n):
+    return [('POST', '/api/notes/batch', {'json': {'operations': [
+        {'op': 'create', 'note': _note_body(ctx.rng)} for _ in range(20)]}}) for _ in range(n)]
+
+
+def _put(ctx, n):
+    return [('PUT', f"/api/notes/{note['id']}", {'json': {'title': f"{note['title']} (edited)"}})
+            for note in ctx.fresh_notes(n)]
+
+
+def _patch(ctx, n):
+    return [('PATCH', f"/api/notes/{note['id']}", {'json': {
+        'version': note['version'],
+        'content_ops': [{'pos': 0, 'delete': 0, 'insert': 'Edited: '}]}})
+        for note in ctx.fresh_notes(n)]
+
+
+def _delete(ctx, n):
+    return [('DELETE', f"/api/notes/{note['id']}", {}) for note in ctx.fresh_notes(n)]
+
+
+def _translate_body(ctx):
+    note = _note_body(ctx.rng)
+    # unique text, so neither the LLM cache nor job dedupe can short-circuit the request
+    return {'title': f"{note['title']} #{ctx.unique()}", 'content': note['content'], 'target_language': 'Chinese'}
+
+
+def _translate(ctx, n):
+    return [('POST', '/api/notes/translate', {'json': _translate_body(ctx)}) for _ in range(n)]
+
+
+def _translate_stream(ctx, n):
+    return [('POST', '/api/notes/translate/stream', {'json': _translate_body(ctx)}) for _ in range(n)]
+
+
+def _translate_async(ctx, n):
+    return [('POST', '/api/notes/translate', {'json': _translate_body(ctx), 'params': {'async': 1}})
+            for _ in range(n)]
+
+
+def _translate_batch(ctx, n):
+    return [('POST', '/api/notes/translate/batch', {'json': {
+        'notes': [{'title': b['title'], 'content': b['content']} for b in (_translate_body(ctx) for _ in range(5))],
+        'target_language': 'Chinese'}}) for _ in range(n)]
+
+
+def _generate_local(ctx, n):
+    return [('POST', '/api/notes/generate', {'json': {'prompt': PROMPTS_LOCAL[i % len(PROMPTS_LOCAL)]}})
+            for i in range(n)]
+
+
+def _generate_prompt(ctx, i):
+    prompt = PROMPTS_LLM[i % len(PROMPTS_LLM)]
+    return {'prompt': f'{prompt} ({ctx.unique()})',
+            'target_language': 'Chinese' if prompt[0] >= '⺀' else 'English'}
+
+
+def _generate_llm(ctx, n):
+    return [('POST', '/api/notes/generate', {'json': _generate_prompt(ctx, i)}) for i in range(n)]
+
+
+def _generate_stream(ctx, n):
+    return [('POST', '/api/notes/generate/stream', {'json': _generate_prompt(ctx, i)}) for i in range(n)]
+
+
+def _users_list(ctx, n):
+    return [('GET', '/api/users', {})] * n
+
+
+def _users_create(ctx, n):
+    specs = []
+    for _ in range(n):
+        k = ctx.unique()
+        specs.append(('POST', '/api/users', {'json': {'username': f'bench-{k}', 'email': f'bench-{k}@example.com'}}))
+    return specs
+
+
+def _users_get(ctx, n):
+    ids = [u['id'] for u in ctx.client.get('/api/users').json()]
+    return [('GET', f'/api/users/{ctx.rng.choice(ids)}', {}) for _ in range(n)]
+
+
+def _users_put(ctx, n):
+    return [('PUT', f'/api/users/{user_id}', {'json': {'username': f'bench-renamed-{ctx.unique()}'}})
+            for user_id in ctx.user_ids(n)]
+
+
+def _users_delete(ctx, n):
+    return [('DELETE', f'/api/users/{user_id}', {}) for user_id in ctx.user_ids(n)]
+
+
+# reads first, so they see the corpus as seeded
+SCENARIOS = (
+    ('GET /api/notes', _list_all),
+    ('GET /api/notes?limit=50', _list_page),
+    ('GET /api/notes?limit=50&cursor', _list_next_page),
+    ('GET /api/notes?limit=50&fields', _list_fields),
+    ('GET /api/notes?limit=50&tag', _list_tagged),
+    ('GET /api/tags', _tags),
+    ('GET /api/notes/agenda', _agenda),
+    ('GET /api/notes/agenda?upcoming', _upcoming),
+    ('GET /api/notes/changes', _changes),
+    ('GET /api/notes/<id>', _get_one),
+    ('GET /api/notes/search', _search),
+    ('GET /api/notes/export', _export),
+    ('GET /api/llm/cache', _llm_cache),
+    ('POST /api/notes', _create),
+    ('POST /api/notes/batch', _batch),
+    ('POST /api/notes/import', _import),
+    ('PUT /api/notes/<id>', _put),
+    ('PATCH /api/notes/<id>', _patch),
+    ('DELETE /api/notes/<id>', _delete),
+    ('POST /api/notes/translate', _translate),
+    ('POST /api/notes/translate/stream', _translate_stream),
+    ('POST /api/notes/translate/batch', _translate_batch),
+    ('POST /api/notes/generate (local)', _generate_local),
+    ('POST /api/notes/generate (llm)', _generate_llm),
+    ('POST /api/notes/generate/stream', _generate_stream),
+    ('POST /api/notes/translate?async=1', _translate_async),
+    ('GET /api/users', _users_list),
+    ('POST /api/users', _users_create),
+    ('GET /api/users/<id>', _users_get),
+    ('PUT /api/users/<id>', _users_put),
+    ('DELETE /api/users/<id>', _users_delete),
+)
+
+
+def run_load(base_url, specs, concurrency):
+    """Send specs from `concurrency` threads (one keep-alive connection each); returns latencies and statuses."""
+    latencies, statuses, errors = [], {}, []
+    lock = threading.Lock()
+    position = iter(range(len(specs)))
+    start = threading.Barrier(concurrency + 1)
+
+    def worker():
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            start.wait()
+            while True:
+                with lock:
+                    i = next(position, None)
+                if i is None:
+                    return
+                method, path, kwargs = specs[i]
+                t0 = time.perf_counter()
+                try:
+                    response = client.request(method, path, **kwargs)
+                    elapsed = time.perf_counter() - t0
+                    status = str(response.status_code)
+                    failed = response.status_code >= 400 or b'event: error' in response.content
+                except httpx.HTTPError as e:
+                    elapsed = time.perf_counter() - t0
+                    status, failed = type(e).__name__, True
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+                    if failed:
+                        errors.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, len(errors), time.perf_counter() - t0
+
+
+def _summary(route, size, concurrency, latencies, statuses, errors, wall):
+    ms = sorted(x * 1000 for x in latencies)
+    return {
+        'route': route,
+        'corpus_size': size,
+        'concurrency': concurrency,
+        'requests': len(ms),
+        'errors': errors,
+        'statuses': statuses,
+        'p50_ms': round(percentile(ms, 50), 3) if ms else None,
+        'p95_ms': round(percentile(ms, 95), 3) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 3) if ms else None,
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else None,
+        'max_ms': round(ms[-1], 3) if ms else None,
+        'throughput_rps': round(len(ms) / wall, 2) if wall > 0 else None,
+    }
+
+
+def run_worker(size, args):
+    """Benchmark every scenario against one corpus size; runs in its own process."""
+    workdir = tempfile.mkdtemp(prefix='notes-bench-')
+    _, llm_url = start_server(latency=args.llm_latency, token_latency=args.llm_token_latency)
+    os.environ.update({
+        'NOTE_STORE': 'supabase',
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        'GITHUB_TOKEN': 'benchmark',
+        'LLM_ENDPOINT': llm_url,
+        'LLM_CACHE': '0',
+        'JOB_QUEUE_PATH': os.path.join(workdir, 'jobs.db'),
+        'SEARCH_INDEX_PATH': os.path.join(workdir, 'search-index.json'),
+    })
+    if args.no_note_cache:
+        os.environ['NOTE_CACHE'] = '0'
+
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from src.main import app, migrate_database
+    from src.models.user import User, db
+    from src.store.note_store import set_note_store
+    from src.store.supabase_store import SupabaseNoteStore
+    from src.store.timed import TimedNoteStore
+
+    fake = FakeSupabaseClient(latency=args.db_latency)
+    fake.load('note', make_corpus(size, args.seed))
+    store = TimedNoteStore(SupabaseNoteStore(fake))
+    if os.environ.get('NOTE_CACHE', '1') != '0':
+        from src.store.cache import CachedNoteStore
+        store = CachedNoteStore.from_env(store)
+    set_note_store(store)
+    migrate_database()
+    with app.app_context():
+        db.session.add_all(User(username=f'user{i}', email=f'user{i}@example.com') for i in range(min(size, 1000)))
+        db.session.commit()
+
+    # keep-alive connections, like a browser or a proxy in front of gunicorn
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    ctx = Context(base_url, size, args.seed)
+    results = []
+    for route, prepare in SCENARIOS:
+        if args.routes and not any(r in route for r in args.routes):
+            continue
+        for concurrency in args.concurrency:
+            specs = prepare(ctx, args.requests + args.warmup)
+            if not specs:
+                continue
+            run_load(base_url, specs[:args.warmup], 1)
+            latencies, statuses, errors, wall = run_load(base_url, specs[args.warmup:], concurrency)
+            result = _summary(route, size, concurrency, latencies, statuses, errors, wall)
+            results.append(result)
+            print(f"{size:>7} {route:<40} c={concurrency:<3} p50={result['p50_ms']:>9.2f}ms "
+                  f"p99={result['p99_ms']:>9.2f}ms {result['throughput_rps']:>8.1f} req/s"
+                  + (f"  errors={errors}" if errors else ''), file=sys.stderr, flush=True)
+    server.shutdown()
+    return results
+
+
+def _git(*cmd):
+    try:
+        return subprocess.run(['git', *cmd], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=_int_list, default=[100, 1000, 10000], help='corpus sizes (notes)')
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 8, 32], help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route and level')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests before each measurement')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='stub model delay before the first token (s)')
+    parser.add_argument('--llm-token-latency', type=float, default=0.002, help='stub model delay per token (s)')
+    parser.add_argument('--db-latency', type=float, default=0.005, help='fake Supabase round trip (s)')
+    parser.add_argument('--routes', type=lambda v: [r for r in v.split(',') if r], default=None,
+                        help='only routes containing one of these substrings, e.g. "GET /api/notes,users"')
+    parser.add_argument('--no-note-cache', action='store_true', help='run with NOTE_CACHE=0')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='-', help='JSON result file ("-" for stdout)')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--worker-output', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker is not None:
+        with open(args.worker_output, 'w', encoding='utf-8') as f:
+            json.dump(run_worker(args.worker, args), f)
+        # daemon threads (job workers, write-behind flusher) must not hold the process open
+        os._exit(0)
+
+    started_at = datetime.utcnow().isoformat() + 'Z'
+    results = []
+    passthrough = list(argv if argv is not None else sys.argv[1:])
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+            out_path = f.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), *passthrough,
+                            '--worker', str(size), '--worker-output', out_path], check=True)
+            with open(out_path, encoding='utf-8') as f:
+                results.extend(json.load(f))
+        finally:
+            os.unlink(out_path)
+
+    report = {
+        'meta': {
+            'commit': _git('rev-parse', 'HEAD'),
+            'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': started_at,
+            'args': {k: v for k, v in vars(args).items() if not k.startswith('worker')},
+        },
+        'results': results,
+    }
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output == '-':
+        print(data)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data + '\n')
+
+
+if __name__ == '__main__':
+    main()
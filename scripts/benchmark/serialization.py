@@ -0,0 +1,128 @@
+"""Serialization benchmark: bytes on the wire and CPU per request for a large note list.
+
+Serves GET /api/notes (every note, no pagination) from a local SQLite database
+of --size notes (default 10000) through the SQL store with the read cache off,
+so each request reads the rows, builds the note dicts, encodes the JSON and
+compresses it. Every JSON provider (std, orjson) is measured with every
+encoding the client can ask for (identity, gzip, br), reporting the response
+size and the median CPU time (process time) and wall time per request. A
+separate `rows` section times only the row -> dict step, ORM objects with
+Note.to_dict() against the plain-row reads the store uses.
+
+    python scripts/benchmark/serialization.py --size 10000 --requests 20 --output serialization.json
+
+Everything runs in this process; no network access or credentials are needed.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as dtime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _setup(size):
+    workdir = tempfile.mkdtemp(prefix='notes-serialization-')
+    os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'app.db')}", NOTE_STORE='sql', NOTE_CACHE='0',
+                      JOB_QUEUE_PATH=os.path.join(workdir, 'jobs.db'))
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    from run_benchmark import make_corpus
+    from sqlalchemy import insert
+    from src.main import app, migrate_database
+    from src.models.note import Note, db
+
+    migrate_database()
+    rows = []
+    for note in make_corpus(size):
+        rows.append(dict(note, tags=json.dumps(note['tags'], ensure_ascii=False),
+                         event_date=date.fromisoformat(note['event_date']) if note['event_date'] else None,
+                         start_time=dtime.fromisoformat(note['start_time']) if note['start_time'] else None,
+                         created_at=datetime.fromisoformat(note['created_at']),
+                         updated_at=datetime.fromisoformat(note['updated_at']),
+                         deleted_at=datetime.fromisoformat(note['deleted_at']) if note['deleted_at'] else None))
+    with app.app_context():
+        db.session.execute(insert(Note), rows)
+        db.session.commit()
+    return app
+
+
+def _measure(fn, requests):
+    cpu, wall = [], []
+    for _ in range(requests):
+        c0, w0 = time.process_time(), time.perf_counter()
+        fn()
+        cpu.append((time.process_time() - c0) * 1000)
+        wall.append((time.perf_counter() - w0) * 1000)
+    return {'cpu_ms': round(statistics.median(cpu), 2), 'wall_ms': round(statistics.median(wall), 2)}
+
+
+def bench_rows(app, requests):
+    """CPU of turning the rows into note dicts: ORM objects + to_dict() against plain rows."""
+    from src.models.note import Note
+    from src.store.sql_store import SqlNoteStore
+
+    store = SqlNoteStore()
+    with app.app_context():
+        def orm():
+            query = Note.query.filter(Note.deleted_at.is_(None)).order_by(Note.updated_at.desc(), Note.id.desc())
+            return [n.to_dict() for n in query.all()]
+        orm()
+        store.list_notes()
+        return {'orm_to_dict': _measure(orm, requests), 'plain_rows': _measure(store.list_notes, requests)}
+
+
+def bench_responses(app, requests):
+    from src import compression, json_provider
+
+    providers = ['std'] + (['orjson'] if json_provider.orjson is not None else [])
+    encodings = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+    client = app.test_client()
+    results = {}
+    for provider in providers:
+        json_provider.init_app(app, provider)
+        for encoding in encodings:
+            headers = {'Accept-Encoding': encoding}
+            sizes = {}
+
+            def request():
+                response = client.get('/api/notes', headers=headers)
+                data = response.get_data()
+                if response.status_code != 200:
+                    raise SystemExit(f'GET /api/notes: {response.status_code}')
+                sizes['wire'] = len(data)
+                sizes['encoding'] = response.headers.get('Content-Encoding', 'identity')
+            request()
+            result = _measure(request, requests)
+            results[f'{provider}/{encoding}'] = dict(result, bytes=sizes['wire'], content_encoding=sizes['encoding'])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=10000, help='notes in the list')
+    parser.add_argument('--requests', type=int, default=20, help='measured requests per combination')
+    parser.add_argument('--output', default='-', help='JSON result file ("-" for stdout)')
+    args = parser.parse_args(argv)
+
+    app = _setup(args.size)
+    report = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                       'size': args.size, 'requests': args.requests},
+              'rows': bench_rows(app, args.requests),
+              'responses': bench_responses(app, args.requests)}
+    data = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(data)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data + '\n')
+
+
+if __name__ == '__main__':
+    main()
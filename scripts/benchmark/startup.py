@@ -0,0 +1,126 @@
+"""Cold-start benchmark: how long a fresh process takes to import the app and serve its first requests.
+
+Every run is a new Python process (as on a serverless cold start). It reports
+the time to `import src.main`, which heavy SDKs that import already loaded, and
+the latency of the first and second request to a static page, the users table,
+the note list, a local note generation and a model call. Supabase and the model
+are replaced by the offline fakes from this directory, so only local work is
+measured.
+
+    python scripts/benchmark/startup.py --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HEAVY_MODULES = ('openai', 'httpx', 'supabase', 'postgrest', 'alembic', 'psycopg2')
+
+# (name, method, path, body); each is sent twice, cold then warm
+REQUESTS = (
+    ('static', 'GET', '/', None),
+    ('users', 'GET', '/api/users', None),
+    ('notes', 'GET', '/api/notes?limit=20', None),
+    ('generate_local', 'POST', '/api/notes/generate', {'prompt': 'Badminton tmr 5pm @polyu'}),
+    ('translate_llm', 'POST', '/api/notes/translate', {'title': 'Hello', 'content': 'Good morning'}),
+)
+
+
+def _install_fake_store():
+    sys.path.insert(0, BENCH_DIR)
+    from fake_supabase import FakeSupabaseClient
+    from run_benchmark import make_corpus
+    from src.store.note_store import set_note_store
+    from src.store.supabase_store import SupabaseNoteStore
+    from src.store.timed import TimedNoteStore
+    from src.store.cache import CachedNoteStore
+    fake = FakeSupabaseClient()
+    fake.load('note', make_corpus(200))
+    set_note_store(CachedNoteStore.from_env(TimedNoteStore(SupabaseNoteStore(fake))))
+
+
+def child():
+    """One cold start; prints its measurements as JSON."""
+    sys.path.insert(0, ROOT_DIR)
+    start = time.perf_counter()
+    from src.main import app
+    result = {'import_ms': (time.perf_counter() - start) * 1000,
+              'loaded_at_import': [m for m in HEAVY_MODULES if m in sys.modules]}
+
+    client = app.test_client()
+    for name, method, path, body in REQUESTS:
+        if name == 'notes':
+            # the fake store (and the postgrest import it needs) is set up just before its first use
+            _install_fake_store()
+        for attempt in ('first', 'second'):
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            response.close()
+            result[f'{name}_{attempt}_ms'] = (time.perf_counter() - t0) * 1000
+            if response.status_code >= 400:
+                result.setdefault('errors', []).append(f'{method} {path}: {response.status_code}')
+        result[f'loaded_after_{name}'] = [m for m in HEAVY_MODULES if m in sys.modules]
+    print(json.dumps(result))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='cold starts to measure')
+    parser.add_argument('--output', default='-', help='JSON result file ("-" for stdout)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        child()
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    from stub_openai import start_server
+    _, llm_url = start_server(latency=0.0)
+    workdir = tempfile.mkdtemp(prefix='notes-startup-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'app.db')}",
+               GITHUB_TOKEN='benchmark',
+               LLM_ENDPOINT=llm_url,
+               LLM_CACHE='0',
+               JOB_QUEUE_PATH=os.path.join(workdir, 'jobs.db'))
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'src.main', 'init-db'], cwd=ROOT_DIR, env=env,
+                   check=True, capture_output=True)
+
+    runs = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=ROOT_DIR, env=env,
+                             check=True, capture_output=True, text=True).stdout
+        run = json.loads(out.strip().splitlines()[-1])
+        run['process_ms'] = (time.perf_counter() - t0) * 1000
+        runs.append(run)
+
+    summary = {}
+    for key in runs[0]:
+        if key.endswith('_ms'):
+            values = [r[key] for r in runs]
+            summary[key] = {'median': round(statistics.median(values), 2),
+                            'min': round(min(values), 2), 'max': round(max(values), 2)}
+        else:
+            summary[key] = runs[0][key]
+    report = {'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'runs': args.runs},
+              'results': summary}
+    data = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(data)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""A stand-in for the OpenAI-compatible chat completions endpoint, for offline benchmarks.
+
+Serves POST /chat/completions (plain and stream=true) with a configurable delay
+before the first token and between streamed tokens, so the app's LLM routes can
+be measured without a network or an API key. Note extraction prompts get a
+JSON note back, everything else a "translation" of the user message.
+
+    python scripts/benchmark/stub_openai.py --port 8765 --latency 0.2
+    LLM_ENDPOINT=http://127.0.0.1:8765 python src/main.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _reply(messages):
+    system = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+    user = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+    if "Extract the user's notes" in system:
+        words = user.split()
+        return json.dumps({
+            'Title': ' '.join(words[:4]) or 'Note',
+            'Notes': user,
+            'Tags': ['benchmark'],
+            'Date': 'tomorrow',
+            'Time': '5pm',
+        }, ensure_ascii=False)
+    return f'[translated] {user}'
+
+
+def _tokens(text):
+    # about four characters per token, like the real tokenizer on english text
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or ['']
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    token_latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._json(404, {'error': {'message': 'not found'}})
+            return
+        text = _reply(body.get('messages') or [])
+        model = body.get('model', 'stub')
+        time.sleep(self.latency)
+        if body.get('stream'):
+            self._stream(model, text)
+            return
+        pieces = _tokens(text)
+        time.sleep(self.token_latency * len(pieces))
+        prompt_tokens = sum(len(m.get('content') or '') for m in body.get('messages') or []) // 4
+        self._json(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': text}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(pieces),
+                      'total_tokens': prompt_tokens + len(pieces)},
+        })
+
+    def _json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model, text):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        # no chunked encoding: the end of the stream is the end of the connection
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None):
+            event = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self.wfile.write(f'data: {json.dumps(event, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+
+        chunk({'role': 'assistant', 'content': ''})
+        for piece in _tokens(text):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            chunk({'content': piece})
+        chunk({}, 'stop')
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, token_latency=0.0):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    handler = type('Handler', (StubHandler,), {'latency': latency, 'token_latency': token_latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-openai', daemon=True).start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before the first token')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='seconds per generated token')
+    args = parser.parse_args()
+    server, url = start_server(args.host, args.port, args.latency, args.token_latency)
+    print(f'stub OpenAI endpoint on {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
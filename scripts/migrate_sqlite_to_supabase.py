@@ -1,76 +1,278 @@
-"""Simple migration helper: copy data from local sqlite DB to a Postgres DB (Supabase)
+"""Copy the local SQLite database into Postgres (Supabase).
 
 Usage:
-  - Set environment variable DATABASE_URL to your Supabase Postgres connection string (pg URI)
-  - Ensure local sqlite path matches the app (database/app.db)
-  - Run: python scripts/migrate_sqlite_to_supabase.py
-
-Notes:
-  - This script performs a best-effort field mapping for `user` and `note` tables defined in the project.
-  - It's safe to run on an empty target DB. If tables already exist, duplicates may be created.
-  - For large datasets or production, prefer more robust tooling (pgloader, logical replication, pg_dump/pg_restore).
+  - Create the target schema first: DATABASE_URL=<pg URI> alembic upgrade head
+  - Run: DATABASE_URL=<pg URI> python scripts/migrate_sqlite_to_supabase.py
+    Options: --source <url> (default: the app's database/app.db), --tables user,note,
+    --batch-size 5000, --workers 4, --key user=username, --restart
+
+How it works:
+  - Rows are read in primary key order one batch at a time (keyset pagination), so
+    memory use does not grow with the table, even for millions of notes.
+  - Each batch is written with one multi-row INSERT ... ON CONFLICT DO UPDATE in its
+    own transaction. Source ids are kept, so running the script again updates rows
+    instead of duplicating them. --key table=col,... upserts on another unique key.
+  - After every batch the last copied key is saved to the checkpoint file
+    (database/migrate_checkpoint.json); an interrupted run continues from there.
+  - Tables that don't reference each other are copied in parallel; a table starts
+    once the tables it has foreign keys to are done.
+  - On Postgres the id sequences are moved past the copied ids at the end.
 """
+import argparse
+import json
 import os
-from sqlalchemy import create_engine, MetaData, Table, select
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import Integer, MetaData, create_engine, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 SQLITE_PATH = os.path.join(ROOT, 'database', 'app.db')
 SQLITE_URL = f"sqlite:///{SQLITE_PATH}"
+DEFAULT_CHECKPOINT = os.path.join(ROOT, 'database', 'migrate_checkpoint.json')
+
+# migration bookkeeping, plus the full-text and tag indexes that triggers rebuild on the target
+SKIP_TABLES = re.compile(r'^(alembic_version|sqlite_.*|note_fts.*|tag|note_tag)$')
+
+_print_lock = threading.Lock()
+# set on Ctrl-C: workers stop after their current batch, leaving a valid checkpoint
+_stop = threading.Event()
+
+
+def log(*args):
+    with _print_lock:
+        print(*args, flush=True)
+
+
+def redact(url):
+    return make_url(url).render_as_string(hide_password=True)
+
+
+class Checkpoint:
+    """Per-table progress ({'last_key', 'rows', 'done'}), saved atomically after every batch."""
+
+    def __init__(self, path, source, target, restart=False):
+        self.path = path
+        self._lock = threading.Lock()
+        state = None
+        if not restart and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get('source'), state.get('target')) != (source, target):
+                raise SystemExit(f'{path} belongs to a migration from {state.get("source")} to '
+                                 f'{state.get("target")}; pass --restart to start over.')
+        self.state = state or {'source': source, 'target': target, 'tables': {}}
+
+    def table(self, name):
+        with self._lock:
+            return dict(self.state['tables'].get(name, {}))
+
+    def save(self, name, **values):
+        with self._lock:
+            self.state['tables'].setdefault(name, {}).update(values)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, indent=2, default=str)
+            os.replace(tmp, self.path)
+
+
+def dependency_levels(tables):
+    """Group tables into levels; every table comes after the tables it has foreign keys to."""
+    names = {t.name for t in tables}
+    deps = {t.name: {fk.column.table.name for fk in t.foreign_keys} & names - {t.name} for t in tables}
+    levels, done = [], set()
+    while len(done) < len(deps):
+        level = sorted(name for name, needs in deps.items() if name not in done and needs <= done)
+        if not level:
+            raise SystemExit(f'Circular foreign keys between: {", ".join(sorted(set(deps) - done))}')
+        levels.append(level)
+        done.update(level)
+    return levels
+
+
+def upsert_statement(dialect_name, table, key, columns):
+    if dialect_name == 'postgresql':
+        insert = postgresql.insert
+    elif dialect_name == 'sqlite':
+        insert = sqlite.insert
+    else:
+        raise SystemExit(f'Unsupported target database: {dialect_name}')
+    stmt = insert(table)
+    update = {c: stmt.excluded[c] for c in columns if c not in key}
+    if not update:
+        return stmt.on_conflict_do_nothing(index_elements=list(key))
+    return stmt.on_conflict_do_update(index_elements=list(key), set_=update)
+
+
+def _after(pk, last):
+    if len(pk) == 1:
+        return pk[0] > last[0]
+    return tuple_(*pk) > tuple_(*last)
+
+
+def copy_table(name, src_engine, dst_engine, src_table, dst_table, key, checkpoint, batch_size, progress_every):
+    """Stream one table from source to target; returns (rows copied in this run, seconds)."""
+    state = checkpoint.table(name)
+    if state.get('done'):
+        log(f'{name}: already copied ({state.get("rows", 0)} rows), skipping')
+        return 0, 0.0
+
+    pk = list(src_table.primary_key.columns)
+    if not pk:
+        raise RuntimeError(f'{name} has no primary key to read it in batches')
+    columns = [c.name for c in src_table.columns if c.name in dst_table.columns]
+    missing = [c.name for c in src_table.columns if c.name not in dst_table.columns]
+    if missing:
+        log(f'{name}: target has no column(s) {", ".join(missing)}; they are not copied')
+    if any(c.name not in columns for c in pk) or any(k not in columns for k in key):
+        raise RuntimeError(f'{name}: key columns must exist on both sides')
+
+    upsert = upsert_statement(dst_engine.dialect.name, dst_table, key, columns)
+    query = select(*(src_table.c[c] for c in columns)).order_by(*pk).limit(batch_size)
+    last = state.get('last_key')
+    previous = state.get('rows', 0)
+    if last is not None:
+        log(f'{name}: resuming after key {last} ({previous} rows already copied)')
+
+    copied = 0
+    start = last_report = time.monotonic()
+    with src_engine.connect() as src:
+        while not _stop.is_set():
+            batch_query = query.where(_after(pk, last)) if last is not None else query
+            batch = [dict(row._mapping) for row in src.execute(batch_query)]
+            if not batch:
+                break
+            with dst_engine.begin() as dst:
+                dst.execute(upsert, batch)
+            last = [batch[-1][c.name] for c in pk]
+            copied += len(batch)
+            # a crash after the commit but before this save replays the batch, which the upsert makes harmless
+            checkpoint.save(name, last_key=last, rows=previous + copied)
+            now = time.monotonic()
+            if now - last_report >= progress_every:
+                log(f'{name}: {previous + copied} rows, {copied / (now - start):,.0f} rows/s')
+                last_report = now
+            if len(batch) < batch_size:
+                break
+    seconds = time.monotonic() - start
+    if _stop.is_set():
+        log(f'{name}: stopped after {previous + copied} rows')
+        return copied, seconds
+    checkpoint.save(name, done=True)
+    log(f'{name}: done, {copied} rows in {seconds:.1f}s ({copied / seconds if seconds else 0:,.0f} rows/s)')
+    return copied, seconds
+
+
+def reset_sequences(dst_engine, tables):
+    """Move Postgres id sequences past the copied ids, so new rows don't collide with them."""
+    if dst_engine.dialect.name != 'postgresql':
+        return
+    quote = dst_engine.dialect.identifier_preparer
+    with dst_engine.begin() as conn:
+        for table in tables:
+            pk = list(table.primary_key.columns)
+            if len(pk) != 1 or not isinstance(pk[0].type, Integer):
+                continue
+            table_sql, column_sql = quote.format_table(table), quote.quote(pk[0].name)
+            conn.execute(text(f'SELECT setval(pg_get_serial_sequence(:table, :column), '
+                              f'(SELECT COALESCE(MAX({column_sql}), 0) + 1 FROM {table_sql}), false)'),
+                         {'table': table_sql, 'column': pk[0].name})
+
+
+def _parse_keys(values):
+    keys = {}
+    for value in values or ():
+        table, _, columns = value.partition('=')
+        if not columns:
+            raise SystemExit(f'--key expects table=col[,col...], got {value!r}')
+        keys[table] = tuple(c.strip() for c in columns.split(',') if c.strip())
+    return keys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=SQLITE_URL, help='source database URL (default: the local SQLite file)')
+    parser.add_argument('--target', default=os.environ.get('DATABASE_URL'), help='target URL (default: DATABASE_URL)')
+    parser.add_argument('--tables', help='comma-separated tables to copy (default: every table both sides have)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=4, help='tables copied in parallel')
+    parser.add_argument('--key', action='append', metavar='TABLE=COL[,COL]',
+                        help='unique key to upsert on instead of the primary key')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and copy everything again')
+    parser.add_argument('--progress', type=float, default=5.0, help='seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    if not args.target:
+        raise SystemExit('DATABASE_URL not set. Set it to your Supabase Postgres URL and re-run.')
+    log('Source:', redact(args.source))
+    log('Target:', redact(args.target))
+
+    src_engine = create_engine(args.source)
+    dst_options = {'connect_args': {'timeout': 30}} if make_url(args.target).get_backend_name() == 'sqlite' else \
+        {'pool_size': max(5, args.workers)}
+    dst_engine = create_engine(args.target, **dst_options)
+
+    src_meta, dst_meta = MetaData(), MetaData()
+    src_meta.reflect(bind=src_engine)
+    dst_meta.reflect(bind=dst_engine)
+
+    if args.tables:
+        names = [t.strip() for t in args.tables.split(',') if t.strip()]
+        unknown = [n for n in names if n not in src_meta.tables or n not in dst_meta.tables]
+        if unknown:
+            raise SystemExit(f'Not in both databases: {", ".join(unknown)} (run alembic upgrade head on the target)')
+    else:
+        names = [n for n in src_meta.tables if n in dst_meta.tables and not SKIP_TABLES.match(n)]
+        skipped = [n for n in src_meta.tables if n not in dst_meta.tables and not SKIP_TABLES.match(n)]
+        if skipped:
+            log(f'Target DB missing table(s) {", ".join(skipped)}. Create them first (run alembic migrations). Skipping.')
+
+    keys = _parse_keys(args.key)
+    checkpoint = Checkpoint(args.checkpoint, redact(args.source), redact(args.target), restart=args.restart)
+    tables = [dst_meta.tables[n] for n in names]
+    levels = dependency_levels(tables)
+    log('Copy order:', ' -> '.join('{' + ', '.join(level) + '}' for level in levels))
+
+    total_rows, failed = 0, []
+    start = time.monotonic()
+    for level in levels:
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(level)))) as pool:
+            futures = {
+                name: pool.submit(copy_table, name, src_engine, dst_engine, src_meta.tables[name],
+                                  dst_meta.tables[name],
+                                  keys.get(name) or tuple(c.name for c in dst_meta.tables[name].primary_key.columns),
+                                  checkpoint, args.batch_size, args.progress)
+                for name in level
+            }
+            try:
+                for name, future in futures.items():
+                    try:
+                        total_rows += future.result()[0]
+                    except Exception as e:
+                        failed.append(name)
+                        log(f'{name}: FAILED: {e}')
+            except KeyboardInterrupt:
+                _stop.set()
+        if _stop.is_set():
+            raise SystemExit('Interrupted; re-run to resume from the checkpoint.')
+        if failed:
+            # tables that depend on a failed one must wait for the next run
+            raise SystemExit(f'Stopped after errors in {", ".join(failed)}; re-run to resume from the checkpoint.')
+
+    reset_sequences(dst_engine, tables)
+    seconds = time.monotonic() - start
+    log(f'Done. {total_rows} rows in {seconds:.1f}s ({total_rows / seconds if seconds else 0:,.0f} rows/s)')
+    # everything is copied: the next run starts from scratch
+    if os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
 
-SUPABASE_URL = os.environ.get('DATABASE_URL')
-if not SUPABASE_URL:
-    raise SystemExit('DATABASE_URL not set. Set it to your Supabase Postgres URL and re-run.')
-
-print('Local sqlite:', SQLITE_URL)
-print('Target Postgres (Supabase):', SUPABASE_URL)
-
-# create engines
-src_engine = create_engine(SQLITE_URL)
-dst_engine = create_engine(SUPABASE_URL)
-
-src_meta = MetaData(bind=src_engine)
-dst_meta = MetaData(bind=dst_engine)
-
-src_meta.reflect(only=['user', 'note'])
-dst_meta.reflect()
-
-SessionDst = sessionmaker(bind=dst_engine)
-
-def copy_table(table_name, pk='id'):
-    src_table = Table(table_name, src_meta, autoload_with=src_engine)
-    # ensure target has table
-    if table_name not in dst_meta.tables:
-        print(f"Target DB missing table '{table_name}'. Create it first (run alembic migrations). Skipping.")
-        return 0
-    dst_table = Table(table_name, dst_meta, autoload_with=dst_engine)
-
-    conn_src = src_engine.connect()
-    conn_dst = dst_engine.connect()
-    trans = conn_dst.begin()
-    try:
-        rows = list(conn_src.execute(select(src_table)))
-        count = 0
-        for r in rows:
-            data = dict(r)
-            # remove primary key to let Postgres assign if serial differs
-            if pk in data:
-                data.pop(pk, None)
-            conn_dst.execute(dst_table.insert().values(**data))
-            count += 1
-        trans.commit()
-        print(f'Copied {count} rows into {table_name}')
-        return count
-    except SQLAlchemyError as e:
-        trans.rollback()
-        print('Error copying', table_name, e)
-        return 0
-    finally:
-        conn_src.close()
-        conn_dst.close()
 
 if __name__ == '__main__':
-    copied_users = copy_table('user')
-    copied_notes = copy_table('note')
-    print('Done. Users:', copied_users, 'Notes:', copied_notes)
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Shared async HTTP client for the ASGI serving mode (src/asgi.py).
+
+One httpx.AsyncClient per process carries both the async PostgREST calls and the
+AsyncOpenAI model calls, so they share one keep-alive pool and no coroutine opens
+connections of its own. It is created on first use inside the running event
+loop and closed when the server shuts down (the ASGI lifespan).
+
+Settings: ASYNC_MAX_CONNECTIONS (default 200) caps the connections of the pool,
+SUPABASE_TIMEOUT (default 10) is the timeout in seconds of each Supabase call.
+Model calls keep LLM_TIMEOUT (see src/llm.py).
+"""
+import asyncio
+import os
+
+import httpx
+
+ASYNC_MAX_CONNECTIONS = int(os.environ.get('ASYNC_MAX_CONNECTIONS', 200))
+SUPABASE_TIMEOUT = float(os.environ.get('SUPABASE_TIMEOUT', 10))
+
+# (event loop, client): a client's connections belong to the loop that opened them
+_client = None
+
+
+def get_http_client():
+    """The process-wide httpx.AsyncClient of the running event loop."""
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client[0] is not loop:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS,
+                                max_keepalive_connections=ASYNC_MAX_CONNECTIONS // 4,
+                                keepalive_expiry=120),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=10.0),
+            follow_redirects=True)
+        _client = (loop, client)
+    return _client[1]
+
+
+async def aclose():
+    """Close the shared client; the next call opens a new one."""
+    global _client
+    if _client is not None:
+        (_, client), _client = _client, None
+        await client.aclose()
+
+
+class PostgrestSession:
+    """What the postgrest request builders use of an httpx client, sent through the shared one."""
+
+    def __init__(self, base_url, headers, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.headers = httpx.Headers(headers)
+        self.timeout = timeout
+
+    async def request(self, method, url, json=None, params=None, headers=None):
+        merged = self.headers.copy()
+        merged.update(headers or {})
+        try:
+            return await get_http_client().request(method, self.base_url + url, json=json, params=params,
+                                                   headers=merged, timeout=self.timeout)
+        except httpx.TimeoutException as e:
+            # httpx's timeouts have no message; this one ends up in the error response
+            raise TimeoutError(f'Supabase did not answer within {self.timeout:g}s') from e
+
+    async def aclose(self):
+        # the pool is shared; aclose() above closes it
+        pass
+
+
+def postgrest_client(supabase_url, key):
+    """An AsyncPostgrestClient for the Supabase project at supabase_url, on the shared client."""
+    from postgrest import AsyncPostgrestClient
+    from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+    class SharedPoolPostgrestClient(AsyncPostgrestClient):
+        def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+            return PostgrestSession(base_url, headers, timeout)
+
+    # the URL and headers supabase-py's create_client() gives its PostgREST client
+    headers = dict(DEFAULT_POSTGREST_CLIENT_HEADERS, apiKey=key, Authorization=f'Bearer {key}')
+    return SharedPoolPostgrestClient(f"{supabase_url.rstrip('/')}/rest/v1", headers=headers,
+                                     timeout=SUPABASE_TIMEOUT)
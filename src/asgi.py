@@ -0,0 +1,321 @@
+"""ASGI entry point: serve the app from an event loop.
+
+    uvicorn src.asgi:app --host 0.0.0.0 --port 5001
+
+Endpoints that mostly wait on the network run as coroutines on the event loop
+(src/routes/note_async.py): note reads and writes through the async PostgREST
+client when NOTE_STORE=supabase, and translation through AsyncOpenAI, both over
+the shared httpx.AsyncClient of src/aio.py. A slow Supabase or model call then
+holds a coroutine instead of a thread, so one process keeps hundreds of such
+requests in flight. Every other endpoint runs its regular Flask view in a pool
+of ASGI_THREADS threads (default 16), with the request body and a streamed
+response (SSE, exports) passed through as they are produced.
+
+Both kinds go through the same Flask app, so its hooks (current user, metrics,
+CORS, compression) apply as under a WSGI server. When the client disconnects, a
+coroutine view is cancelled, which aborts its in-flight upstream request, and a
+streamed sync response is closed before its next chunk.
+
+The WSGI entry point (src.main:app, for gunicorn, `python src/main.py` and
+Vercel) is unchanged.
+"""
+import asyncio
+import contextvars
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request_started
+
+from src import aio
+from src.main import app as flask_app
+from src.routes.note_async import llm_views, store_views
+from src.store.note_store import get_async_note_store
+
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# chunks of a request or response body held between the event loop and a sync view
+BODY_QUEUE_SIZE = 8
+
+_executor = None
+_views = None
+
+
+def _async_views():
+    global _views
+    if _views is None:
+        views = dict(llm_views)
+        if get_async_note_store() is not None:
+            views.update(store_views)
+        _views = views
+    return _views
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi')
+    return _executor
+
+
+def _environ(scope, body):
+    """The WSGI environ of an ASGI http scope."""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI strings are the raw bytes decoded as latin-1
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # the body ends where the ASGI messages end, Content-Length or not
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    """The whole request body, or None if the client disconnected first."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+def _start_message(status, headers):
+    return {'type': 'http.response.start', 'status': status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]}
+
+
+# -- coroutine views ---------------------------------------------------------
+
+async def _respond(ctx, view):
+    """Run `view` in the pushed request context `ctx`, the way Flask's wsgi_app runs a sync view."""
+    error = None
+    ctx.push()
+    try:
+        try:
+            try:
+                request_started.send(flask_app, _async_wrapper=flask_app.ensure_sync)
+                rv = flask_app.preprocess_request()
+                if rv is None:
+                    rv = await view(**ctx.request.view_args)
+            except Exception as e:
+                rv = flask_app.handle_user_exception(e)
+            response = flask_app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = flask_app.handle_exception(e)
+        app_iter, status, headers = response.get_wsgi_response(ctx.request.environ)
+        try:
+            return int(status.split(' ', 1)[0]), headers, b''.join(app_iter)
+        finally:
+            # runs the response's call_on_close callbacks (metrics)
+            app_iter.close()
+    except BaseException as e:
+        # includes the CancelledError of a disconnect
+        error = e
+        raise
+    finally:
+        if error is not None and flask_app.should_ignore_error(error):
+            error = None
+        ctx.pop(error)
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _call_async_view(view, ctx, receive, send):
+    # a fresh context: the request's contextvars (metrics, current user) stay in this task
+    task = asyncio.create_task(_respond(ctx, view), context=contextvars.Context())
+    disconnect = asyncio.create_task(_wait_for_disconnect(receive))
+    await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    if not task.done():
+        # the client is gone: cancel the view, and with it the Supabase or model request it awaits
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return
+    disconnect.cancel()
+    status, headers, body = task.result()
+    await send(_start_message(status, headers))
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# -- sync views ---------------------------------------------------------------
+
+class _RequestBody(io.RawIOBase):
+    """wsgi.input for a view running in a thread: body chunks are handed over by the event loop as it reads them."""
+
+    def __init__(self, chunks, loop):
+        self._chunks = chunks
+        self._loop = loop
+        self._buffer = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._done:
+            chunk = asyncio.run_coroutine_threadsafe(self._chunks.get(), self._loop).result()
+            if chunk is None:
+                self._done = True
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                self._buffer = chunk
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+async def _pump_request(receive, chunks, disconnected):
+    """Feed the request body to the sync view, then watch for the client going away."""
+    body_done = False
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            if not body_done:
+                await chunks.put(OSError('client disconnected'))
+            return
+        if not body_done:
+            if message.get('body'):
+                await chunks.put(message['body'])
+            if not message.get('more_body', False):
+                body_done = True
+                await chunks.put(None)
+
+
+def _run_wsgi(environ, out, loop, disconnected):
+    """Run the Flask app for one request in a worker thread, handing the response to the event loop."""
+    def put(item):
+        asyncio.run_coroutine_threadsafe(out.put(item), loop).result()
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info is not None and started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        started[:] = [(int(status.split(' ', 1)[0]), headers)]
+
+    started = []
+    try:
+        result = flask_app(environ, start_response)
+        try:
+            sent_start = False
+            for chunk in result:
+                if disconnected.is_set():
+                    # streamed responses stop here; closing the iterable runs their cleanup
+                    break
+                if not sent_start:
+                    put(('start', started[0]))
+                    sent_start = True
+                if chunk:
+                    put(('body', chunk))
+            if not sent_start:
+                put(('start', started[0]))
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+    finally:
+        put(None)
+
+
+async def _call_wsgi(scope, receive, send):
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue(BODY_QUEUE_SIZE)
+    out = asyncio.Queue(BODY_QUEUE_SIZE)
+    disconnected = threading.Event()
+    body = io.BufferedReader(_RequestBody(chunks, loop))
+    environ = _environ(scope, body)
+    pump = asyncio.create_task(_pump_request(receive, chunks, disconnected))
+    # a fresh context per request, as a WSGI server thread would have
+    worker = loop.run_in_executor(_get_executor(), contextvars.Context().run,
+                                  _run_wsgi, environ, out, loop, disconnected)
+    try:
+        while True:
+            item = await out.get()
+            if item is None:
+                break
+            if disconnected.is_set():
+                # keep draining so the worker isn't left blocked on a full queue
+                continue
+            kind, value = item
+            try:
+                if kind == 'start':
+                    await send(_start_message(*value))
+                else:
+                    await send({'type': 'http.response.body', 'body': value, 'more_body': True})
+            except OSError:
+                # the connection broke before the server saw the disconnect
+                disconnected.set()
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+        await worker
+    finally:
+        pump.cancel()
+
+
+# -- the ASGI application ------------------------------------------------------
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await aio.aclose()
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+    # route like Flask does (again when the context is pushed); a context that is never pushed costs nothing else
+    ctx = flask_app.request_context(_environ(scope, io.BytesIO()))
+    ctx.match_request()
+    rule = ctx.request.url_rule
+    view = _async_views().get(rule.endpoint) if rule is not None else None
+    # Flask answers OPTIONS itself (automatic options) instead of calling the view
+    if view is None or scope['method'] == 'OPTIONS':
+        return await _call_wsgi(scope, receive, send)
+
+    body = await _read_body(receive)
+    if body is None:
+        return
+    ctx.request.environ['wsgi.input'] = io.BytesIO(body)
+    await _call_async_view(view, ctx, receive, send)
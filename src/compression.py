@@ -0,0 +1,67 @@
+"""Response compression negotiated through Accept-Encoding.
+
+JSON and text API responses of at least COMPRESS_MIN_BYTES (default 1024) are
+compressed with brotli (when the `brotli` package is installed and the client
+accepts `br`) or gzip. Quality is tuned for speed over ratio:
+COMPRESS_GZIP_LEVEL (default 5) and COMPRESS_BROTLI_QUALITY (default 4).
+COMPRESS=0 turns it off, e.g. behind a proxy that already compresses.
+
+Streamed responses (the NDJSON export, SSE) are left alone; the export has its
+own `?gzip=1`. A compressed response's ETag becomes weak, as it no longer names
+the exact bytes of the identity encoding; If-None-Match compares weakly, so
+revalidation still yields 304s.
+"""
+import gzip
+import os
+
+from src.metrics import span
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') and mimetype != 'text/event-stream' or mimetype in COMPRESSIBLE_TYPES
+
+
+def init_app(app):
+    """Compress the responses of `app`; register it after init_metrics so the work shows up as a span."""
+    from flask import request
+
+    if os.environ.get('COMPRESS', '1') == '0':
+        return
+    min_bytes = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+    gzip_level = int(os.environ.get('COMPRESS_GZIP_LEVEL', 5))
+    brotli_quality = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    @app.after_request
+    def _compress(response):
+        if (response.direct_passthrough or response.is_streamed or not 200 <= response.status_code < 300
+                or response.status_code == 204 or 'Content-Encoding' in response.headers
+                or not _compressible(response)):
+            return response
+        # the body depends on the request's Accept-Encoding from here on, even when this one is not compressed
+        response.vary.add('Accept-Encoding')
+        if request.method == 'HEAD' or (response.content_length or 0) < min_bytes:
+            return response
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+        with span('compress'):
+            data = response.get_data()
+            if encoding == 'br':
+                data = brotli.compress(data, quality=brotli_quality)
+            else:
+                data = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
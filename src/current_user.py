@@ -0,0 +1,104 @@
+"""The user a request acts for.
+
+API requests name their user with the `X-User-Id` header (the id of a row in
+the user table). Every note store, cache, search index and job reads the
+current user from here, so a request only ever sees and scans that user's
+notes. Requests without the header act for nobody: they see the notes that
+have no owner (user_id IS NULL), which is where all notes written before notes
+had owners live.
+
+The header is not authentication: whoever sets it acts as that user. It is
+only read with TRUST_USER_HEADER=1, for deployments behind a proxy that
+authenticates users and sets X-User-Id itself, replacing whatever the client
+sent. Otherwise every request acts for nobody and a request that carries the
+header is rejected with 400, so a client can't believe it is scoped.
+
+The value is a context variable: set per request by init_app(), and by
+as_user() around background work (buffered writes, jobs) done on a user's
+behalf.
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+HEADER = 'X-User-Id'
+KNOWN_TTL = 300
+KNOWN_MAX = 4096
+
+_current = contextvars.ContextVar('current_user_id', default=None)
+# user id -> when its existence was checked, so a request doesn't pay a user lookup each time
+_known = {}
+
+
+def current_user_id():
+    """The id of the user the current request or job acts for, or None."""
+    return _current.get()
+
+
+@contextmanager
+def as_user(user_id):
+    """Run the enclosed block on behalf of user_id (None: notes without an owner)."""
+    token = _current.set(user_id)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def forget_user(user_id):
+    """Drop a deleted user from the existence cache."""
+    _known.pop(user_id, None)
+
+
+def _user_exists(user_id):
+    from src.models.user import User, db
+    now = time.monotonic()
+    checked = _known.get(user_id)
+    if checked is not None and now - checked < KNOWN_TTL:
+        return True
+    if db.session.get(User, user_id) is None:
+        return False
+    if len(_known) >= KNOWN_MAX:
+        _known.clear()
+    _known[user_id] = now
+    return True
+
+
+def init_app(app):
+    """Read X-User-Id on every API request; unknown or malformed ids are rejected with 400."""
+    from flask import g, jsonify, request
+
+    trusted = os.environ.get('TRUST_USER_HEADER', '0') == '1'
+
+    @app.before_request
+    def _set_current_user():
+        if request.blueprint is None:
+            # static files
+            return
+        value = request.headers.get(HEADER)
+        user_id = None
+        if value and not trusted:
+            return jsonify({'error': f'{HEADER} is not accepted: set TRUST_USER_HEADER=1 behind a proxy '
+                                     f'that authenticates users'}), 400
+        if value:
+            try:
+                user_id = int(value)
+            except ValueError:
+                user_id = 0
+            if user_id <= 0 or not _user_exists(user_id):
+                return jsonify({'error': f'{HEADER} must be the id of an existing user'}), 400
+        g.current_user_token = _current.set(user_id)
+
+    @app.after_request
+    def _vary_on_user(response):
+        if request.blueprint is not None:
+            # the same URL answers differently per user; shared caches must keep them apart
+            response.vary.add(HEADER)
+        return response
+
+    @app.teardown_request
+    def _reset_current_user(exc=None):
+        token = g.pop('current_user_token', None)
+        if token is not None:
+            _current.reset(token)
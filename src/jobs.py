@@ -0,0 +1,313 @@
+"""Background jobs for slow (LLM) work.
+
+Requests that opt in (`Prefer: respond-async` or `?async=1`) enqueue a job and
+get `202` with its id instead of holding a web worker for the model calls. Jobs
+live in a local SQLite file, so no broker is needed and queued jobs survive a
+restart; a small pool of worker threads runs them by priority (higher first,
+then oldest first). An identical job of the same user that is still queued or
+running is reused instead of being enqueued twice. A job runs on behalf of the
+user who enqueued it (see src/current_user.py), and only that user can see it.
+
+Cancelling a queued job removes it from the queue. A running job is flagged;
+handlers call check_cancelled() between model calls, which raises JobCancelled
+once the flag is set, so the job stops spending tokens and ends as cancelled.
+
+Settings: JOB_QUEUE_PATH (default database/jobs.db), JOB_WORKERS (default 2),
+JOB_RETENTION seconds to keep finished jobs (default one day), JOB_STALE_AFTER
+seconds after which a running job is assumed orphaned and requeued (default 900).
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+from src.current_user import as_user
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_PATH = os.path.join(ROOT_DIR, 'database', 'jobs.db')
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_handlers = {}
+# (queue, job id) of the job the current thread runs; copied into the LLM threads it fans out to
+_running = contextvars.ContextVar('running_job', default=None)
+
+
+class JobCancelled(Exception):
+    """Raised by check_cancelled() inside a job whose cancellation was requested."""
+
+
+def register_handler(kind, fn):
+    """Register fn(payload) -> JSON-serialisable result as the runner for jobs of this kind."""
+    _handlers[kind] = fn
+
+
+def check_cancelled():
+    """Raise JobCancelled if the job being run was cancelled; a no-op outside a job."""
+    running = _running.get()
+    if running is not None and running[0].cancel_requested(running[1]):
+        raise JobCancelled(running[1])
+
+
+def job_key(kind, payload, user_id=None):
+    data = json.dumps({'kind': kind, 'payload': payload, 'user_id': user_id},
+                      sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    def __init__(self, path):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS job (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                user_id INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_job_next ON job (status, priority DESC, created_at);
+            -- at most one pending job per identical request
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_job_pending ON job (dedupe_key)
+                WHERE status IN ('queued', 'running') AND cancel_requested = 0;
+            CREATE INDEX IF NOT EXISTS ix_job_finished_at ON job (finished_at);
+        ''')
+        # queue files from before jobs had an owner
+        if 'user_id' not in {row['name'] for row in self._conn.execute('PRAGMA table_info(job)')}:
+            self._conn.execute('ALTER TABLE job ADD COLUMN user_id INTEGER')
+        self._lock = threading.Lock()
+        # wakes idle workers (enqueue) and waiters on a job (finish); other processes are seen by polling
+        self.changed = threading.Condition()
+
+    def _notify(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'user_id': row['user_id'],
+            'result': json.loads(row['result']) if row['result'] is not None else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+
+    def enqueue(self, kind, payload, priority=0, user_id=None):
+        """Queue a job for user_id, or return their identical one already pending. Returns (job, created)."""
+        key = job_key(kind, payload, user_id)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute("SELECT * FROM job WHERE dedupe_key = ? AND status IN ('queued', 'running') "
+                                         "AND cancel_requested = 0", (key,)).fetchone()
+                if row is not None:
+                    # a more urgent duplicate moves the pending job up
+                    if row['status'] == QUEUED and priority > row['priority']:
+                        self._conn.execute('UPDATE job SET priority = ? WHERE id = ?', (priority, row['id']))
+                    self._conn.execute('COMMIT')
+                    return self._row(row), False
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    'INSERT INTO job (id, kind, payload, dedupe_key, priority, status, user_id, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, kind, json.dumps(payload, ensure_ascii=False), key, priority, QUEUED, user_id,
+                     time.time()))
+                row = self._conn.execute('SELECT * FROM job WHERE id = ?', (job_id,)).fetchone()
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        self._notify()
+        return self._row(row), True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._row(self._conn.execute('SELECT * FROM job WHERE id = ?', (job_id,)).fetchone())
+
+    def claim(self):
+        """Mark the next queued job as running and return (job, payload), or None when the queue is empty."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT * FROM job WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1', (QUEUED,)).fetchone()
+                if row is not None:
+                    self._conn.execute('UPDATE job SET status = ?, started_at = ? WHERE id = ?',
+                                       (RUNNING, time.time(), row['id']))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        if row is None:
+            return None
+        return self._row(row), json.loads(row['payload'])
+
+    def finish(self, job_id, result=None, error=None):
+        # a job cancelled while it was running ends as cancelled and its result is dropped
+        with self._lock:
+            self._conn.execute(
+                'UPDATE job SET status = CASE WHEN cancel_requested THEN ? WHEN ? IS NULL THEN ? ELSE ? END, '
+                'result = CASE WHEN cancel_requested THEN NULL ELSE ? END, error = ?, finished_at = ? '
+                'WHERE id = ? AND status = ?',
+                (CANCELLED, error, DONE, FAILED,
+                 json.dumps(result, ensure_ascii=False) if error is None else None, error, time.time(),
+                 job_id, RUNNING))
+        self._notify()
+
+    def cancel(self, job_id):
+        """Cancel a queued job at once; a running job is flagged and ends as cancelled. Returns the job or None."""
+        with self._lock:
+            now = time.time()
+            self._conn.execute('UPDATE job SET status = ?, finished_at = ? WHERE id = ? AND status = ?',
+                               (CANCELLED, now, job_id, QUEUED))
+            self._conn.execute('UPDATE job SET cancel_requested = 1 WHERE id = ? AND status = ?', (job_id, RUNNING))
+            row = self._conn.execute('SELECT * FROM job WHERE id = ?', (job_id,)).fetchone()
+        self._notify()
+        return self._row(row)
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT cancel_requested FROM job WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def requeue_stale(self, older_than):
+        """Put jobs that have been running for longer than older_than seconds back in the queue.
+
+        Such a job belonged to a process that died; live workers (maybe in another process) finish well within it.
+        """
+        with self._lock:
+            self._conn.execute('UPDATE job SET status = ?, started_at = NULL WHERE status = ? AND started_at < ?',
+                               (QUEUED, RUNNING, time.time() - older_than))
+
+    def purge_finished(self, older_than):
+        with self._lock:
+            self._conn.execute('DELETE FROM job WHERE finished_at IS NOT NULL AND finished_at < ?',
+                               (time.time() - older_than,))
+
+    def stats(self, user_id=None):
+        """Job counts by status of user_id's jobs (None: the jobs without an owner)."""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM job WHERE user_id IS ? GROUP BY status',
+                                      (user_id,)).fetchall()
+        return {status: count for status, count in rows}
+
+    def wait(self, job_id, timeout):
+        """Block until the job has finished or timeout seconds passed; returns the latest job state."""
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job['status'] not in FINISHED:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self.changed:
+                # short waits so jobs finished by another process are noticed too
+                self.changed.wait(min(remaining, 1.0))
+            job = self.get(job_id)
+        return job
+
+
+class JobWorkers:
+    """A fixed pool of threads that run queued jobs one at a time each."""
+
+    def __init__(self, queue, size, app=None, retention=86400, stale_after=900):
+        self.queue = queue
+        self.size = size
+        self.app = app
+        self.retention = retention
+        self.stale_after = stale_after
+        self._threads = []
+
+    def _housekeeping(self):
+        self.queue.requeue_stale(self.stale_after)
+        self.queue.purge_finished(self.retention)
+
+    def start(self):
+        self._housekeeping()
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self):
+        last_housekeeping = time.monotonic()
+        while True:
+            try:
+                claimed = self.queue.claim()
+            except sqlite3.Error:
+                logger.exception('Job queue: claim failed')
+                claimed = None
+            if claimed is None:
+                with self.queue.changed:
+                    self.queue.changed.wait(1.0)
+                if time.monotonic() - last_housekeeping > 60:
+                    self._housekeeping()
+                    last_housekeeping = time.monotonic()
+                continue
+            job, payload = claimed
+            handler = _handlers.get(job['kind'])
+            token = _running.set((self.queue, job['id']))
+            try:
+                if handler is None:
+                    raise LookupError(f"no handler for job kind {job['kind']!r}")
+                with self.app.app_context() if self.app is not None else nullcontext(), as_user(job['user_id']):
+                    result = handler(payload)
+            except JobCancelled:
+                logger.info('Job %s (%s) stopped: cancelled', job['id'], job['kind'])
+                self.queue.finish(job['id'])
+            except Exception as e:
+                logger.warning('Job %s (%s) failed: %s', job['id'], job['kind'], e)
+                self.queue.finish(job['id'], error=str(e) or type(e).__name__)
+            else:
+                self.queue.finish(job['id'], result=result)
+            finally:
+                _running.reset(token)
+
+
+_queue = None
+_workers = None
+_init_lock = threading.Lock()
+
+
+def get_job_queue(app=None):
+    """The process-wide queue; the worker pool is started with it on first use."""
+    global _queue, _workers
+    if _queue is None:
+        with _init_lock:
+            if _queue is None:
+                queue = JobQueue(os.environ.get('JOB_QUEUE_PATH', DEFAULT_PATH))
+                _workers = JobWorkers(queue, int(os.environ.get('JOB_WORKERS', 2)), app,
+                                      retention=float(os.environ.get('JOB_RETENTION', 86400)),
+                                      stale_after=float(os.environ.get('JOB_STALE_AFTER', 900)))
+                _workers.start()
+                _queue = queue
+    return _queue
@@ -0,0 +1,85 @@
+"""JSON encoding for API responses.
+
+JSON_PROVIDER picks the encoder behind `jsonify` and `request.json`: `orjson`
+(the default when the package is installed) serializes a list of notes several
+times faster than the standard library and writes the response bytes directly;
+`std` keeps Flask's built-in provider. Without orjson installed, `std` is used.
+
+Both produce the same JSON for what the API returns: keys keep their insertion
+order, non-ASCII text is written as UTF-8, and datetimes, UUIDs, Decimals and
+dataclasses go through Flask's default conversion. A value orjson rejects (an
+integer beyond 64 bits, say) falls back to the standard library.
+"""
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class StdJSONProvider(DefaultJSONProvider):
+    """Flask's provider, with insertion-ordered keys and UTF-8 output like the orjson one."""
+
+    ensure_ascii = False
+    sort_keys = False
+
+
+class OrjsonProvider(StdJSONProvider):
+    # datetimes and dataclasses go through Flask's `default`, so both providers format them alike
+    _options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                if orjson else 0)
+
+    def _dump(self, obj, indent=False):
+        options = self._options
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # arguments only json.dumps understands (cls=, separators=, ...)
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._dump(obj).decode()
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity and other input json.loads accepts; still raises ValueError if invalid
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            data = self._dump(obj, indent) + b'\n'
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+PROVIDERS = {'std': StdJSONProvider, 'orjson': OrjsonProvider}
+
+
+def provider_class(name=None):
+    """The provider class for `name` (default: JSON_PROVIDER, else orjson when installed)."""
+    name = (name or os.environ.get('JSON_PROVIDER') or ('orjson' if orjson else 'std')).lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(PROVIDERS)}, got {name!r}")
+    if name == 'orjson' and orjson is None:
+        return StdJSONProvider
+    return PROVIDERS[name]
+
+
+def init_app(app, name=None):
+    app.json = provider_class(name)(app)
@@ -1,25 +1,225 @@
 # import libraries
+import asyncio
 import os
-from openai import OpenAI
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from src.jobs import check_cancelled
+from src.llm_cache import get_llm_cache, cache_key
+from src.utils.chunking import split_for_translation, estimate_tokens
+from src.metrics import span, record_span, in_context, record_llm_usage, LLM_CALLS
 
 load_dotenv() # Loads environment variables from .env
-token = os.environ["GITHUB_TOKEN"]
-endpoint = "https://models.github.ai/inference"
+endpoint = os.environ.get("LLM_ENDPOINT", "https://models.github.ai/inference")
 model = "openai/gpt-4.1-mini"
+
+# at most this many model calls run at once across the process
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+# long texts are translated in chunks of about this many tokens, each with its own retries
+TRANSLATE_CHUNK_TOKENS = int(os.environ.get('TRANSLATE_CHUNK_TOKENS', 800))
+TRANSLATE_RETRIES = int(os.environ.get('TRANSLATE_RETRIES', 2))
+
+_client = None
+_executor = None
+_init_lock = threading.Lock()
+# ASGI mode: (shared httpx.AsyncClient, AsyncOpenAI) and (event loop, semaphore), see get_async_client()
+_async_client = None
+_async_slots = None
+
+
+# One client per process: its pooled keep-alive connections skip a TCP+TLS handshake per call.
+# The openai and httpx packages (and GITHUB_TOKEN) are only needed once a model is called,
+# so a cold start that serves notes or static files does not pay for importing them.
+def get_client():
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                token = os.environ.get("GITHUB_TOKEN")
+                if not token:
+                    raise RuntimeError("GITHUB_TOKEN is not set")
+                import httpx
+                from openai import OpenAI
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY * 2,
+                                        max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                                        keepalive_expiry=120),
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0))
+                _client = OpenAI(base_url=endpoint, api_key=token, http_client=http_client)
+    return _client
+
+
+# AsyncOpenAI for the ASGI mode (src/asgi.py): its requests go through the httpx.AsyncClient
+# shared with the async Supabase client (src/aio.py), each with the LLM_TIMEOUT timeout.
+def get_async_client():
+    global _async_client
+    from src.aio import get_http_client
+    http_client = get_http_client()
+    if _async_client is None or _async_client[0] is not http_client:
+        token = os.environ.get("GITHUB_TOKEN")
+        if not token:
+            raise RuntimeError("GITHUB_TOKEN is not set")
+        from openai import AsyncOpenAI
+        _async_client = (http_client, AsyncOpenAI(base_url=endpoint, api_key=token, http_client=http_client,
+                                                  timeout=LLM_TIMEOUT))
+    return _async_client[1]
+
+
+# LLM_MAX_CONCURRENCY bounds the async model calls too; waiting for a slot costs no thread
+def _llm_slots():
+    global _async_slots
+    loop = asyncio.get_running_loop()
+    if _async_slots is None or _async_slots[0] is not loop:
+        _async_slots = (loop, asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+    return _async_slots[1]
+
+
+def _transient_errors():
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+    return (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix='llm')
+    return _executor
+
+
+# Run fn(*args) on the shared executor; spans it records still count towards the calling request
+def submit(fn, *args):
+    return get_executor().submit(in_context(fn), *args)
+
+
+# Run fn(*args) for every args tuple concurrently (bounded by LLM_MAX_CONCURRENCY).
+# Returns one result per input, in order; a failed call yields its exception instead.
+# Tasks must not fan out again themselves, or they could wait on their own pool.
+def run_concurrently(fn, arg_tuples):
+    futures = [submit(fn, *args) for args in arg_tuples]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append(e)
+    return results
 # A function to call an LLM model and return the response
-def call_llm_model(model, messages, temperature=1.0, top_p=1.0): 
-    client = OpenAI(base_url=endpoint,api_key=token)
-    response = client.chat.completions.create(
-        messages=messages,
-        temperature=temperature, 
-        top_p=top_p, 
-        model=model)
-    return response.choices[0].message.content
+# Identical requests are answered from src/llm_cache.py. `validate` may raise to keep
+# an unusable completion (e.g. malformed JSON) out of the cache.
+def call_llm_model(model, messages, temperature=1.0, top_p=1.0, validate=None):
+    cache = get_llm_cache()
+    key = cache_key(model, messages, temperature=temperature, top_p=top_p) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
 
-# A function to translate to target language
-def translate_note(note_content, target_language):
-    messages = [
+    try:
+        with span('llm'):
+            response = get_client().chat.completions.create(
+                messages=messages,
+                temperature=temperature, 
+                top_p=top_p, 
+                model=model)
+    except Exception:
+        LLM_CALLS.inc(model=model, mode='call', outcome='error')
+        raise
+    LLM_CALLS.inc(model=model, mode='call', outcome='ok')
+    if response.usage is not None:
+        record_llm_usage(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+    content = response.choices[0].message.content
+    if validate is not None:
+        validate(content)
+    if cache and content is not None:
+        cache.set(key, content)
+    return content
+
+# Coroutine version of call_llm_model for the ASGI mode; cancelling it aborts the request to the model.
+async def acall_llm_model(model, messages, temperature=1.0, top_p=1.0, validate=None):
+    cache = get_llm_cache()
+    key = cache_key(model, messages, temperature=temperature, top_p=top_p) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        async with _llm_slots():
+            with span('llm'):
+                response = await get_async_client().chat.completions.create(
+                    messages=messages,
+                    temperature=temperature,
+                    top_p=top_p,
+                    model=model)
+    except Exception:
+        LLM_CALLS.inc(model=model, mode='call', outcome='error')
+        raise
+    LLM_CALLS.inc(model=model, mode='call', outcome='ok')
+    if response.usage is not None:
+        record_llm_usage(model, response.usage.prompt_tokens, response.usage.completion_tokens)
+    content = response.choices[0].message.content
+    if validate is not None:
+        validate(content)
+    if cache and content is not None:
+        cache.set(key, content)
+    return content
+
+# Streaming variant of call_llm_model: yields pieces of the reply as the model produces them.
+# A cached reply is yielded in one piece; a finished stream is cached like a normal call.
+def stream_llm_model(model, messages, temperature=1.0, top_p=1.0, validate=None):
+    cache = get_llm_cache()
+    key = cache_key(model, messages, temperature=temperature, top_p=top_p) if cache else None
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    start = time.perf_counter()
+    usage = None
+    parts = []
+    try:
+        stream = get_client().chat.completions.create(
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            model=model,
+            stream=True)
+        for chunk in stream:
+            # providers that report usage for streams send it on a last chunk without choices
+            if getattr(chunk, 'usage', None) is not None:
+                usage = chunk.usage
+            # some providers send a leading chunk without choices (content filter results)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    record_span('llm.first_token', time.perf_counter() - start)
+                parts.append(delta)
+                yield delta
+    except Exception:
+        LLM_CALLS.inc(model=model, mode='stream', outcome='error')
+        raise
+    finally:
+        record_span('llm.stream', time.perf_counter() - start)
+    LLM_CALLS.inc(model=model, mode='stream', outcome='ok')
+    content = ''.join(parts)
+    if usage is not None:
+        record_llm_usage(model, usage.prompt_tokens, usage.completion_tokens)
+    else:
+        record_llm_usage(model, sum(estimate_tokens(m['content']) for m in messages), estimate_tokens(content))
+    if validate is not None:
+        validate(content)
+    if cache:
+        cache.set(key, content)
+
+def _translate_messages(note_content, target_language):
+    return [
         {
             "role": "system",
             "content": f"You are a translator. Translate the following content into {target_language} accurately. Keep the structure of the content unchanged."
@@ -29,9 +229,88 @@ def translate_note(note_content, target_language):
             "content": note_content
         }
     ]
-    return call_llm_model(model, messages)
 
-def process_user_notes(language, user_input):
+# A function to translate to target language
+def translate_note(note_content, target_language):
+    return call_llm_model(model, _translate_messages(note_content, target_language))
+
+# Translate one chunk, retrying transient failures so one bad call does not sink the whole note.
+# In a cancelled background job the chunks that have not been sent yet are skipped.
+def _translate_chunk(text, target_language):
+    for attempt in range(TRANSLATE_RETRIES + 1):
+        check_cancelled()
+        try:
+            return translate_note(text, target_language).strip()
+        except _transient_errors():
+            if attempt == TRANSLATE_RETRIES:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
+async def _atranslate_chunk(text, target_language):
+    for attempt in range(TRANSLATE_RETRIES + 1):
+        try:
+            return (await acall_llm_model(model, _translate_messages(text, target_language))).strip()
+        except _transient_errors():
+            if attempt == TRANSLATE_RETRIES:
+                raise
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+# Streams a translation. Short texts stream token by token; long texts are split with
+# split_for_translation, all chunks run in parallel and are yielded in document order.
+def stream_translate_note(note_content, target_language):
+    layout = split_for_translation(note_content, TRANSLATE_CHUNK_TOKENS)
+    if sum(1 for _, translate in layout if translate) <= 1:
+        for piece, translate in layout:
+            if translate:
+                yield from stream_llm_model(model, _translate_messages(piece, target_language))
+            else:
+                yield piece
+        return
+
+    futures = [submit(_translate_chunk, piece, target_language) if translate else piece
+               for piece, translate in layout]
+    try:
+        for item in futures:
+            yield item if isinstance(item, str) else item.result()
+    finally:
+        # the client went away or a chunk failed: drop chunks that have not started yet
+        for item in futures:
+            if not isinstance(item, str):
+                item.cancel()
+
+# Translate several texts at once; returns translations (or exceptions) in input order.
+# Every text is split along paragraph/list/code boundaries (src/utils/chunking.py) and the chunks
+# of all texts share one fan-out, so a long note takes about as long as its longest chunk.
+# Code blocks and the whitespace between chunks are copied through untranslated.
+def translate_many(texts, target_language):
+    layouts = [split_for_translation(text, TRANSLATE_CHUNK_TOKENS) for text in texts]
+    chunks = [(piece, target_language) for layout in layouts for piece, translate in layout if translate]
+    return _reassemble(layouts, run_concurrently(_translate_chunk, chunks))
+
+# Coroutine version of translate_many: the chunks are gathered on the event loop instead of a thread pool
+async def atranslate_many(texts, target_language):
+    layouts = [split_for_translation(text, TRANSLATE_CHUNK_TOKENS) for text in texts]
+    outputs = await asyncio.gather(*(_atranslate_chunk(piece, target_language)
+                                     for layout in layouts for piece, translate in layout if translate),
+                                   return_exceptions=True)
+    return _reassemble(layouts, outputs)
+
+# Put the chunk translations (or exceptions) back together, one translation (or exception) per text
+def _reassemble(layouts, outputs):
+    outputs = iter(outputs)
+    results = []
+    for layout in layouts:
+        parts, failed = [], None
+        for piece, translate in layout:
+            output = next(outputs) if translate else piece
+            if isinstance(output, Exception):
+                failed = failed or output
+            else:
+                parts.append(output)
+        results.append(failed if failed is not None else ''.join(parts))
+    return results
+
+def _user_notes_messages(language, user_input):
     system_prompt = '''Extract the user's notes into the following structured fields:
     1. Title: A concise title of the notes less than 5 words
     2. Notes: The notes based on user input written in full sentences.
@@ -54,10 +333,18 @@ def process_user_notes(language, user_input):
         {"role": "system", "content": system_prompt_filled},
         {"role": "user", "content": user_input}
     ]
-    response_content = call_llm_model(model, messages)
+    return messages
+
+def process_user_notes(language, user_input):
     import json
+    response_content = call_llm_model(model, _user_notes_messages(language, user_input), validate=json.loads)
     return json.loads(response_content)
 
+# Streams the raw JSON text of process_user_notes; see src/utils/partial_json.py to read fields early
+def stream_user_notes(language, user_input):
+    import json
+    return stream_llm_model(model, _user_notes_messages(language, user_input), validate=json.loads)
+
 # if __name__ == "__main__":
 #     result1 = process_user_notes("Chinese", "Get up tomorrow 7am")
 #     print(result1)
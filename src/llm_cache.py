@@ -0,0 +1,143 @@
+"""Two-tier cache for LLM completions.
+
+Keys are a SHA-256 of the model, the full message list (prompt template plus
+user input) and the sampling parameters, so a repeated translation or note
+generation is answered without calling the model. The first tier is an
+in-process LRU with a TTL; the second is a SQLite file that survives restarts.
+
+Settings: LLM_CACHE=0 disables caching; LLM_CACHE_SIZE and LLM_CACHE_TTL size
+the memory tier; LLM_CACHE_PATH and LLM_CACHE_DISK_TTL configure the SQLite
+tier (LLM_CACHE_PATH='' keeps the cache in memory only).
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from src.store.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_PATH = os.path.join(ROOT_DIR, 'database', 'llm_cache.db')
+
+
+def cache_key(model, messages, **params):
+    payload = json.dumps({'model': model, 'messages': messages, 'params': params},
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SqliteTier:
+    def __init__(self, path, ttl):
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS llm_cache '
+                           '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                               (key, value, time.time() + self.ttl))
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache WHERE expires_at < ?', (time.time(),))
+
+
+class LLMCache:
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        memory = LRUCache(maxsize=int(os.environ.get('LLM_CACHE_SIZE', 1024)),
+                          ttl=float(os.environ.get('LLM_CACHE_TTL', 3600)))
+        path = os.environ.get('LLM_CACHE_PATH', DEFAULT_PATH)
+        disk = None
+        if path:
+            try:
+                disk = SqliteTier(path, float(os.environ.get('LLM_CACHE_DISK_TTL', 30 * 24 * 3600)))
+                disk.purge_expired()
+            except (OSError, sqlite3.Error) as e:
+                # e.g. a read-only filesystem: carry on with the memory tier
+                logger.warning('LLM cache: persistent tier disabled (%s)', e)
+        return cls(memory, disk)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                logger.warning('LLM cache: could not persist entry (%s)', e)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': self.memory.stats()['size'],
+                'persistent': self.disk is not None,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide cache, or None when LLM_CACHE=0."""
+    global _cache
+    if os.environ.get('LLM_CACHE', '1') == '0':
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache.from_env()
+    return _cache
+
+
+def existing_llm_cache():
+    """Return the process-wide cache if it has been created, else None (nothing is created)."""
+    return _cache
@@ -9,8 +9,16 @@ from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.pool import NullPool
 from src.models.user import db
+from src.models.note import Note  # noqa: F401 (registers the note table for create_all)
 from src.routes.user import user_bp
 from src.routes.note import note_bp
+from src.routes.job import job_bp
+from src.routes.metrics import metrics_bp
+from src.metrics import init_app as init_metrics
+from src.json_provider import init_app as init_json
+from src.compression import init_app as init_compression
+from src.current_user import init_app as init_current_user
+from src.store.sql_store import engine_options
 
 # load environment variables from .env if present
 load_dotenv()
@@ -20,35 +28,57 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
 # Enable CORS for all routes
 CORS(app)
+# orjson-backed jsonify when installed (JSON_PROVIDER=std for the standard library)
+init_json(app)
 
 # register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(note_bp, url_prefix='/api')
+app.register_blueprint(job_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
+# per-route timing, Server-Timing headers and the optional slow-request profiler
+init_metrics(app)
+# X-User-Id selects whose notes a request sees (see src/current_user.py)
+init_current_user(app)
+# gzip/brotli for large JSON responses; registered after metrics so its span lands in Server-Timing
+init_compression(app)
+ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 # configure database: prefer DATABASE_URL environment variable (e.g. Supabase Postgres)
 db_url = os.environ.get('DATABASE_URL')
 if db_url:
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 else:
     # fallback to local sqlite as before
-    ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     DB_PATH = os.path.join(ROOT_DIR, 'database', 'app.db')
     # ensure database directory exists
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{DB_PATH}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-from sqlalchemy.exc import OperationalError
+# pooled, pre-pinged engine with statement caching (also used by NOTE_STORE=sql)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 db.init_app(app)
-with app.app_context():
-    try:
-        db.create_all()
-    except OperationalError as e:
-        # If the configured DATABASE_URL (e.g. Supabase) is unreachable, avoid crashing on startup.
-        # This allows the app to start locally (e.g. for static file serving) while the DB is down.
-        print('Warning: could not connect to the database during startup. Skipping create_all().')
-        print('Database error:', e)
-        # You may want to retry, exit, or surface an alert here depending on your deployment.
+# The schema is created and upgraded by Alembic (`alembic upgrade head` or `flask --app src.main init-db`),
+# not at import: a serverless cold start should not pay for a database round trip before its first request.
+
+
+def migrate_database():
+    """Bring the configured database up to the latest Alembic revision."""
+    from alembic import command
+    from alembic.config import Config
+    # no ini file: alembic.ini would also reconfigure logging for the whole process
+    config = Config()
+    config.set_main_option('script_location', os.path.join(ROOT_DIR, 'alembic'))
+    # alembic/env.py prefers DATABASE_URL; without it, migrate the same SQLite file the app uses
+    config.set_main_option('sqlalchemy.url', app.config['SQLALCHEMY_DATABASE_URI'].replace('%', '%%'))
+    command.upgrade(config, 'head')
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema."""
+    migrate_database()
+
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -68,4 +98,6 @@ def serve(path):
 
 
 if __name__ == '__main__':
+    # local development: keep the SQLite schema current without a separate step
+    migrate_database()
     app.run(host='0.0.0.0', port=5001, debug=True)
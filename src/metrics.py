@@ -0,0 +1,347 @@
+"""Lightweight request instrumentation.
+
+Every API request is timed, and the code it runs can time parts of its work with
+`with span('store.get_note'):`. A request's spans are summed per name and sent
+back in a `Server-Timing` header (browser dev tools show them next to the
+request), and all durations feed Prometheus histograms that GET /api/metrics
+serves together with request and LLM call counters, LLM token usage and cache
+hit rates.
+
+PROFILE_SLOW_REQUESTS=1 turns on a sampling profiler: while a request runs, its
+thread's stack is sampled every PROFILE_INTERVAL_MS (default 5). Requests slower
+than PROFILE_MIN_MS (default 500) are written to PROFILE_DIR (default
+database/profiles) as collapsed stacks ("frame;frame;frame count" per line, the
+input format of flamegraph.pl and speedscope); only the PROFILE_KEEP (default
+20) slowest are kept.
+"""
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_PROFILE_DIR = os.path.join(ROOT_DIR, 'database', 'profiles')
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def family(name, kind, help_text, samples):
+    """Prometheus text for one metric family; samples are (suffix, [(label, value), ...], value)."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for suffix, pairs, value in samples:
+        lines.append(f'{name}{suffix}{_labels(pairs)} {_number(value)}')
+    return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return family(self.name, 'counter', self.help,
+                      [('', list(zip(self.labels, key)), value) for key, value in items])
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        samples = []
+        for key, (counts, total, count) in items:
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(('_bucket', pairs + [('le', _number(float(bound)))], cumulative))
+            samples.append(('_bucket', pairs + [('le', '+Inf')], count))
+            samples.append(('_sum', pairs, total))
+            samples.append(('_count', pairs, count))
+        return family(self.name, 'histogram', self.help, samples)
+
+
+REQUESTS = Counter('http_requests_total', 'API requests by route and status.', ('method', 'route', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'API request duration, including streamed bodies.',
+                            ('method', 'route'))
+SPAN_SECONDS = Histogram('span_duration_seconds', 'Time spent in instrumented operations (store, llm, ...).',
+                         ('span',))
+LLM_CALLS = Counter('llm_calls_total', 'Model calls by mode (call/stream) and outcome.', ('model', 'mode', 'outcome'))
+LLM_TOKENS = Counter('llm_tokens_total',
+                     'Model token usage; streamed replies without a usage report are estimated.',
+                     ('model', 'type'))
+LLM_COMPLETION_TOKENS = Histogram('llm_completion_tokens', 'Completion tokens per model call.', ('model',),
+                                  buckets=TOKEN_BUCKETS)
+
+
+def render(extra=()):
+    """All registered metrics, plus `extra` families (lists of lines), in Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for block in extra:
+        lines.extend(block)
+    return '\n'.join(lines) + '\n'
+
+
+# -- spans -------------------------------------------------------------------
+
+class RequestTiming:
+    """Span durations of one request, summed per name."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            total, count = self.spans.get(name, (0.0, 0))
+            self.spans[name] = (total + seconds, count + 1)
+
+    def header(self):
+        entries = []
+        with self._lock:
+            spans = list(self.spans.items())
+        for name, (total, count) in spans:
+            desc = f';desc="{count} calls"' if count > 1 else ''
+            entries.append(f'{name}{desc};dur={total * 1000:.1f}')
+        entries.append(f'total;dur={(time.perf_counter() - self.start) * 1000:.1f}')
+        return ', '.join(entries)
+
+
+_timing = contextvars.ContextVar('request_timing', default=None)
+
+
+def record_span(name, seconds):
+    SPAN_SECONDS.observe(seconds, span=name)
+    timing = _timing.get()
+    if timing is not None:
+        timing.add(name, seconds)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as `name` (in the histograms and the current request's Server-Timing)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def in_context(fn):
+    """fn wrapped to run in a copy of the caller's context, so spans in a worker thread count for the request."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def record_llm_usage(model, prompt_tokens, completion_tokens):
+    LLM_TOKENS.inc(prompt_tokens, model=model, type='prompt')
+    LLM_TOKENS.inc(completion_tokens, model=model, type='completion')
+    LLM_COMPLETION_TOKENS.observe(completion_tokens, model=model)
+
+
+# -- sampling profiler ---------------------------------------------------------
+
+class SlowRequestProfiler:
+    """Samples the stacks of threads that are serving a request and keeps the slowest requests' samples."""
+
+    def __init__(self, directory, interval=0.005, min_seconds=0.5, keep=20):
+        self.directory = directory
+        self.interval = interval
+        self.min_seconds = min_seconds
+        self.keep = keep
+        self._active = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def begin(self):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = _Tally()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        return ident
+
+    def end(self, ident, seconds, label):
+        with self._lock:
+            samples = self._active.pop(ident, None)
+        if samples and seconds >= self.min_seconds:
+            self._dump(samples, seconds, label)
+
+    @staticmethod
+    def _fold(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                idents = [i for i in self._active if i != me]
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            folded = {i: self._fold(frames[i]) for i in idents if i in frames}
+            with self._lock:
+                for ident, stack in folded.items():
+                    samples = self._active.get(ident)
+                    if samples is not None:
+                        samples[stack] += 1
+
+    def _dump(self, samples, seconds, label):
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', label).strip('-')[:80]
+        # the duration leads the file name so the slowest sort first
+        name = f'{int(seconds * 1000):07d}ms-{slug}-{int(time.time() * 1000)}.folded'
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        dumps = sorted((f for f in os.listdir(self.directory) if f.endswith('.folded')), reverse=True)
+        for old in dumps[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+
+
+def profiler_from_env():
+    if os.environ.get('PROFILE_SLOW_REQUESTS', '0') != '1':
+        return None
+    return SlowRequestProfiler(os.environ.get('PROFILE_DIR', DEFAULT_PROFILE_DIR),
+                               interval=float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000,
+                               min_seconds=float(os.environ.get('PROFILE_MIN_MS', 500)) / 1000,
+                               keep=int(os.environ.get('PROFILE_KEEP', 20)))
+
+
+# -- flask hooks ---------------------------------------------------------------
+
+def _instrument_sqlalchemy():
+    # every SQL statement (users, NOTE_STORE=sql) is a `db` span
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('span_starts', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        record_span('db', time.perf_counter() - conn.info['span_starts'].pop())
+
+    @event.listens_for(Engine, 'handle_error')
+    def _failed_execute(exception_context):
+        starts = exception_context.connection.info.get('span_starts') if exception_context.connection else None
+        if starts:
+            record_span('db', time.perf_counter() - starts.pop())
+
+
+def init_app(app):
+    """Time every blueprint route of `app` and add Server-Timing headers to its responses."""
+    from flask import g, request
+
+    profiler = profiler_from_env()
+    _instrument_sqlalchemy()
+
+    @app.before_request
+    def _start_timing():
+        if request.blueprint is None:
+            # static files
+            return
+        g.request_timing = RequestTiming()
+        g.request_timing_token = _timing.set(g.request_timing)
+        g.profile_ident = profiler.begin() if profiler is not None else None
+
+    @app.after_request
+    def _finish_timing(response):
+        timing = g.pop('request_timing', None)
+        if timing is None:
+            return response
+        response.headers['Server-Timing'] = timing.header()
+        method = request.method
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        status = str(response.status_code)
+        token = g.pop('request_timing_token')
+        ident = g.pop('profile_ident', None)
+
+        def finished():
+            # runs once the body has been sent, so streamed responses are timed in full
+            if timing.finished:
+                return
+            timing.finished = True
+            seconds = time.perf_counter() - timing.start
+            REQUESTS.inc(method=method, route=route, status=status)
+            REQUEST_SECONDS.observe(seconds, method=method, route=route)
+            if ident is not None:
+                profiler.end(ident, seconds, f'{method} {route}')
+            try:
+                _timing.reset(token)
+            except (ValueError, RuntimeError):
+                # closed from another context (e.g. by the server after a disconnect)
+                pass
+
+        response.call_on_close(finished)
+        return response
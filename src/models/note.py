@@ -14,6 +14,17 @@ class Note(db.Model):
     start_time = db.Column(db.Time, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # set instead of deleting the row, so the change feed can report the deletion
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    # bumped on every write; PATCH requests must name the version they edited
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # the owner (see src/current_user.py); NULL for notes written without X-User-Id
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+
+    __table_args__ = (
+        # reads are scoped to one owner; keyset pagination of GET /api/notes walks (updated_at, id) within it
+        db.Index('ix_note_user_id_updated_at_id', 'user_id', 'updated_at', 'id'),
+    )
     
     def __repr__(self):
         return f'<Note {self.title}>'
@@ -27,6 +38,7 @@ class Note(db.Model):
             'event_date': self.event_date.isoformat() if self.event_date else None,
             'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
         }
 
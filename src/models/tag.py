@@ -0,0 +1,25 @@
+from src.models.user import db
+
+
+class Tag(db.Model):
+    """A distinct tag name; rows are maintained by database triggers (alembic 0006) from Note.tags."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (
+        db.Index('ux_tag_name', 'name', unique=True),
+    )
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
+
+
+# one row per live note and tag, carrying the note's owner (alembic 0008) so tag queries stay within one user
+note_tag = db.Table(
+    'note_tag',
+    db.Column('note_id', db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('user_id', db.Integer, nullable=True),
+    db.Index('ix_note_tag_tag_id_user_id_note_id', 'tag_id', 'user_id', 'note_id'),
+    db.Index('ix_note_tag_user_id_tag_id', 'user_id', 'tag_id'),
+)
@@ -0,0 +1,77 @@
+import json
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from src.current_user import current_user_id
+from src.jobs import get_job_queue, FINISHED
+
+job_bp = Blueprint('job', __name__)
+
+MAX_WAIT = 30
+
+
+def _queue():
+    return get_job_queue(current_app._get_current_object())
+
+
+def _own(job):
+    # another user's job looks the same as a missing one
+    return job if job is not None and job['user_id'] == current_user_id() else None
+
+
+@job_bp.route('/jobs', methods=['GET'])
+def job_stats():
+    return jsonify(_queue().stats(current_user_id()))
+
+
+# 轮询任务状态；?wait=<秒> 时长轮询，任务完成或超时后返回
+@job_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        wait = min(float(request.args.get('wait', 0)), MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'wait must be a number'}), 400
+    queue = _queue()
+    job = _own(queue.get(job_id))
+    if job is not None and wait > 0:
+        job = queue.wait(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@job_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    queue = _queue()
+    if _own(queue.get(job_id)) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(queue.cancel(job_id))
+
+
+# 订阅任务（SSE）：状态变化时推送 status 事件，结束时推送 done 事件
+@job_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    queue = _queue()
+    job = _own(queue.get(job_id))
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events():
+        current = job
+        last_status = None
+        while True:
+            if current['status'] != last_status:
+                last_status = current['status']
+                event = 'done' if last_status in FINISHED else 'status'
+                yield f"event: {event}\ndata: {json.dumps(current, ensure_ascii=False)}\n\n"
+            if last_status in FINISHED:
+                return
+            current = queue.wait(job_id, 15)
+            if current is None:
+                return
+            if current['status'] == last_status:
+                # keep-alive comment so proxies do not close an idle stream
+                yield ': waiting\n\n'
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,59 @@
+import hmac
+import os
+
+from flask import Blueprint, Response, jsonify, request
+from src import metrics
+from src.llm_cache import existing_llm_cache
+from src.store.note_store import existing_note_store
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def _hit_ratio(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def _cache_families():
+    # 缓存命中率在抓取时从各缓存的统计中读取；尚未创建的存储和缓存不会因抓取而被创建
+    families = []
+    store = existing_note_store()
+    if store is not None and hasattr(store, 'stats'):
+        stats = store.stats()
+        families.append(metrics.family('note_cache_requests_total', 'counter', 'Note cache lookups by result.', [
+            ('', [('result', 'hit')], stats['hits']), ('', [('result', 'miss')], stats['misses'])]))
+        families.append(metrics.family('note_cache_hit_ratio', 'gauge', 'Share of note cache lookups that hit.', [
+            ('', [], _hit_ratio(stats['hits'], stats['misses']))]))
+        families.append(metrics.family('note_cache_entries', 'gauge', 'Entries in the in-process note cache.', [
+            ('', [], stats['size'])]))
+    cache = existing_llm_cache()
+    if cache is not None:
+        stats = cache.stats()
+        families.append(metrics.family('llm_cache_requests_total', 'counter', 'LLM cache lookups by result.', [
+            ('', [('result', 'memory_hit')], stats['memory_hits']),
+            ('', [('result', 'disk_hit')], stats['disk_hits']),
+            ('', [('result', 'miss')], stats['misses'])]))
+        families.append(metrics.family('llm_cache_hit_ratio', 'gauge', 'Share of LLM cache lookups that hit.', [
+            ('', [], stats['hit_rate'])]))
+        families.append(metrics.family('llm_cache_entries', 'gauge', 'Entries in the in-memory LLM cache.', [
+            ('', [], stats['memory_entries'])]))
+    return families
+
+
+def _authorized():
+    """The request carries `Authorization: Bearer <METRICS_TOKEN>`."""
+    token = os.environ.get('METRICS_TOKEN')
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+# Prometheus 抓取接口：请求耗时直方图、各 span 耗时、LLM 调用与 token 用量、缓存命中率
+# 需设置 METRICS_TOKEN 并以 Bearer 令牌访问；未设置时接口关闭（404）
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    if not os.environ.get('METRICS_TOKEN'):
+        return jsonify({'error': 'Metrics are disabled; set METRICS_TOKEN to enable them'}), 404
+    if not _authorized():
+        response = jsonify({'error': 'Invalid or missing metrics token'})
+        response.headers['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response, 401
+    return Response(metrics.render(_cache_families()), content_type='text/plain; version=0.0.4; charset=utf-8')
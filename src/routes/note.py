@@ -1,131 +1,675 @@
-import os
-from flask import Blueprint, jsonify, request
-from src.models.note import Note, db
-from src.llm import translate_note, process_user_notes
+import hashlib
+import itertools
+from contextlib import closing
+from datetime import timezone
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from src.llm import translate_many, translate_note, stream_translate_note, process_user_notes, stream_user_notes, submit
+from src.llm_cache import get_llm_cache
+from src.metrics import span
 import json
 from datetime import datetime
-from datetime import date as date_cls, timedelta
+from datetime import date as date_cls, time as time_cls, timedelta
 import re
-from src.utils.date_utils import normalize_date, normalize_time, extract_date_from_text, extract_time_from_text
-from supabase import create_client, Client
+from src.utils.date_utils import normalize_date, normalize_time, normalize_many, extract_date_from_text, extract_time_from_text
+from src.utils.ndjson import MAX_LINE_BYTES, encode_lines, gzip_chunks, iter_lines, read_chunks
+from src.utils.partial_json import PartialObjectReader
+from src.utils.local_generate import local_note
+from src.store.note_store import get_note_store, NoteNotFoundError, VersionConflictError, parse_fields, normalize_tags, encode_cursor, decode_cursor, encode_agenda_cursor, decode_agenda_cursor, hold_back
+from src.store.write_buffer import get_write_buffer, flush_pending, pending_note
+from src.search import service as search_index
+from src.jobs import check_cancelled, get_job_queue, register_handler
+from src.current_user import current_user_id
 
 note_bp = Blueprint('note', __name__)
 
-# 初始化Supabase客户端（新增代码）
-SUPABASE_URL = os.environ.get('SUPABASE_URL')
-SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("请在.env文件中配置SUPABASE_URL和SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)  # 创建Supabase客户端实例
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BATCH_SIZE = 500
+MAX_TRANSLATE_BATCH = 50
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = MAX_BATCH_SIZE
+# the summary of a non-streamed import lists at most this many failed lines
+MAX_IMPORT_ERRORS = 100
 
-# 获取所有笔记（使用 Supabase 客户端）
+
+def _conditional_json(payload, notes):
+    """jsonify payload with a strong ETag and Last-Modified derived from the notes' updated_at.
+
+    Returns 304 without a body when the client's If-None-Match/If-Modified-Since still holds.
+    """
+    digest = hashlib.sha1(request.query_string)
+    for note in notes:
+        digest.update(f"|{note.get('id')}:{note.get('updated_at')}".encode())
+    with span('serialize'):
+        response = jsonify(payload)
+    response.set_etag(digest.hexdigest())
+    stamps = [n['updated_at'] for n in notes if n.get('updated_at')]
+    if stamps:
+        last_modified = datetime.fromisoformat(max(stamps))
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        response.last_modified = last_modified
+    # let browsers keep the copy but revalidate it on every request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
+def _parse_tags(tags):
+    # 确保 tags 是数组（处理前端可能传入的字符串情况）
+    if tags is None or isinstance(tags, list):
+        return tags
+    return [t.strip() for t in str(tags).split(',') if t.strip()]  # 字符串转数组
+
+
+def _create_fields(data):
+    """Build the fields of a new note from a request body; raises ValueError if invalid."""
+    if not data or 'title' not in data or 'content' not in data:
+        raise ValueError('Title and content are required')
+    return {
+        'title': data['title'],
+        'content': data['content'],
+        'tags': _parse_tags(data.get('tags', [])) or [],
+        'event_date': data.get('event_date'),
+        'start_time': data.get('start_time'),
+    }
+
+
+def _update_fields(data):
+    """Build the fields to change from a request body; fields that are absent or null are kept."""
+    if not data:
+        raise ValueError('No data provided')
+    update_data = {
+        'title': data.get('title'),
+        'content': data.get('content'),
+        'tags': _parse_tags(data.get('tags')),
+        'event_date': data.get('event_date'),
+        'start_time': data.get('start_time'),
+    }
+    # 过滤空值（不更新未提供的字段）
+    return {k: v for k, v in update_data.items() if v is not None}
+
+
+def _apply_text_ops(text, ops):
+    """Apply [{"pos", "delete", "insert"}, ...] splices to text, in order."""
+    if not isinstance(ops, list):
+        raise ValueError('content_ops must be a list')
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError(f'content_ops entries must be objects: {op!r}')
+        pos, delete, insert = int(op.get('pos', 0)), int(op.get('delete', 0)), op.get('insert', '')
+        if not isinstance(insert, str):
+            raise ValueError(f'content_ops insert must be a string: {op}')
+        if pos < 0 or delete < 0 or pos + delete > len(text):
+            raise ValueError(f'content_ops out of range: {op}')
+        text = text[:pos] + insert + text[pos + delete:]
+    return text
+
+
+def _patch_fields(note, data):
+    """Fields changed by a PATCH body; content may come whole or as content_ops against the note."""
+    body = {k: v for k, v in data.items() if k not in ('version', 'content_ops')}
+    fields = _update_fields(body) if body else {}
+    if 'content_ops' in data:
+        if 'content' in fields:
+            raise ValueError('Send either content or content_ops, not both')
+        fields['content'] = _apply_text_ops(note.get('content') or '', data['content_ops'])
+    return {k: v for k, v in fields.items() if note.get(k) != v}
+
+
+def _check_date_time(fields):
+    # 批量操作中提前校验，避免一条坏数据让整个事务回滚
+    if fields.get('event_date'):
+        date_cls.fromisoformat(str(fields['event_date']))
+    if fields.get('start_time'):
+        time_cls.fromisoformat(str(fields['start_time']))
+    return fields
+
+
+def _tag_filter():
+    """?tag=a&tag=b&match=all|any -> (tag names, match_any)."""
+    match = request.args.get('match', 'all').lower()
+    if match not in ('all', 'any'):
+        raise ValueError("match must be 'all' or 'any'")
+    return normalize_tags(request.args.getlist('tag')) or None, match == 'any'
+
+
+def _list_query():
+    """GET /notes arguments -> (page size, or None for the whole list; list_notes keyword arguments)."""
+    fields = parse_fields(request.args.get('fields'))
+    tags, match_any = _tag_filter()
+    query = {'fields': fields, 'tags': tags, 'match_any': match_any}
+    cursor = request.args.get('cursor')
+    if cursor is None and 'limit' not in request.args:
+        return None, query
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    # fetch one extra row to know whether another page exists
+    return limit, dict(query, limit=limit + 1, after=decode_cursor(cursor) if cursor else None)
+
+
+def _list_response(notes, limit, query):
+    if limit is None:
+        return _conditional_json(notes, notes)
+    next_cursor = encode_cursor(notes[limit - 1]) if len(notes) > limit else None
+    page = {'notes': notes[:limit], 'next_cursor': next_cursor}
+    if query['after'] is None:
+        # where a client that just loaded the first page should start /notes/changes
+        page['sync_cursor'] = encode_cursor(notes[0]) if notes else None
+    return _conditional_json(page, notes)
+
+
+# 获取笔记列表
+# 不带 limit/cursor 时返回全部笔记（数组）；带上时按 (updated_at, id) 游标分页：
+#   GET /api/notes?limit=50&fields=id,title,preview  ->  {"notes": [...], "next_cursor": "..."}
+# 按标签筛选（走 tag / note_tag 索引）：?tag=a&tag=b 同时带有全部标签，加 &match=any 带有任一标签
 @note_bp.route('/notes', methods=['GET'])
 def get_notes():
     try:
-        # 调用 Supabase 表查询
-        response = supabase.table('note').select('*').order('updated_at', desc=True).execute()
-        # 处理响应数据
-        if response.data:
-            return jsonify(response.data)
-        return jsonify([])
+        limit, query = _list_query()
+        return _list_response(get_note_store().list_notes(**query), limit, query)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# 替换原 SQLAlchemy 插入逻辑
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date_cls.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+def _agenda_query():
+    """GET /notes/agenda arguments -> (page size, list_agenda keyword arguments)."""
+    fields = parse_fields(request.args.get('fields'))
+    if fields:
+        # grouping and the cursor need both
+        fields = tuple(dict.fromkeys(fields + ('event_date', 'start_time')))
+    start, end = _date_arg('from'), _date_arg('to')
+    if start and end and start > end:
+        raise ValueError('from must not be after to')
+    cursor = request.args.get('cursor')
+    after = decode_agenda_cursor(cursor) if cursor else None
+    if 'upcoming' in request.args:
+        limit = request.args.get('upcoming', DEFAULT_PAGE_SIZE, type=int)
+        now = datetime.fromisoformat(request.args['now']) if request.args.get('now') else datetime.now()
+        start = now.date().isoformat()
+        if after is None:
+            # strictly after (today, now, id 0): notes starting from now on, today's untimed ones, later days
+            after = (start, now.strftime('%H:%M:%S'), 0)
+    else:
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return limit, {'start': start, 'end': end, 'after': after, 'limit': limit + 1, 'fields': fields}
+
+
+def _agenda_response(notes, limit):
+    next_cursor = encode_agenda_cursor(notes[limit - 1]) if len(notes) > limit else None
+    days = []
+    for note in notes[:limit]:
+        if not days or days[-1]['date'] != note['event_date']:
+            days.append({'date': note['event_date'], 'notes': []})
+        days[-1]['notes'].append(note)
+    return _conditional_json({'days': days, 'next_cursor': next_cursor}, notes[:limit])
+
+
+# 日程视图：有 event_date 的笔记按 (event_date, start_time, id) 排序、按天分组，游标分页（走 ix_note_agenda 索引）
+#   GET /api/notes/agenda?from=2025-01-01&to=2025-01-31&limit=50
+#   ->  {"days": [{"date": "2025-01-02", "notes": [...]}, ...], "next_cursor": "..."}
+# 没有时间的笔记排在当天最后；同一天可能跨两页，客户端按 date 合并
+# ?upcoming=10：从现在起的 10 条（今天已过去的时间不算），从索引中的当前位置开始读，不扫描过去的日程；
+# 可用 &now=2025-01-01T09:30 传入客户端的本地时间
+@note_bp.route('/notes/agenda', methods=['GET'])
+def get_agenda():
+    try:
+        limit, query = _agenda_query()
+        return _agenda_response(get_note_store().list_agenda(**query), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# 标签及其笔记数（已删除的笔记不计），按使用次数降序；结果缓存，任何写操作后失效
+#   GET /api/tags  ->  [{"tag": "work", "count": 12}, ...]
+@note_bp.route('/tags', methods=['GET'])
+def get_tags():
+    try:
+        return jsonify(get_note_store().tag_counts())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 增量同步：返回 since 游标之后新建/修改的笔记，以及已删除笔记的墓碑记录
+#   GET /api/notes/changes?since=<cursor>  ->  {"changes": [...], "cursor": "...", "has_more": false}
+@note_bp.route('/notes/changes', methods=['GET'])
+def get_note_changes():
+    try:
+        since = request.args.get('since')
+        after = decode_cursor(since) if since else None
+        limit = max(1, min(request.args.get('limit', MAX_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        changes = get_note_store().list_changes(after=after, limit=limit + 1)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        position = (changes[-1]['updated_at'], changes[-1]['id']) if changes else after
+        if not has_more:
+            # recent changes are sent again on the next poll; clients merge by id
+            position = hold_back(position, after)
+        cursor = encode_cursor({'updated_at': position[0], 'id': position[1]}) if position else None
+        return jsonify({'changes': changes, 'cursor': cursor, 'has_more': has_more})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 创建笔记
 @note_bp.route('/notes', methods=['POST'])
 def create_note():
     try:
-        data = request.json
-        if not data or 'title' not in data or 'content' not in data:
-            return jsonify({'error': 'Title and content are required'}), 400
-
-        # 处理标签（转为JSON字符串，与原逻辑一致）
-        tags = data.get('tags', [])
-        # 确保 tags 是数组（处理前端可能传入的字符串情况）
-        if not isinstance(tags, list):
-            tags = [t.strip() for t in str(tags).split(',') if t.strip()]  # 字符串转数组
-
-        # 构造插入数据
-        note_data = {
-            'title': data['title'],
-            'content': data['content'],
-            'tags': tags,
-            'event_date': data.get('event_date'),
-            'start_time': data.get('start_time'),
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
-        }
-
-        response = supabase.table('note').insert(note_data).execute()
-        return jsonify(response.data[0]), 201  # 返回创建的笔记
+        try:
+            note_data = _create_fields(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        note = get_note_store().create_note(note_data)
+        search_index.index_note(note)
+        return jsonify(note), 201  # 返回创建的笔记
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# 替换原 SQLAlchemy 查询
+# 获取单个笔记
 @note_bp.route('/notes/<int:note_id>', methods=['GET'])
 def get_note(note_id):
     try:
-        response = supabase.table('note').select('*').eq('id', note_id).single().execute()
-        return jsonify(response.data)
-    except Exception as e:
+        note = pending_note(note_id) or get_note_store().get_note(note_id)
+        return _conditional_json(note, [note])
+    except NoteNotFoundError:
         return jsonify({'error': 'Note not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-# 替换原 SQLAlchemy 更新逻辑
+# 更新笔记
 @note_bp.route('/notes/<int:note_id>', methods=['PUT'])
 def update_note(note_id):
     try:
-        data = request.json
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-
-        # 处理标签
-        tags = data.get('tags')
-        if tags is not None and not isinstance(tags, list):
-            tags = [t.strip() for t in str(tags).split(',') if t.strip()]  # 确保是数组
-
-        # 构造更新数据
-        update_data = {
-            'title': data.get('title'),
-            'content': data.get('content'),
-            'tags': tags,
-            'event_date': data.get('event_date'),
-            'start_time': data.get('start_time'),
-            'updated_at': datetime.utcnow().isoformat()
-        }
-        # 过滤空值（不更新未提供的字段）
-        update_data = {k: v for k, v in update_data.items() if v is not None}
-
-        response = supabase.table('note').update(update_data).eq('id', note_id).execute()
-        return jsonify(response.data[0])
+        try:
+            update_data = _update_fields(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        flush_pending(note_id)
+        note = get_note_store().update_note(note_id, update_data)
+        search_index.index_note(note)
+        return jsonify(note)
+    except NoteNotFoundError:
+        return jsonify({'error': 'Note not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
-# 替换原 SQLAlchemy 删除逻辑
+# 增量保存（自动保存用）：只发送改动，带版本号做乐观并发控制
+#   PATCH /api/notes/<id>  {"version": 3, "title": "...", "content_ops": [{"pos": 10, "delete": 2, "insert": "abc"}]}
+# 版本不一致返回 409 和服务器上的最新笔记；短时间内的连续修改在内存中合并后一次写库
+@note_bp.route('/notes/<int:note_id>', methods=['PATCH'])
+def patch_note(note_id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'version' not in data:
+        return jsonify({'error': 'version is required'}), 400
+    try:
+        version = int(data['version'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'version must be an integer'}), 400
+    try:
+        store = get_note_store()
+        buffer = get_write_buffer(store, current_app._get_current_object())
+        note = buffer.current(note_id) or store.get_note(note_id)
+        # 缓冲的修改被其他写入覆盖时，下一次 PATCH 返回 409，客户端据此重新加载
+        if buffer.lost_edits(note_id) or version != note['version']:
+            raise VersionConflictError(note)
+        try:
+            fields = _patch_fields(note, data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if not fields:
+            return jsonify(note)
+
+        note = buffer.submit(note, fields)
+        search_index.index_note(note)
+        return jsonify(note)
+    except VersionConflictError as e:
+        return jsonify({'error': 'Version conflict', 'note': e.note}), 409
+    except NoteNotFoundError:
+        return jsonify({'error': 'Note not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 删除笔记
 @note_bp.route('/notes/<int:note_id>', methods=['DELETE'])
 def delete_note(note_id):
     try:
-        supabase.table('note').delete().eq('id', note_id).execute()
+        flush_pending(note_id)
+        get_note_store().delete_note(note_id)
+        search_index.unindex_note(note_id)
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# 替换原 SQLAlchemy 搜索逻辑
+# 批量创建/更新/删除：每类操作一次批量写入，同一事务内完成
+#   POST /api/notes/batch  {"operations": [{"op": "create", "note": {...}},
+#                                          {"op": "update", "id": 1, "note": {...}},
+#                                          {"op": "delete", "id": 2}]}
+#   -> {"results": [{"status": 201, "note": {...}}, {"status": 404, "error": "..."}, ...]}
+@note_bp.route('/notes/batch', methods=['POST'])
+def batch_notes():
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} operations per batch'}), 400
+
+    results = [None] * len(operations)
+    creates, create_pos = [], []
+    updates, update_pos = [], []
+    deletes, delete_pos = [], []
+    for i, op in enumerate(operations):
+        try:
+            kind = op.get('op')
+            if kind == 'create':
+                creates.append(_check_date_time(_create_fields(op.get('note'))))
+                create_pos.append(i)
+            elif kind == 'update':
+                updates.append((int(op['id']), _check_date_time(_update_fields(op.get('note')))))
+                update_pos.append(i)
+            elif kind == 'delete':
+                deletes.append(int(op['id']))
+                delete_pos.append(i)
+            else:
+                raise ValueError(f'Unknown op: {kind}')
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            message = f'Missing field: {e}' if isinstance(e, KeyError) else str(e)
+            results[i] = {'status': 400, 'error': message}
+
+    try:
+        for note_id in {note_id for note_id, _ in updates} | set(deletes):
+            flush_pending(note_id)
+        created, updated = get_note_store().apply_batch(creates, updates, deletes)
+    except Exception as e:
+        # 数据库错误：整个批次已回滚
+        return jsonify({'error': str(e)}), 500
+
+    for i, note in zip(create_pos, created):
+        search_index.index_note(note)
+        results[i] = {'status': 201, 'note': note}
+    for i, (note_id, _) in zip(update_pos, updates):
+        note = updated.get(note_id)
+        if note is None:
+            results[i] = {'status': 404, 'error': 'Note not found'}
+        else:
+            search_index.index_note(note)
+            results[i] = {'status': 200, 'note': note}
+    for i, note_id in zip(delete_pos, deletes):
+        search_index.unindex_note(note_id)
+        results[i] = {'status': 204}
+    return jsonify({'results': results})
+
+# 导出全部笔记为 NDJSON（每行一条笔记），?gzip=1 时导出 gzip 压缩文件
+# 从数据库游标边读边发送，内存占用不随笔记数量增长
+#   GET /api/notes/export?gzip=1  ->  notes-20250101.ndjson.gz
+@note_bp.route('/notes/export', methods=['GET'])
+def export_notes():
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        # 先写入尚在缓冲中的自动保存，导出才包含最新内容
+        flush_pending()
+        chunks = encode_lines(get_note_store().iter_notes(EXPORT_BATCH_SIZE))
+        # 读取第一块，数据库错误在开始发送前就能以 500 返回
+        chunks = itertools.chain([next(chunks, b'')], chunks)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    filename = f"notes-{datetime.utcnow():%Y%m%d}.ndjson"
+    mimetype = 'application/x-ndjson'
+    if compress:
+        chunks, filename, mimetype = gzip_chunks(chunks), filename + '.gz', 'application/gzip'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _import_line(line):
+    """Note fields from one line of an import file; id, timestamps and version are not imported."""
+    if line is None:
+        raise ValueError(f'Line is longer than {MAX_LINE_BYTES} bytes')
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON: {e}')
+    if not isinstance(data, dict):
+        raise ValueError('Each line must be a JSON object')
+    return _create_fields(data)
+
+
+def _import_batch(store, batch):
+    """Normalize and validate a batch of (line, fields), write the valid ones in one transaction.
+
+    Returns (imported count, [(line, error), ...]).
+    """
+    dates = normalize_many([fields['event_date'] for _, fields in batch], 'date')
+    times = normalize_many([fields['start_time'] for _, fields in batch], 'time')
+    valid, errors = [], []
+    for (number, fields), event_date, start_time in zip(batch, dates, times):
+        fields.update(event_date=event_date, start_time=start_time)
+        try:
+            valid.append(_check_date_time(fields))
+        except ValueError:
+            errors.append((number, f'Unrecognized date or time: {event_date!r} {start_time!r}'))
+    if valid:
+        created, _ = store.apply_batch(creates=valid)
+        for note in created:
+            search_index.index_note(note)
+    return len(valid), errors
+
+
+def _import_events(stream):
+    """Import an NDJSON stream batch by batch, yielding (event, data) for progress, bad lines and the end."""
+    summary = {'lines': 0, 'imported': 0, 'failed': 0}
+    batch = []
+
+    def write():
+        imported, errors = _import_batch(store, batch)
+        summary['imported'] += imported
+        summary['failed'] += len(errors)
+        batch.clear()
+        return errors
+
+    try:
+        store = get_note_store()
+        for number, line in iter_lines(read_chunks(stream)):
+            summary['lines'] = number
+            if line is not None and not line.strip():
+                continue
+            try:
+                batch.append((number, _import_line(line)))
+            except ValueError as e:
+                summary['failed'] += 1
+                yield 'error', {'line': number, 'error': str(e)}
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                for failed, error in write():
+                    yield 'error', {'line': failed, 'error': error}
+                yield 'progress', dict(summary)
+        if batch:
+            for failed, error in write():
+                yield 'error', {'line': failed, 'error': error}
+    except Exception as e:
+        # 数据库错误或压缩数据损坏：已提交的批次保留，当前批次回滚，停止导入
+        summary['failed'] += len(batch)
+        yield 'done', dict(summary, error=str(e))
+        return
+    yield 'done', summary
+
+
+# 导入 NDJSON（可以是 gzip 压缩的）：请求体边读边解析，每 IMPORT_BATCH_SIZE 行一个批量事务写入
+# 每行一条笔记 {"title", "content", "tags", "event_date", "start_time"}，日期和时间经 date_utils 规范化，
+# 导出文件中的 id、时间戳和版本号不导入（总是新建笔记）
+# Accept: text/event-stream 时以 SSE 推送 progress / error / done 事件；否则返回汇总：
+#   POST /api/notes/import  ->  {"lines": 1200, "imported": 1198, "failed": 2, "errors": [{"line": 7, "error": "..."}]}
+@note_bp.route('/notes/import', methods=['POST'])
+def import_notes():
+    events = _import_events(request.stream)
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        return _event_stream(_sse(event, data) for event, data in events)
+
+    errors = []
+    for event, data in events:
+        if event == 'error' and len(errors) < MAX_IMPORT_ERRORS:
+            errors.append(data)
+        elif event == 'done':
+            summary = data
+    summary['errors'] = errors
+    return jsonify(summary), 500 if 'error' in summary else 200
+
+def _search_args():
+    """GET /notes/search arguments -> (query, limit, offset)."""
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    return request.args.get('q', ''), limit, offset
+
+
+# 全文搜索笔记（按相关度排序，带高亮片段，limit/offset 分页）
 @note_bp.route('/notes/search', methods=['GET'])
 def search_notes():
-    query = request.args.get('q', '')
+    query, limit, offset = _search_args()
     if not query:
         return jsonify([])
-    
+
     try:
-        # 使用 ilike 实现模糊搜索
-        response = supabase.table('note').select('*').ilike('title', f'%{query}%').or_(f'content.ilike.%{query}%').order('updated_at', desc=True).execute()
-        return jsonify(response.data if response.data else [])
+        if search_index.enabled():
+            # 内存 BM25 倒排索引（SEARCH_INDEX=memory）
+            with span('search.index'):
+                hits = search_index.search(query, limit=limit, offset=offset)
+            return jsonify(hits)
+        return jsonify(get_note_store().search_notes(query, limit=limit, offset=offset))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _translate_notes(notes, target_lang):
+    """Translate the title and content of every note concurrently, one result dict per note."""
+    texts = _note_texts(notes)
+    return _translation_results(texts, translate_many([text for text in texts if text], target_lang))
+
+
+def _note_texts(notes):
+    texts = []
+    for note in notes:
+        texts.extend([note.get('title') or '', note.get('content') or ''])
+    return texts
+
+
+def _translation_results(texts, outputs):
+    """One result dict per note, from the translations (or exceptions) of its non-empty texts."""
+    translated = [''] * len(texts)
+    for i, output in zip([i for i, text in enumerate(texts) if text], outputs):
+        translated[i] = output
+
+    results = []
+    for k in range(len(texts) // 2):
+        title, content = translated[2 * k], translated[2 * k + 1]
+        failed = next((x for x in (title, content) if isinstance(x, Exception)), None)
+        if failed is not None:
+            results.append({'error': str(failed)})
+        else:
+            results.append({'translated_title': title, 'translated_content': content})
+    return results
+
+
+def _translate_payload():
+    """The body of POST /notes/translate as a job payload, or None without a title or content."""
+    data = request.get_json() or {}
+    note_content = data.get('content')
+    note_title = data.get('title')
+    target_lang = data.get('target_language', 'Chinese')
+    if not note_content and not note_title:
+        return None
+    return {'title': note_title, 'content': note_content, 'target_language': target_lang}
+
+
+def _translation_response(result):
+    if 'error' in result:
+        return jsonify(result), 500
+    return jsonify(result)
+
+
 @note_bp.route('/notes/translate', methods = ['POST'])
 def translate_note_api():
-    data = request.get_json() or {}
+    payload = _translate_payload()
+    if payload is None:
+        return jsonify({"error": "Note title or content is required"}), 400
+    if _wants_async():
+        return _enqueue_job('translate', payload)
+    result = _translate_notes([{'title': payload['title'], 'content': payload['content']}],
+                              payload['target_language'])[0]
+    return _translation_response(result)
+
+
+def _translate_job(payload):
+    # title and content are translated in parallel
+    result = _translate_notes([{'title': payload.get('title'), 'content': payload.get('content')}],
+                              payload['target_language'])[0]
+    # chunks skipped by a cancellation show up as errors: end the job as cancelled, not failed
+    check_cancelled()
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def _wants_async():
+    """The client opted into a background job: `Prefer: respond-async` or ?async=1."""
+    if 'respond-async' in request.headers.get('Prefer', ''):
+        return True
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def _enqueue_job(kind, payload):
+    """Queue the LLM work and answer 202 with the job id (an identical pending job is reused)."""
+    try:
+        priority = int(request.args.get('priority', 0))
+    except ValueError:
+        return jsonify({'error': 'priority must be an integer'}), 400
+    job, created = get_job_queue(current_app._get_current_object()).enqueue(kind, payload, priority,
+                                                                          user_id=current_user_id())
+    status_url = f"/api/jobs/{job['id']}"
+    response = jsonify({'job_id': job['id'], 'status': job['status'], 'deduplicated': not created,
+                        'status_url': status_url, 'events_url': status_url + '/events'})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    response.headers['Preference-Applied'] = 'respond-async'
+    return response
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _event_stream(events):
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭反向代理（nginx）的缓冲，事件才能即时到达浏览器
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# 流式翻译（SSE）：content 事件逐段推送正文译文，title 事件在标题译完后推送，最后是 done 或 error
+@note_bp.route('/notes/translate/stream', methods=['POST'])
+def translate_note_stream_api():
+    data = request.get_json(silent=True) or {}
     note_content = data.get('content')
     note_title = data.get('title')
     target_lang = data.get('target_language', 'Chinese')
@@ -133,13 +677,101 @@ def translate_note_api():
     if not note_content and not note_title:
         return jsonify({"error": "Note title or content is required"}), 400
 
-    translated_content = translate_note(note_content, target_lang) if note_content else ''
-    translated_title = translate_note(note_title, target_lang) if note_title else ''
+    def events():
+        # 标题较短，在线程池里整体翻译，同时流式翻译正文
+        title_future = submit(translate_note, note_title, target_lang) if note_title else None
+        title_sent = title_future is None
+        parts = []
+        try:
+            if note_content:
+                for delta in stream_translate_note(note_content, target_lang):
+                    parts.append(delta)
+                    yield _sse('content', {'text': delta})
+                    if not title_sent and title_future.done():
+                        title_sent = True
+                        yield _sse('title', {'text': title_future.result()})
+            if not title_sent:
+                yield _sse('title', {'text': title_future.result()})
+            yield _sse('done', {'translated_title': title_future.result() if title_future else '',
+                                'translated_content': ''.join(parts)})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+
+    return _event_stream(events())
 
-    return jsonify({
-        "translated_title": translated_title,
-        "translated_content": translated_content
-    })
+
+# 批量翻译：{"notes": [{"title", "content"}, ...]} 或 {"ids": [1, 2]}，并发数受 LLM_MAX_CONCURRENCY 限制
+@note_bp.route('/notes/translate/batch', methods=['POST'])
+def translate_notes_batch_api():
+    data = request.get_json(silent=True) or {}
+    target_lang = data.get('target_language', 'Chinese')
+    notes = data.get('notes')
+    ids = data.get('ids')
+    if notes is None and ids is None:
+        return jsonify({'error': 'notes or ids is required'}), 400
+    items = notes if notes is not None else ids
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'notes/ids must be a non-empty list'}), 400
+    if len(items) > MAX_TRANSLATE_BATCH:
+        return jsonify({'error': f'At most {MAX_TRANSLATE_BATCH} notes per batch'}), 400
+
+    if _wants_async():
+        return _enqueue_job('translate_batch', {'notes': notes, 'ids': ids, 'target_language': target_lang})
+    try:
+        return jsonify(_translate_batch_job({'notes': notes, 'ids': ids, 'target_language': target_lang}))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _translate_batch_job(payload):
+    notes = payload.get('notes')
+    if notes is None:
+        store = get_note_store()
+        notes = []
+        for note_id in payload['ids']:
+            try:
+                notes.append(store.get_note(int(note_id)))
+            except (NoteNotFoundError, TypeError, ValueError):
+                notes.append({'id': note_id, 'missing': True})
+    results = _translate_notes([{} if n.get('missing') else n for n in notes], payload['target_language'])
+    check_cancelled()
+
+    for note, result in zip(notes, results):
+        if 'id' in note:
+            result['id'] = note['id']
+        if note.get('missing'):
+            result.clear()
+            result.update(id=note['id'], error='Note not found')
+    return {'results': results}
+
+
+@note_bp.route('/llm/cache', methods=['GET'])
+def llm_cache_stats():
+    cache = get_llm_cache()
+    return jsonify(cache.stats() if cache else {'enabled': False})
+
+
+def _generated_note(result, prompt_date, prompt_time):
+    """Turn the model's Title/Notes/Tags/Date/Time dict into the note fields returned to the client."""
+    # If prompt contains relative terms, prefer extracting date/time from prompt
+    with span('dates'):
+        if prompt_date:
+            normalized_date = prompt_date
+        else:
+            normalized_date = normalize_date(result.get('Date'))
+
+        if prompt_time:
+            normalized_time = prompt_time
+        else:
+            normalized_time = normalize_time(result.get('Time'))
+
+    return {
+        'title': result.get('Title') or 'Generated Note',
+        'content': result.get('Notes') or '',
+        'tags': result.get('Tags') or [],
+        'date': normalized_date,
+        'time': normalized_time,
+    }
 
 
 @note_bp.route('/notes/generate', methods=['POST'])
@@ -152,28 +784,107 @@ def generate_note_api():
         if not prompt:
             return jsonify({'error': 'Prompt is required'}), 400
 
-        # process_user_notes returns a dict with Title, Notes, Tags, Date, Time fields
-        result = process_user_notes(target_lang, prompt)
-        title = result.get('Title') or 'Generated Note'
-        content = result.get('Notes') or ''
-        tags = result.get('Tags') or []
-        date = result.get('Date')
-        time = result.get('Time')
+        # 简短的提示（如 "Badminton tmr 5pm @polyu"）直接在本地解析，不调用模型
+        with span('generate.local'):
+            note = local_note(prompt, target_lang)
+        if note is not None:
+            response = jsonify(note)
+            response.headers['X-Generated-By'] = 'local'
+            return response
+        if _wants_async():
+            return _enqueue_job('generate', {'prompt': prompt, 'target_language': target_lang})
+        response = jsonify(_generated_from_prompt(prompt, process_user_notes(target_lang, prompt)))
+        response.headers['X-Generated-By'] = 'llm'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 
-        # If prompt contains relative terms, prefer extracting date/time from prompt
+def _generated_from_prompt(prompt, result):
+    # result is the model's dict with Title, Notes, Tags, Date, Time fields (process_user_notes)
+    with span('dates'):
+        prompt_date, prompt_time = extract_date_from_text(prompt), extract_time_from_text(prompt)
+    return _generated_note(result, prompt_date, prompt_time)
+
+
+def _generate_job(payload):
+    # streamed, so a cancelled job hangs up on the model mid-reply instead of paying for the rest
+    reply = []
+    with closing(stream_user_notes(payload['target_language'], payload['prompt'])) as deltas:
+        for delta in deltas:
+            check_cancelled()
+            reply.append(delta)
+    return _generated_from_prompt(payload['prompt'], json.loads(''.join(reply)))
+
+
+_GENERATED_FIELDS = {'Title': 'title', 'Notes': 'content', 'Tags': 'tags', 'Date': 'date', 'Time': 'time'}
+
+
+@note_bp.route('/notes/generate/stream', methods=['POST'])
+def generate_note_stream_api():
+    """Stream a generated note as Server-Sent Events.
+
+    Each field is sent as a `field` event ({name, value}) as soon as it can be parsed out of the
+    partial model output; the note body additionally arrives as `delta` events while it is written.
+    The final `done` event carries the same payload as POST /notes/generate.
+    """
+    data = request.get_json(silent=True) or {}
+    prompt = data.get('prompt')
+    target_lang = data.get('target_language', 'English')
+    if not prompt:
+        return jsonify({'error': 'Prompt is required'}), 400
+
+    with span('generate.local'):
+        note = local_note(prompt, target_lang)
+    if note is not None:
+        def local_events():
+            for name in ('title', 'content', 'tags', 'date', 'time'):
+                yield _sse('field', {'name': name, 'value': note[name]})
+            yield _sse('done', note)
+        response = _event_stream(local_events())
+        response.headers['X-Generated-By'] = 'local'
+        return response
+
+    def events():
         prompt_date = extract_date_from_text(prompt)
         prompt_time = extract_time_from_text(prompt)
-
+        # 从提示中提取到的日期和时间不依赖模型输出，立即推送
         if prompt_date:
-            normalized_date = prompt_date
-        else:
-            normalized_date = normalize_date(date)
-
+            yield _sse('field', {'name': 'date', 'value': prompt_date})
         if prompt_time:
-            normalized_time = prompt_time
-        else:
-            normalized_time = normalize_time(time)
+            yield _sse('field', {'name': 'time', 'value': prompt_time})
 
-        return jsonify({'title': title, 'content': content, 'tags': tags, 'date': normalized_date, 'time': normalized_time})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        reader = PartialObjectReader()
+        streamed = 0
+        try:
+            for delta in stream_user_notes(target_lang, prompt):
+                for key, value in reader.feed(delta):
+                    name = _GENERATED_FIELDS.get(key)
+                    if name == 'content' and len(value) > streamed:
+                        yield _sse('delta', {'name': 'content', 'text': value[streamed:]})
+                        streamed = len(value)
+                    if name == 'date':
+                        if prompt_date:
+                            continue
+                        value = normalize_date(value)
+                    elif name == 'time':
+                        if prompt_time:
+                            continue
+                        value = normalize_time(value)
+                    if name:
+                        yield _sse('field', {'name': name, 'value': value})
+                partial = reader.partial()
+                if partial and partial[0] == 'Notes' and len(partial[1]) > streamed:
+                    yield _sse('delta', {'name': 'content', 'text': partial[1][streamed:]})
+                    streamed = len(partial[1])
+            yield _sse('done', _generated_note(json.loads(reader.buffer), prompt_date, prompt_time))
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+
+    return _event_stream(events())
+
+
+# 后台任务（src/jobs.py）的执行函数，与同步接口共用同一套逻辑
+register_handler('translate', _translate_job)
+register_handler('translate_batch', _translate_batch_job)
+register_handler('generate', _generate_job)
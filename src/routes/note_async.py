@@ -0,0 +1,155 @@
+"""Coroutine versions of the note views that wait on the network, for the ASGI mode (src/asgi.py).
+
+Each view here stands in for the view of the same endpoint in src/routes/note.py
+and answers exactly like it: request parsing and response building are shared,
+only the store and model calls are awaited. store_views need the async note
+store (NOTE_STORE=supabase); llm_views run with any backend. Every other
+endpoint keeps its sync view.
+"""
+import asyncio
+
+from flask import jsonify, request
+
+from src.llm import atranslate_many
+from src.metrics import span
+from src.routes.note import (_agenda_query, _agenda_response, _conditional_json, _create_fields, _enqueue_job,
+                             _list_query, _list_response, _note_texts, _search_args, _translate_payload,
+                             _translation_response, _translation_results, _update_fields, _wants_async)
+from src.search import service as search_index
+from src.store.note_store import get_async_note_store, NoteNotFoundError
+from src.store.write_buffer import flush_pending, pending_note
+
+# endpoint -> coroutine view
+store_views = {}
+llm_views = {}
+
+
+def _view(registry, endpoint):
+    def register(fn):
+        registry[endpoint] = fn
+        return fn
+    return register
+
+
+async def _flush_pending(note_id):
+    # a buffered PATCH is written by the sync store; only pay for a thread when there is one
+    if pending_note(note_id) is not None:
+        await asyncio.to_thread(flush_pending, note_id)
+
+
+# 获取笔记列表
+@_view(store_views, 'note.get_notes')
+async def get_notes():
+    try:
+        limit, query = _list_query()
+        return _list_response(await get_async_note_store().list_notes(**query), limit, query)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 日程视图
+@_view(store_views, 'note.get_agenda')
+async def get_agenda():
+    try:
+        limit, query = _agenda_query()
+        return _agenda_response(await get_async_note_store().list_agenda(**query), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 标签及其笔记数
+@_view(store_views, 'note.get_tags')
+async def get_tags():
+    try:
+        return jsonify(await get_async_note_store().tag_counts())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 创建笔记
+@_view(store_views, 'note.create_note')
+async def create_note():
+    try:
+        try:
+            note_data = _create_fields(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        note = await get_async_note_store().create_note(note_data)
+        search_index.index_note(note)
+        return jsonify(note), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 获取单个笔记
+@_view(store_views, 'note.get_note')
+async def get_note(note_id):
+    try:
+        note = pending_note(note_id) or await get_async_note_store().get_note(note_id)
+        return _conditional_json(note, [note])
+    except NoteNotFoundError:
+        return jsonify({'error': 'Note not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 更新笔记
+@_view(store_views, 'note.update_note')
+async def update_note(note_id):
+    try:
+        try:
+            update_data = _update_fields(request.json)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        await _flush_pending(note_id)
+        note = await get_async_note_store().update_note(note_id, update_data)
+        search_index.index_note(note)
+        return jsonify(note)
+    except NoteNotFoundError:
+        return jsonify({'error': 'Note not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 删除笔记
+@_view(store_views, 'note.delete_note')
+async def delete_note(note_id):
+    try:
+        await _flush_pending(note_id)
+        await get_async_note_store().delete_note(note_id)
+        search_index.unindex_note(note_id)
+        return '', 204
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 全文搜索笔记；内存索引（SEARCH_INDEX=memory）第一次搜索时要从数据库建索引，放到线程里做
+@_view(store_views, 'note.search_notes')
+async def search_notes():
+    query, limit, offset = _search_args()
+    if not query:
+        return jsonify([])
+
+    try:
+        if search_index.enabled():
+            with span('search.index'):
+                hits = await asyncio.to_thread(search_index.search, query, limit=limit, offset=offset)
+            return jsonify(hits)
+        return jsonify(await get_async_note_store().search_notes(query, limit=limit, offset=offset))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 翻译笔记：标题和内容的各个分块在事件循环上并发翻译
+@_view(llm_views, 'note.translate_note_api')
+async def translate_note_api():
+    payload = _translate_payload()
+    if payload is None:
+        return jsonify({"error": "Note title or content is required"}), 400
+    if _wants_async():
+        return _enqueue_job('translate', payload)
+    texts = _note_texts([payload])
+    outputs = await atranslate_many([text for text in texts if text], payload['target_language'])
+    return _translation_response(_translation_results(texts, outputs)[0])
@@ -1,5 +1,11 @@
 from flask import Blueprint, jsonify, request
+from src.current_user import forget_user
+from src.models.note import Note
 from src.models.user import User, db
+from src.search import service as search_index
+from src.store import write_buffer
+from src.store.cache import CachedNoteStore
+from src.store.note_store import get_note_store
 
 user_bp = Blueprint('user', __name__)
 
@@ -34,6 +40,24 @@ def update_user(user_id):
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    # buffered PATCHes must not be written to the notes once they are gone
+    write_buffer.discard_user(user_id)
+    # the foreign key cascades on Postgres, but SQLite doesn't enforce it by default;
+    # the note triggers (full text since alembic 0009, tags) handle live notes and tombstones alike
+    Note.query.filter(Note.user_id == user_id).delete(synchronize_session=False)
     db.session.delete(user)
     db.session.commit()
+    forget_user(user_id)
+    search_index.forget_user(user_id)
+    _forget_cached_notes(user_id)
     return '', 204
+
+
+def _forget_cached_notes(user_id):
+    try:
+        store = get_note_store()
+    except Exception:
+        # no note backend configured: nothing can be cached
+        return
+    if isinstance(store, CachedNoteStore):
+        store.forget_user(user_id)
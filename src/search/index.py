@@ -0,0 +1,196 @@
+"""In-memory inverted index with BM25 ranking.
+
+Each note is indexed as title + content, with title terms counted
+TITLE_WEIGHT times. Updates are incremental (add/remove one note) and the
+whole index can be pickled to disk so a restarted process only has to catch
+up on notes changed since the snapshot.
+"""
+import bisect
+import heapq
+import math
+import os
+import pickle
+import re
+import tempfile
+import threading
+from collections import Counter
+
+from src.search.tokenizer import tokenize, is_cjk
+
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 3
+MAX_PREFIX_EXPANSIONS = 50
+SNIPPET_RADIUS = 40
+SNAPSHOT_VERSION = 1
+
+
+def _note_terms(note):
+    counts = Counter(tokenize(note.get('content') or ''))
+    for term in tokenize(note.get('title') or ''):
+        counts[term] += TITLE_WEIGHT
+    return counts
+
+
+def make_snippet(text, words):
+    """Cut a window of ``text`` around the first query word and <mark> the hits."""
+    if not text or not words:
+        return None
+    pattern = re.compile('|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text)
+    if first is None:
+        return None
+    start = max(0, first.start() - SNIPPET_RADIUS)
+    end = min(len(text), first.end() + SNIPPET_RADIUS * 2)
+    window = pattern.sub(lambda m: f'<mark>{m.group(0)}</mark>', text[start:end])
+    return ('…' if start > 0 else '') + window + ('…' if end < len(text) else '')
+
+
+class InvertedIndex:
+    def __init__(self):
+        self.docs = {}          # note id -> note dict (as returned by the store)
+        self.postings = {}      # term -> {note id: weighted term frequency}
+        self.doc_len = {}       # note id -> weighted number of terms
+        self.total_len = 0
+        self.watermark = None   # newest updated_at seen, used to catch up after a restart
+        self._vocab = []        # sorted latin terms, for prefix expansion of the last query word
+        self._new_terms = set()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, note):
+        """Index ``note``, replacing any previous version with the same id."""
+        with self._lock:
+            self._remove(note['id'])
+            counts = _note_terms(note)
+            note_id = note['id']
+            for term, tf in counts.items():
+                docs = self.postings.get(term)
+                if docs is None:
+                    docs = self.postings[term] = {}
+                    if not is_cjk(term):
+                        self._new_terms.add(term)
+                docs[note_id] = tf
+            length = sum(counts.values())
+            self.doc_len[note_id] = length
+            self.total_len += length
+            self.docs[note_id] = note
+            updated_at = note.get('updated_at')
+            if updated_at and (self.watermark is None or updated_at > self.watermark):
+                self.watermark = updated_at
+
+    def remove(self, note_id):
+        with self._lock:
+            self._remove(note_id)
+
+    def _remove(self, note_id):
+        note = self.docs.pop(note_id, None)
+        if note is None:
+            return
+        # the tokenizer is deterministic, so re-tokenizing finds every posting of the note
+        for term in _note_terms(note):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(note_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(note_id, 0)
+
+    def _expand_prefix(self, prefix):
+        if self._new_terms:
+            if len(self._new_terms) > 64:
+                self._vocab = sorted(set(self._vocab) | self._new_terms)
+            else:
+                for term in self._new_terms:
+                    bisect.insort(self._vocab, term)
+            self._new_terms.clear()
+        terms = []
+        i = bisect.bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix) and len(terms) < MAX_PREFIX_EXPANSIONS:
+            if self._vocab[i] in self.postings:
+                terms.append(self._vocab[i])
+            i += 1
+        return terms
+
+    def search(self, query, limit=50, offset=0):
+        """Return ``[(note dict, score, snippet)]`` for ``query``, best first."""
+        words = tokenize(query, for_query=True)
+        if not words:
+            return []
+        with self._lock:
+            n = len(self.docs)
+            if n == 0:
+                return []
+            avgdl = self.total_len / n
+            # every word is an exact term, except that a trailing latin word also
+            # matches as a prefix so the search box works while typing
+            groups = [[w] for w in words[:-1]]
+            last = words[-1]
+            if is_cjk(last) or len(last) < 2:
+                groups.append([last])
+            else:
+                groups.append(self._expand_prefix(last) or [last])
+
+            scores = {}
+            for terms in groups:
+                for term in terms:
+                    docs = self.postings.get(term)
+                    if not docs:
+                        continue
+                    idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                    doc_len = self.doc_len
+                    for note_id, tf in docs.items():
+                        norm = K1 * (1 - B + B * doc_len[note_id] / avgdl)
+                        scores[note_id] = scores.get(note_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])[offset:]
+            snippet_words = [t for terms in groups for t in terms]
+            results = []
+            for note_id, score in top:
+                note = self.docs[note_id]
+                snippet = make_snippet(note.get('content') or '', snippet_words) or make_snippet(note.get('title') or '', snippet_words)
+                results.append((note, score, snippet))
+            return results
+
+    def save(self, path):
+        """Atomically write a snapshot of the index to ``path``."""
+        with self._lock:
+            state = {
+                'version': SNAPSHOT_VERSION,
+                'docs': self.docs,
+                'postings': self.postings,
+                'doc_len': self.doc_len,
+                'total_len': self.total_len,
+                'watermark': self.watermark,
+            }
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+    @classmethod
+    def load(cls, path):
+        """Load a snapshot written by ``save``; returns None if it is missing or stale."""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if state.get('version') != SNAPSHOT_VERSION:
+            return None
+        index = cls()
+        index.docs = state['docs']
+        index.postings = state['postings']
+        index.doc_len = state['doc_len']
+        index.total_len = state['total_len']
+        index.watermark = state['watermark']
+        index._vocab = sorted(t for t in index.postings if not is_cjk(t))
+        return index
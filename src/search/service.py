@@ -0,0 +1,203 @@
+"""Process-wide in-memory search indexes for /api/notes/search.
+
+Enabled with SEARCH_INDEX=memory; the default, SEARCH_INDEX=store, searches the
+database full-text index instead. Each user (see src/current_user.py) has an
+index of their own notes, so a search only scores that user's notes. A user's
+index is built on their first search, either from a snapshot plus the notes
+changed since it was taken, or from their note change feed. Snapshots live at
+SEARCH_INDEX_PATH for notes without an owner and next to it, suffixed with the
+user id, for everyone else.
+
+Note handlers keep the indexes of this process current through
+index_note()/unindex_note(). Writes served by other workers are picked up from
+the change feed, read from where the index last left it at most once every
+SEARCH_CATCH_UP_MS (default 1000) per user; searches in between are served
+from the index as it is.
+At most SEARCH_INDEX_USERS indexes are kept; the least recently searched one is
+snapshotted and dropped to make room.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from src.current_user import current_user_id
+from src.search.index import InvertedIndex
+from src.store.note_store import SYNC_SAFETY_LAG, get_note_store, hold_back
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_SNAPSHOT_PATH = os.path.join(ROOT_DIR, 'database', 'search_index.pkl')
+BUILD_PAGE_SIZE = 1000
+# write a fresh snapshot after this many incremental updates
+SNAPSHOT_EVERY = int(os.environ.get('SEARCH_SNAPSHOT_EVERY', 500))
+MAX_USERS = int(os.environ.get('SEARCH_INDEX_USERS', 100))
+CATCH_UP_INTERVAL = int(os.environ.get('SEARCH_CATCH_UP_MS', 1000)) / 1000
+
+
+def _resume_from(watermark):
+    """Feed cursor for an index loaded from a snapshot: the lag window before its newest note is read again."""
+    if not watermark:
+        return None
+    return ((datetime.fromisoformat(watermark) - SYNC_SAFETY_LAG).isoformat(), 0)
+
+
+class _UserIndex:
+    __slots__ = ('index', 'cursor', 'caught_up_at', 'lock')
+
+    def __init__(self, index):
+        self.index = index
+        # (updated_at, id) up to which the feed has been applied, held back by SYNC_SAFETY_LAG;
+        # local writes don't move it
+        self.cursor = _resume_from(index.watermark)
+        self.caught_up_at = None  # time.monotonic() of the last read of the feed
+        self.lock = threading.Lock()
+
+
+_indexes = OrderedDict()  # user id (None: notes without an owner) -> _UserIndex, least recently searched first
+_lock = threading.Lock()
+_dirty = {}
+_atexit_registered = False
+
+
+def enabled():
+    return os.environ.get('SEARCH_INDEX', 'store').lower() == 'memory'
+
+
+def snapshot_path(user_id=None):
+    path = os.environ.get('SEARCH_INDEX_PATH', DEFAULT_SNAPSHOT_PATH)
+    if user_id is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.user{user_id}{ext}'
+
+
+def _catch_up(entry, store, interval=0):
+    """Apply the store's change feed after the entry's cursor (everything when it is None).
+
+    Skipped when the feed was read less than ``interval`` seconds ago. Like
+    /api/notes/changes, the cursor stays SYNC_SAFETY_LAG behind now, so the
+    latest changes are applied again on the next read; add() and remove() by id
+    make that harmless.
+    """
+    with entry.lock:
+        now = time.monotonic()
+        if entry.caught_up_at is not None and now - entry.caught_up_at < interval:
+            return
+        position = entry.cursor
+        while True:
+            changes = store.list_changes(after=position, limit=BUILD_PAGE_SIZE)
+            for change in changes:
+                if change.get('deleted'):
+                    entry.index.remove(change['id'])
+                else:
+                    entry.index.add(change)
+            if changes:
+                position = (changes[-1]['updated_at'], changes[-1]['id'])
+            if len(changes) < BUILD_PAGE_SIZE:
+                break
+        entry.cursor = hold_back(position, entry.cursor)
+        entry.caught_up_at = now
+
+
+def _evict():
+    """Drop least recently searched indexes beyond MAX_USERS; returns them to be snapshotted."""
+    evicted = []
+    while len(_indexes) > max(MAX_USERS, 1):
+        user_id, entry = _indexes.popitem(last=False)
+        if _dirty.pop(user_id, 0):
+            evicted.append((user_id, entry.index))
+    return evicted
+
+
+def get_index():
+    """Return the current user's search index, loading or building it on first use.
+
+    Writes of other workers show up once the change feed is read again, at most
+    CATCH_UP_INTERVAL seconds later.
+    """
+    global _atexit_registered
+    user_id = current_user_id()
+    store = get_note_store()
+    with _lock:
+        entry = _indexes.get(user_id)
+        if entry is not None:
+            _indexes.move_to_end(user_id)
+    if entry is not None:
+        # the change feed is scoped to the current user, so this only reads their notes
+        _catch_up(entry, store, CATCH_UP_INTERVAL)
+        return entry.index
+    with _lock:
+        entry = _indexes.get(user_id)
+        if entry is None:
+            index = InvertedIndex.load(snapshot_path(user_id)) or InvertedIndex()
+            watermark = index.watermark
+            entry = _UserIndex(index)
+            _catch_up(entry, store)
+            _indexes[user_id] = entry
+            if index.watermark != watermark:
+                index.save(snapshot_path(user_id))
+            evicted = _evict()
+            if not _atexit_registered:
+                atexit.register(save_snapshots)
+                _atexit_registered = True
+        else:
+            evicted = []
+    for evicted_user, evicted_index in evicted:
+        evicted_index.save(snapshot_path(evicted_user))
+    return entry.index
+
+
+def save_snapshot(user_id=None):
+    entry = _indexes.get(user_id)
+    if entry is None:
+        return
+    entry.index.save(snapshot_path(user_id))
+    _dirty[user_id] = 0
+
+
+def save_snapshots():
+    for user_id in list(_indexes):
+        save_snapshot(user_id)
+
+
+def forget_user(user_id):
+    """Drop a deleted user's index and snapshot."""
+    with _lock:
+        _indexes.pop(user_id, None)
+        _dirty.pop(user_id, None)
+    try:
+        os.remove(snapshot_path(user_id))
+    except FileNotFoundError:
+        pass
+
+
+def _touched(user_id):
+    _dirty[user_id] = _dirty.get(user_id, 0) + 1
+    if _dirty[user_id] >= SNAPSHOT_EVERY:
+        _dirty[user_id] = 0
+        threading.Thread(target=save_snapshot, args=(user_id,), daemon=True).start()
+
+
+def index_note(note):
+    # before the user's first search their index doesn't exist yet; building it will pick the note up
+    user_id = current_user_id()
+    entry = _indexes.get(user_id)
+    if entry is not None:
+        entry.index.add(note)
+        _touched(user_id)
+
+
+def unindex_note(note_id):
+    user_id = current_user_id()
+    entry = _indexes.get(user_id)
+    if entry is not None:
+        entry.index.remove(note_id)
+        _touched(user_id)
+
+
+def search(query, limit=50, offset=0):
+    """Search in memory; hits are note dicts with ``rank`` and ``snippet`` like the store's."""
+    return [dict(note, rank=score, snippet=snippet)
+            for note, score, snippet in get_index().search(query, limit=limit, offset=offset)]
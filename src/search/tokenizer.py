@@ -0,0 +1,38 @@
+"""Tokenizer for mixed Chinese/English notes.
+
+Latin text is split into lowercase words. Runs of CJK characters have no word
+boundaries, so they are indexed as overlapping bigrams ("明天开会" -> 明天,
+天开, 开会) plus single characters, which lets one-character queries match too.
+"""
+import re
+
+# kana, CJK unified ideographs (+ ext. A), compatibility ideographs, hangul
+CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_TOKEN_RE = re.compile(f'([{CJK_RANGES}]+)|([^\\W_{CJK_RANGES}]+)')
+
+
+def tokenize(text, for_query=False):
+    """Return the index terms of ``text``.
+
+    Query tokenization only emits CJK bigrams (or the character itself for a
+    one-character run), so a multi-character query is not diluted by unigrams.
+    """
+    if not text:
+        return []
+    tokens = []
+    for m in _TOKEN_RE.finditer(text.lower()):
+        cjk, word = m.groups()
+        if word:
+            tokens.append(word)
+            continue
+        if len(cjk) == 1:
+            tokens.append(cjk)
+            continue
+        if not for_query:
+            tokens.extend(cjk)
+        tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def is_cjk(term):
+    return bool(term) and _TOKEN_RE.match(term).group(1) is not None
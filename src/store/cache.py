@@ -0,0 +1,337 @@
+"""Read-through cache in front of a NoteStore.
+
+Reads of single notes, note lists and tag counts are served from an in-process LRU and,
+when REDIS_URL is set, a shared Redis tier. Every key carries its user's cache
+generation, and every write bumps that generation, so nothing cached before
+the write is reachable afterwards. With REDIS_URL the generation lives in
+Redis: a write in one worker moves every worker to the new generation, local
+tier included, at the cost of one Redis round trip per read. Entries and
+generations are kept per user (see src/current_user.py): a user only ever
+reads their own entries, and their writes leave other users' entries alone.
+AsyncCachedNoteStore gives the async store of the ASGI mode the same entries
+and generations, so sync and async requests see each other's writes.
+
+Settings: NOTE_CACHE=0 disables the cache, NOTE_CACHE_SIZE (entries) and
+NOTE_CACHE_TTL (seconds) size the in-process tier, NOTE_CACHE_USERS bounds
+the in-process generations (without REDIS_URL).
+"""
+import asyncio
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from src.current_user import as_user, current_user_id
+from src.store.note_store import NoteStore
+
+GENERATION_KEY = 'notes:gen'
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry time to live.
+
+    ``on_evict(key, value)`` is called, under the lock, for entries pushed out by size.
+    """
+
+    def __init__(self, maxsize=256, ttl=60.0, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted, (old, _) = self._data.popitem(last=False)
+                if self.on_evict is not None:
+                    self.on_evict(evicted, old)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+class RedisCache:
+    """Shared cache tier; values are pickled."""
+
+    def __init__(self, url, ttl=60, prefix='notecache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("REDIS_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        raw = self.client.get(self.prefix + key)
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=int(ttl or self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def get_int(self, key):
+        raw = self.client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+
+class CachedNoteStore(NoteStore):
+    def __init__(self, store, local=None, shared=None, max_users=10000):
+        self.store = store
+        self.local = local or LRUCache()
+        self.shared = shared
+        # without Redis: scope -> generation of the user's last write, for the max_users latest writers.
+        # Generations come from one counter, so each write gets a number no scope had before; a scope
+        # without an entry reads at the highest generation evicted so far, which is at least its own.
+        self._generations = LRUCache(maxsize=max_users, ttl=float('inf'), on_evict=self._retire_generation)
+        self._generation_lock = threading.Lock()
+        self._last_generation = 0
+        self._evicted_generation = 0
+
+    @classmethod
+    def from_env(cls, store):
+        ttl = float(os.environ.get('NOTE_CACHE_TTL', 60))
+        local = LRUCache(maxsize=int(os.environ.get('NOTE_CACHE_SIZE', 256)), ttl=ttl)
+        redis_url = os.environ.get('REDIS_URL')
+        shared = RedisCache(redis_url, ttl=ttl) if redis_url else None
+        return cls(store, local, shared, max_users=int(os.environ.get('NOTE_CACHE_USERS', 10000)))
+
+    # -- tiers ---------------------------------------------------------------
+
+    @staticmethod
+    def _scope():
+        user_id = current_user_id()
+        return 'anon' if user_id is None else str(user_id)
+
+    def _generation_now(self):
+        scope = self._scope()
+        if self.shared is not None:
+            return self.shared.get_int(f'{GENERATION_KEY}:{scope}')
+        return self._generations.get(scope, self._evicted_generation)
+
+    def _get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def _set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def _invalidate(self):
+        scope = self._scope()
+        # the user's old entries become unreachable and age out of the LRU
+        with self._generation_lock:
+            self._last_generation += 1
+            self._generations.set(scope, self._last_generation)
+        if self.shared is not None:
+            self.shared.incr(f'{GENERATION_KEY}:{scope}')
+
+    def _retire_generation(self, scope, generation):
+        self._evicted_generation = max(self._evicted_generation, generation)
+
+    def forget_user(self, user_id):
+        """Retire every cached entry of user_id, in every worker when the generations are shared."""
+        with as_user(user_id):
+            self._invalidate()
+
+    def stats(self):
+        return self.local.stats()
+
+    # -- keys ----------------------------------------------------------------
+
+    def _list_key(self, limit, after, fields, tags, match_any):
+        return f'list:{self._scope()}:{self._generation_now()}:{limit}:{after}:{fields}:{tags}:{match_any}'
+
+    def _tags_key(self):
+        # like list pages: any write moves to a new generation
+        return f'tags:{self._scope()}:{self._generation_now()}'
+
+    def _agenda_key(self, start, end, after, limit, fields):
+        return f'agenda:{self._scope()}:{self._generation_now()}:{start}:{end}:{after}:{limit}:{fields}'
+
+    def _note_key(self, note_id, generation):
+        # generation: the caller's _generation_now(), also used to detect a read racing a write
+        return f'note:{self._scope()}:{generation}:{note_id}'
+
+    # -- reads ---------------------------------------------------------------
+
+    def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        key = self._list_key(limit, after, fields, tags, match_any)
+        notes = self._get(key)
+        if notes is None:
+            notes = self.store.list_notes(limit=limit, after=after, fields=fields, tags=tags, match_any=match_any)
+            self._set(key, notes)
+        return notes
+
+    def tag_counts(self):
+        key = self._tags_key()
+        counts = self._get(key)
+        if counts is None:
+            counts = self.store.tag_counts()
+            self._set(key, counts)
+        return counts
+
+    def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        key = self._agenda_key(start, end, after, limit, fields)
+        notes = self._get(key)
+        if notes is None:
+            notes = self.store.list_agenda(start=start, end=end, after=after, limit=limit, fields=fields)
+            self._set(key, notes)
+        return notes
+
+    def get_note(self, note_id):
+        generation = self._generation_now()
+        key = self._note_key(note_id, generation)
+        note = self._get(key)
+        if note is None:
+            note = self.store.get_note(note_id)
+            # don't cache a read that raced with a write
+            if self._generation_now() == generation:
+                self._set(key, note)
+        return note
+
+    def search_notes(self, query, limit=50, offset=0):
+        return self.store.search_notes(query, limit=limit, offset=offset)
+
+    def list_changes(self, after=None, limit=100):
+        return self.store.list_changes(after=after, limit=limit)
+
+    def iter_notes(self, batch_size=1000):
+        return self.store.iter_notes(batch_size)
+
+    # -- writes --------------------------------------------------------------
+
+    def create_note(self, fields):
+        note = self.store.create_note(fields)
+        self._invalidate()
+        return note
+
+    def update_note(self, note_id, fields):
+        try:
+            return self.store.update_note(note_id, fields)
+        finally:
+            self._invalidate()
+
+    def apply_batch(self, creates=(), updates=(), deletes=()):
+        try:
+            return self.store.apply_batch(creates, updates, deletes)
+        finally:
+            self._invalidate()
+
+    def patch_note(self, note_id, fields, expected_version, new_version=None):
+        try:
+            return self.store.patch_note(note_id, fields, expected_version, new_version)
+        finally:
+            self._invalidate()
+
+    def delete_note(self, note_id):
+        try:
+            self.store.delete_note(note_id)
+        finally:
+            self._invalidate()
+
+
+class AsyncCachedNoteStore:
+    """CachedNoteStore's read-through and invalidation in front of an async store (src/asgi.py).
+
+    Entries and generations live in `cache`, the CachedNoteStore of the sync store.
+    """
+
+    def __init__(self, store, cache):
+        self.store = store
+        self.cache = cache
+
+    async def _cached(self, fn, *args):
+        # the Redis tier is a blocking client: keep its round trips off the event loop
+        if self.cache.shared is None:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def _read_through(self, key, load):
+        value = await self._cached(self.cache._get, key)
+        if value is None:
+            value = await load()
+            await self._cached(self.cache._set, key, value)
+        return value
+
+    async def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        return await self._read_through(
+            await self._cached(self.cache._list_key, limit, after, fields, tags, match_any),
+            lambda: self.store.list_notes(limit=limit, after=after, fields=fields, tags=tags, match_any=match_any))
+
+    async def tag_counts(self):
+        return await self._read_through(await self._cached(self.cache._tags_key), self.store.tag_counts)
+
+    async def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        return await self._read_through(
+            await self._cached(self.cache._agenda_key, start, end, after, limit, fields),
+            lambda: self.store.list_agenda(start=start, end=end, after=after, limit=limit, fields=fields))
+
+    async def get_note(self, note_id):
+        generation = await self._cached(self.cache._generation_now)
+        key = self.cache._note_key(note_id, generation)
+        note = await self._cached(self.cache._get, key)
+        if note is None:
+            note = await self.store.get_note(note_id)
+            # don't cache a read that raced with a write
+            if await self._cached(self.cache._generation_now) == generation:
+                await self._cached(self.cache._set, key, note)
+        return note
+
+    async def search_notes(self, query, limit=50, offset=0):
+        return await self.store.search_notes(query, limit=limit, offset=offset)
+
+    async def create_note(self, fields):
+        note = await self.store.create_note(fields)
+        await self._cached(self.cache._invalidate)
+        return note
+
+    async def update_note(self, note_id, fields):
+        try:
+            return await self.store.update_note(note_id, fields)
+        finally:
+            await self._cached(self.cache._invalidate)
+
+    async def delete_note(self, note_id):
+        try:
+            await self.store.delete_note(note_id)
+        finally:
+            await self._cached(self.cache._invalidate)
@@ -0,0 +1,311 @@
+"""Note storage backends.
+
+The note routes talk to a NoteStore instead of a concrete client, so notes can
+be served either through Supabase (PostgREST over HTTPS) or straight from a SQL
+database through SQLAlchemy. The backend is chosen with the NOTE_STORE
+environment variable: 'supabase' (default) or 'sql'.
+
+The ASGI mode (src/asgi.py) also asks for an async store: the Supabase backend
+has one (AsyncSupabaseNoteStore), the SQL backend doesn't and is served by the
+sync views.
+"""
+import base64
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+# Columns a caller may ask for with ?fields=. 'preview' is a truncated content.
+NOTE_FIELDS = ('id', 'title', 'content', 'preview', 'tags', 'event_date', 'start_time', 'created_at', 'updated_at',
+               'version')
+PREVIEW_CHARS = 120
+# readers of the change feed hold their cursor this far behind "now": a write
+# that was stamped earlier but committed later must not fall behind a cursor
+SYNC_SAFETY_LAG = timedelta(seconds=5)
+
+
+def hold_back(position, after=None):
+    """Cap a change feed position ``(updated_at, id)`` at now - SYNC_SAFETY_LAG.
+
+    Changes past the cap are read again on the next poll, so readers must apply
+    changes idempotently (by id). The result never falls behind ``after``, the
+    position the read started from.
+    """
+    if position is None:
+        return None
+    horizon = ((datetime.utcnow() - SYNC_SAFETY_LAG).isoformat(), 0)
+    if position <= horizon:
+        return position
+    return max(after, horizon) if after else horizon
+
+
+class NoteNotFoundError(LookupError):
+    """Raised when a note id does not exist in the store."""
+
+
+class VersionConflictError(Exception):
+    """Raised when a conditional write names a version that is no longer current."""
+
+    def __init__(self, note):
+        super().__init__(f"Note {note['id']} is at version {note['version']}")
+        self.note = note
+
+
+class NoteStore:
+    """Interface implemented by every note backend.
+
+    Notes go in and come out as plain dicts shaped like ``Note.to_dict()``:
+    ``tags`` is a list, ``event_date`` is ``YYYY-MM-DD``, ``start_time`` is
+    ``HH:MM`` and the timestamps are ISO strings.
+    """
+
+    def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        """Return notes ordered by (updated_at, id), most recent first.
+
+        ``after`` is a decoded cursor ``(updated_at, id)``; only notes strictly
+        older than it are returned. ``fields`` restricts the returned keys.
+        ``tags`` (names from normalize_tags) keeps only notes carrying all of
+        them, or any of them with ``match_any``.
+        """
+        raise NotImplementedError
+
+    def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        """Return live notes with an event_date, ordered by (event_date, start_time, id).
+
+        Notes without a start_time come last within their day. ``start`` and
+        ``end`` are inclusive ISO dates (either may be None). ``after`` is a
+        decoded agenda cursor ``(event_date, start_time, id)``; only notes
+        strictly after it are returned.
+        """
+        raise NotImplementedError
+
+    def get_note(self, note_id):
+        """Return one note or raise NoteNotFoundError."""
+        raise NotImplementedError
+
+    def create_note(self, fields):
+        """Insert a note and return it. The store stamps created_at/updated_at."""
+        raise NotImplementedError
+
+    def update_note(self, note_id, fields):
+        """Update the given fields, bump updated_at and return the note."""
+        raise NotImplementedError
+
+    def patch_note(self, note_id, fields, expected_version, new_version=None):
+        """Update ``fields`` only if the note is still at ``expected_version``.
+
+        The note ends up at ``new_version`` (default ``expected_version + 1``).
+        Raises VersionConflictError carrying the current note on a mismatch.
+        """
+        raise NotImplementedError
+
+    def delete_note(self, note_id):
+        """Soft-delete a note, leaving a tombstone for the change feed.
+
+        Deleting a missing note is not an error. Tombstones are invisible to
+        every other read.
+        """
+        raise NotImplementedError
+
+    def apply_batch(self, creates=(), updates=(), deletes=()):
+        """Apply many mutations with one bulk statement per kind.
+
+        ``creates`` is a list of field dicts, ``updates`` a list of
+        ``(note_id, fields)`` and ``deletes`` a list of ids. Returns
+        ``(created, updated)``: the created notes in input order and a dict
+        ``{note_id: note}`` holding every update whose note exists.
+        """
+        raise NotImplementedError
+
+    def list_changes(self, after=None, limit=100):
+        """Return notes changed after the cursor ``after``, oldest change first.
+
+        Live notes come back as full dicts; deleted ones as tombstones
+        ``{'id', 'updated_at', 'deleted': True}``.
+        """
+        raise NotImplementedError
+
+    def iter_notes(self, batch_size=1000):
+        """Yield every live note in id order, fetching batch_size rows at a time.
+
+        Used for exports: memory use stays bounded however many notes there are.
+        """
+        raise NotImplementedError
+
+    def tag_counts(self):
+        """Return ``[{'tag', 'count'}]`` for every tag on a live note, most used first."""
+        raise NotImplementedError
+
+    def search_notes(self, query, limit=50, offset=0):
+        """Full-text search, best match first.
+
+        Each hit is a note dict with two extra keys: ``rank`` (higher is
+        better, backend specific) and ``snippet`` (matched text wrapped in
+        ``<mark>`` tags). Backends without a search index fall back to
+        substring matching with ``rank``/``snippet`` set to None.
+        """
+        raise NotImplementedError
+
+
+def parse_fields(value):
+    """Parse a ``fields=`` query value into a tuple of note keys (or None for all)."""
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in NOTE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    # id and updated_at are always returned: they make up the pagination cursor
+    for key in ('updated_at', 'id'):
+        if key not in fields:
+            fields.insert(0, key)
+    return tuple(fields)
+
+
+def normalize_tags(names):
+    """Tag names as stored in the tag table: trimmed, lowercased, deduplicated and sorted."""
+    return sorted({str(n).strip().lower() for n in names if str(n).strip()})
+
+
+def encode_cursor(note):
+    """Build an opaque cursor pointing at ``note`` in (updated_at, id) order."""
+    raw = json.dumps([note['updated_at'], note['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        updated_at, note_id = json.loads(raw)
+        return str(updated_at), int(note_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def encode_agenda_cursor(note):
+    """Build an opaque cursor pointing at ``note`` in (event_date, start_time, id) order."""
+    raw = json.dumps([note['event_date'], note['start_time'], note['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_agenda_cursor(cursor):
+    """Inverse of encode_agenda_cursor; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        event_date, start_time, note_id = json.loads(raw)
+        return str(event_date), (str(start_time) if start_time is not None else None), int(note_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def escape_like(value):
+    """Escape LIKE wildcards (backslash is the escape character) so value matches literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_terms(query):
+    """Split a search box query into plain word terms (no query syntax allowed)."""
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def tombstone(note_id, updated_at):
+    return {'id': note_id, 'updated_at': updated_at, 'deleted': True}
+
+
+def project(note, fields):
+    """Apply a ``fields`` projection to a full note dict."""
+    if not fields:
+        return note
+    out = {}
+    for f in fields:
+        if f == 'preview':
+            out[f] = (note.get('content') or '')[:PREVIEW_CHARS]
+        else:
+            out[f] = note.get(f)
+    return out
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_note_store(backend=None):
+    backend = (backend or os.environ.get('NOTE_STORE') or 'supabase').lower()
+    if backend == 'supabase':
+        from src.store.supabase_store import SupabaseNoteStore
+        store = SupabaseNoteStore.from_env()
+    elif backend in ('sql', 'sqlalchemy'):
+        from src.store.sql_store import SqlNoteStore
+        store = SqlNoteStore()
+    else:
+        raise ValueError(f'Unknown NOTE_STORE backend: {backend}')
+    # timed below the cache, so the spans show real backend round trips
+    from src.store.timed import TimedNoteStore
+    store = TimedNoteStore(store)
+    if os.environ.get('NOTE_CACHE', '1') != '0':
+        from src.store.cache import CachedNoteStore
+        store = CachedNoteStore.from_env(store)
+    return store
+
+
+def get_note_store():
+    """Return the process-wide note store, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_note_store()
+    return _store
+
+
+def existing_note_store():
+    """Return the process-wide note store if it has been created, else None (nothing is created)."""
+    return _store
+
+
+def set_note_store(store):
+    """Replace the process-wide note store (used by scripts and benchmarks)."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+_async_store = None
+_async_store_created = False
+_async_store_lock = threading.Lock()
+
+
+def create_async_note_store(backend=None):
+    """An async counterpart of the note store, or None when the backend has none."""
+    backend = (backend or os.environ.get('NOTE_STORE') or 'supabase').lower()
+    if backend != 'supabase':
+        return None
+    from src.store.supabase_store import AsyncSupabaseNoteStore
+    store = AsyncSupabaseNoteStore.from_env()
+    from src.store.cache import AsyncCachedNoteStore, CachedNoteStore
+    cache = get_note_store()
+    if isinstance(cache, CachedNoteStore):
+        # shares the sync store's cache, so writes through either one invalidate both
+        store = AsyncCachedNoteStore(store, cache)
+    return store
+
+
+def get_async_note_store():
+    """Return the process-wide async note store (None for backends without one)."""
+    global _async_store, _async_store_created
+    if not _async_store_created:
+        with _async_store_lock:
+            if not _async_store_created:
+                _async_store = create_async_note_store()
+                _async_store_created = True
+    return _async_store
+
+
+def set_async_note_store(store):
+    """Replace the process-wide async note store (used by scripts and benchmarks)."""
+    global _async_store, _async_store_created
+    with _async_store_lock:
+        _async_store = store
+        _async_store_created = True
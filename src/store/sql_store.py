@@ -0,0 +1,393 @@
+"""NoteStore backed by SQLAlchemy (local SQLite or a nearby Postgres).
+
+Uses the app's Flask-SQLAlchemy session, so it must run inside an app context.
+Pool sizing, pre-ping and statement caching come from ``engine_options()``,
+which ``src/main.py`` feeds into ``SQLALCHEMY_ENGINE_OPTIONS``.
+"""
+import json
+import os
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from sqlalchemy import and_, func, insert, or_, select, text, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from src.current_user import current_user_id
+from src.models.note import Note, db
+from src.models.tag import Tag, note_tag
+from src.store.note_store import NoteStore, NoteNotFoundError, VersionConflictError, NOTE_FIELDS, PREVIEW_CHARS, escape_like, search_terms, tombstone
+
+
+def engine_options(url):
+    """Engine options for a pooled, pre-pinged connection with statement caching."""
+    options = {
+        'pool_pre_ping': True,
+        # SQLAlchemy's compiled-statement cache; repeated note queries skip SQL compilation
+        'query_cache_size': int(os.environ.get('SQL_QUERY_CACHE_SIZE', 1200)),
+    }
+    if url.startswith('sqlite'):
+        # sqlite3 keeps this many prepared statements per connection
+        options['connect_args'] = {'cached_statements': 256}
+        if ':memory:' in url or url.rstrip('/') == 'sqlite:':
+            return options
+    options.update(
+        pool_size=int(os.environ.get('SQL_POOL_SIZE', 5)),
+        max_overflow=int(os.environ.get('SQL_MAX_OVERFLOW', 10)),
+        pool_recycle=int(os.environ.get('SQL_POOL_RECYCLE', 1800)),
+        pool_timeout=int(os.environ.get('SQL_POOL_TIMEOUT', 30)),
+    )
+    return options
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value))
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value))
+
+
+@lru_cache(maxsize=4096)
+def _decode_tags(value):
+    # most notes share a handful of tag lists, so each distinct one is parsed once
+    return tuple(json.loads(value))
+
+
+def _format_tags(value):
+    return list(_decode_tags(value)) if value else []
+
+
+def _format_date(value):
+    return value.isoformat() if value else None
+
+
+def _format_time(value):
+    return value.isoformat('minutes') if value else None
+
+
+# column expression and formatter for every projectable field (see NOTE_FIELDS)
+_COLUMNS = {
+    'id': (Note.id, None),
+    'title': (Note.title, None),
+    'content': (Note.content, None),
+    'preview': (func.substr(Note.content, 1, PREVIEW_CHARS).label('preview'), None),
+    'tags': (Note.tags, _format_tags),
+    'event_date': (Note.event_date, _format_date),
+    'start_time': (Note.start_time, _format_time),
+    'created_at': (Note.created_at, _format_date),
+    'updated_at': (Note.updated_at, _format_date),
+    'version': (Note.version, None),
+}
+
+# what Note.to_dict() returns
+_DICT_FIELDS = tuple(f for f in NOTE_FIELDS if f != 'preview')
+
+
+def _select(fields):
+    """A select of the fields' columns, and a function turning its rows into note dicts.
+
+    Reading plain rows skips building ORM objects, and only the columns that need
+    formatting are touched after the row is zipped into a dict.
+    """
+    fields = tuple(fields)
+    formatters = [(f, _COLUMNS[f][1]) for f in fields if _COLUMNS[f][1]]
+
+    def to_dict(row):
+        note = dict(zip(fields, row))
+        for field, fmt in formatters:
+            note[field] = fmt(note[field])
+        return note
+    return select(*[_COLUMNS[f][0] for f in fields]), to_dict
+
+
+def _older_than(after):
+    updated_at, note_id = after
+    updated_at = datetime.fromisoformat(updated_at)
+    return or_(Note.updated_at < updated_at,
+               and_(Note.updated_at == updated_at, Note.id < note_id))
+
+
+def _newer_than(after):
+    updated_at, note_id = after
+    updated_at = datetime.fromisoformat(updated_at)
+    return or_(Note.updated_at > updated_at,
+               and_(Note.updated_at == updated_at, Note.id > note_id))
+
+
+def _owned(column=Note.user_id):
+    # the current user's rows (see src/current_user.py); requests without a user own the NULL ones
+    user_id = current_user_id()
+    return column.is_(None) if user_id is None else column == user_id
+
+
+def _live():
+    # every read goes through this, so it always stays within the owner's index range
+    return and_(Note.deleted_at.is_(None), _owned())
+
+
+def _agenda_after(after):
+    event_date, start_time, note_id = after
+    event_date = _parse_date(event_date)
+    if start_time is None:
+        # untimed notes come last in a day, so only later untimed ones follow
+        same_day = and_(Note.start_time.is_(None), Note.id > note_id)
+    else:
+        start_time = _parse_time(start_time)
+        same_day = or_(Note.start_time > start_time, Note.start_time.is_(None),
+                       and_(Note.start_time == start_time, Note.id > note_id))
+    return or_(Note.event_date > event_date, and_(Note.event_date == event_date, same_day))
+
+
+def _agenda_order(dialect):
+    # matches ix_note_agenda (alembic 0007); SQLite sorts NULLs first, so its index leads with the IS NULL flag
+    if dialect == 'sqlite':
+        return Note.event_date, Note.start_time.is_(None), Note.start_time, Note.id
+    return Note.event_date, Note.start_time.asc().nulls_last(), Note.id
+
+
+def _tagged(tags, match_any):
+    """Notes carrying all (or any) of the tags: index lookups on tag.name and note_tag(tag_id, user_id, note_id)."""
+    note_ids = (select(note_tag.c.note_id)
+                .join(Tag, Tag.id == note_tag.c.tag_id)
+                .where(Tag.name.in_(tags), _owned(note_tag.c.user_id))
+                .group_by(note_tag.c.note_id))
+    if not match_any:
+        note_ids = note_ids.having(func.count() == len(tags))
+    return Note.id.in_(note_ids)
+
+
+def _column_values(fields):
+    """Convert API field values (tag lists, ISO strings) into Note column values."""
+    values = {}
+    if 'title' in fields:
+        values['title'] = fields['title']
+    if 'content' in fields:
+        values['content'] = fields['content']
+    if 'tags' in fields:
+        values['tags'] = json.dumps(fields['tags'] or [], ensure_ascii=False)
+    if 'event_date' in fields:
+        values['event_date'] = _parse_date(fields['event_date'])
+    if 'start_time' in fields:
+        values['start_time'] = _parse_time(fields['start_time'])
+    return values
+
+
+def _apply_fields(note, fields):
+    for key, value in _column_values(fields).items():
+        setattr(note, key, value)
+
+
+# FTS queries; the tables/columns they use come from alembic revision 0003
+_SQLITE_SEARCH = text("""
+    SELECT note_fts.rowid AS id, -bm25(note_fts, 10.0, 1.0) AS rank,
+           snippet(note_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet
+    FROM note_fts JOIN note ON note.id = note_fts.rowid
+    WHERE note_fts MATCH :q AND note.deleted_at IS NULL AND note.user_id IS :user_id
+    ORDER BY bm25(note_fts, 10.0, 1.0)
+    LIMIT :limit OFFSET :offset
+""")
+
+_POSTGRES_SEARCH = text("""
+    SELECT hits.id, hits.rank,
+           ts_headline('simple', note.content, to_tsquery('simple', :q),
+                       'StartSel=<mark>, StopSel=</mark>, MaxFragments=1, MaxWords=20, MinWords=5') AS snippet
+    FROM (
+        SELECT id, updated_at, ts_rank_cd(search_vector, to_tsquery('simple', :q)) AS rank
+        FROM note
+        WHERE search_vector @@ to_tsquery('simple', :q) AND deleted_at IS NULL
+          AND user_id IS NOT DISTINCT FROM :user_id
+        ORDER BY rank DESC, updated_at DESC
+        LIMIT :limit OFFSET :offset
+    ) hits JOIN note ON note.id = hits.id
+    ORDER BY hits.rank DESC, hits.updated_at DESC
+""")
+
+
+def _fts_query(dialect, terms):
+    # every term must match; the last one is a prefix so search-as-you-type works
+    if dialect == 'sqlite':
+        return ' '.join(f'"{t}"' for t in terms) + '*'
+    return ' & '.join(terms) + ':*'
+
+
+class SqlNoteStore(NoteStore):
+    def _get(self, note_id):
+        note = db.session.get(Note, note_id)
+        if note is None or note.deleted_at is not None or note.user_id != current_user_id():
+            raise NoteNotFoundError(note_id)
+        return note
+
+    def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        stmt, to_dict = _select(fields or _DICT_FIELDS)
+        stmt = stmt.where(_live())
+        if tags:
+            stmt = stmt.where(_tagged(tags, match_any))
+        if after:
+            stmt = stmt.where(_older_than(after))
+        stmt = stmt.order_by(Note.updated_at.desc(), Note.id.desc())
+        if limit:
+            stmt = stmt.limit(limit)
+        return [to_dict(row) for row in db.session.execute(stmt)]
+
+    def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        # both terms of the partial index's WHERE, so the planner can use it
+        conditions = [Note.event_date.isnot(None), _live()]
+        if after:
+            # the index range starts at the cursor's day, so a page costs the same however deep it is
+            start = max(start or after[0], after[0])
+        if start:
+            conditions.append(Note.event_date >= _parse_date(start))
+        if end:
+            conditions.append(Note.event_date <= _parse_date(end))
+        if after:
+            conditions.append(_agenda_after(after))
+        stmt, to_dict = _select(fields or _DICT_FIELDS)
+        stmt = stmt.where(*conditions).order_by(*_agenda_order(db.session.get_bind().dialect.name)).limit(limit)
+        return [to_dict(row) for row in db.session.execute(stmt)]
+
+    def get_note(self, note_id):
+        return self._get(note_id).to_dict()
+
+    def create_note(self, fields):
+        now = datetime.utcnow()
+        note = Note(created_at=now, updated_at=now, user_id=current_user_id())
+        _apply_fields(note, fields)
+        db.session.add(note)
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return note.to_dict()
+
+    def update_note(self, note_id, fields):
+        note = self._get(note_id)
+        _apply_fields(note, fields)
+        note.updated_at = datetime.utcnow()
+        note.version = (note.version or 0) + 1
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return note.to_dict()
+
+    def patch_note(self, note_id, fields, expected_version, new_version=None):
+        values = dict(_column_values(fields), updated_at=datetime.utcnow(),
+                      version=new_version or expected_version + 1)
+        # compare-and-set in one statement: no row matches if someone else wrote first
+        result = db.session.execute(
+            update(Note)
+            .where(Note.id == note_id, Note.version == expected_version, _live())
+            .values(**values)
+            .execution_options(synchronize_session=False))
+        if result.rowcount != 1:
+            db.session.rollback()
+            raise VersionConflictError(self.get_note(note_id))
+        db.session.commit()
+        return self.get_note(note_id)
+
+    def delete_note(self, note_id):
+        now = datetime.utcnow()
+        Note.query.filter(Note.id == note_id, _live()).update(
+            {Note.deleted_at: now, Note.updated_at: now}, synchronize_session=False)
+        db.session.commit()
+
+    def apply_batch(self, creates=(), updates=(), deletes=()):
+        now = datetime.utcnow()
+        created, updated = [], {}
+        try:
+            if creates:
+                rows = [dict(_column_values(f), created_at=now, updated_at=now, user_id=current_user_id())
+                        for f in creates]
+                # one executemany INSERT .. RETURNING, results in input order
+                notes = db.session.scalars(insert(Note).returning(Note, sort_by_parameter_order=True), rows)
+                created = [n.to_dict() for n in notes]
+            if updates:
+                ids = {note_id for note_id, _ in updates}
+                versions = dict(db.session.execute(select(Note.id, Note.version).where(Note.id.in_(ids), _live())).all())
+                existing = set(versions)
+                rows = []
+                for note_id, f in updates:
+                    if note_id in versions:
+                        versions[note_id] += 1
+                        rows.append(dict(_column_values(f), id=note_id, updated_at=now, version=versions[note_id]))
+                if rows:
+                    # bulk UPDATE by primary key (one executemany per distinct column set)
+                    db.session.execute(update(Note), rows)
+                    db.session.expire_all()
+                    updated = {n.id: n.to_dict() for n in Note.query.filter(Note.id.in_(existing))}
+            if deletes:
+                Note.query.filter(Note.id.in_(set(deletes)), _live()).update(
+                    {Note.deleted_at: now, Note.updated_at: now}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return created, updated
+
+    def list_changes(self, after=None, limit=100):
+        query = Note.query.filter(_owned())
+        if after:
+            query = query.filter(_newer_than(after))
+        notes = query.order_by(Note.updated_at, Note.id).limit(limit).all()
+        return [tombstone(n.id, n.updated_at.isoformat()) if n.deleted_at else n.to_dict()
+                for n in notes]
+
+    def iter_notes(self, batch_size=1000):
+        stmt, to_dict = _select(_DICT_FIELDS)
+        # yield_per streams the result: a server-side cursor on Postgres, fetchmany() batches on SQLite
+        stmt = stmt.where(_live()).order_by(Note.id).execution_options(yield_per=batch_size)
+        for row in db.session.execute(stmt):
+            yield to_dict(row)
+
+    def tag_counts(self):
+        # note_tag only holds live notes and carries their owner, so this never touches the note table
+        count = func.count().label('count')
+        stmt = (select(Tag.name, count)
+                .join(note_tag, note_tag.c.tag_id == Tag.id)
+                .where(_owned(note_tag.c.user_id))
+                .group_by(Tag.name)
+                .order_by(count.desc(), Tag.name))
+        return [{'tag': name, 'count': n} for name, n in db.session.execute(stmt)]
+
+    def search_notes(self, query, limit=50, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        dialect = db.session.get_bind().dialect.name
+        stmt = _SQLITE_SEARCH if dialect == 'sqlite' else _POSTGRES_SEARCH
+        try:
+            hits = db.session.execute(stmt, {'q': _fts_query(dialect, terms), 'user_id': current_user_id(),
+                                             'limit': limit, 'offset': offset}).all()
+        except (OperationalError, ProgrammingError):
+            # search index not migrated yet (or unsupported dialect)
+            db.session.rollback()
+            return self._substring_search(query, limit, offset)
+
+        stmt, to_dict = _select(_DICT_FIELDS)
+        notes = {row.id: to_dict(row) for row in db.session.execute(stmt.where(Note.id.in_([h.id for h in hits])))}
+        results = []
+        for hit in hits:
+            note = notes.get(hit.id)
+            if note is None:
+                continue
+            results.append(dict(note, rank=float(hit.rank), snippet=hit.snippet))
+        return results
+
+    def _substring_search(self, query, limit, offset):
+        pattern = f'%{escape_like(query)}%'
+        stmt, to_dict = _select(_DICT_FIELDS)
+        stmt = (stmt.where(_live(), or_(Note.title.ilike(pattern, escape='\\'),
+                                        Note.content.ilike(pattern, escape='\\')))
+                .order_by(Note.updated_at.desc(), Note.id.desc())
+                .limit(limit).offset(offset))
+        return [dict(to_dict(row), rank=None, snippet=None) for row in db.session.execute(stmt)]
@@ -0,0 +1,320 @@
+"""NoteStore backed by the Supabase PostgREST API.
+
+SupabaseNoteStore runs on the sync supabase-py client. AsyncSupabaseNoteStore
+serves the request-path calls of the ASGI mode (src/asgi.py) as coroutines
+through the async PostgREST client; both build their queries with the same
+methods of _SupabaseQueries and differ only in how they execute them.
+"""
+import json
+import os
+from datetime import datetime
+
+from postgrest.exceptions import APIError
+
+from src.current_user import current_user_id
+from src.metrics import span
+from src.store.note_store import (NoteStore, NoteNotFoundError, VersionConflictError, NOTE_FIELDS, escape_like, project,
+                                  search_terms, tombstone)
+
+TABLE = 'note'
+# the columns of a note dict; '*' would also bring search_vector (alembic 0003), deleted_at and user_id
+NOTE_COLUMNS = ','.join(f for f in NOTE_FIELDS if f != 'preview')
+# columns of a note row that never leave the store
+_INTERNAL_COLUMNS = ('search_vector', 'deleted_at', 'user_id')
+
+
+def _note(row):
+    """A note row from PostgREST shaped like Note.to_dict(), as the SQL store returns it.
+
+    note.tags is a text column holding the JSON list and start_time a time, which
+    PostgREST sends as HH:MM:SS; writes (insert/update return representation) also
+    bring the internal columns back.
+    """
+    note = {k: v for k, v in row.items() if k not in _INTERNAL_COLUMNS}
+    if 'tags' in note:
+        tags = note['tags']
+        note['tags'] = json.loads(tags) if isinstance(tags, str) else list(tags or [])
+    if note.get('start_time'):
+        note['start_time'] = note['start_time'][:5]
+    return note
+
+
+def _write_row(fields):
+    """API field values as note column values: tags are stored as JSON text, like the SQL store does."""
+    row = dict(fields)
+    if 'tags' in row:
+        row['tags'] = json.dumps(row['tags'] or [], ensure_ascii=False)
+    return row
+
+
+def _supabase_env():
+    url = os.environ.get('SUPABASE_URL')
+    key = os.environ.get('SUPABASE_KEY')
+    if not url or not key:
+        raise ValueError("请在.env文件中配置SUPABASE_URL和SUPABASE_KEY")
+    return url, key
+
+
+class _SupabaseQueries:
+    """Query builders shared by the sync and the async store; `client` is either kind of client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self):
+        return self.client.table(TABLE)
+
+    @staticmethod
+    def _owned(query):
+        # the current user's rows (see src/current_user.py); requests without a user own the NULL ones
+        user_id = current_user_id()
+        return query.is_('user_id', 'null') if user_id is None else query.eq('user_id', user_id)
+
+    def _select_live(self, columns=NOTE_COLUMNS):
+        # tombstones (soft-deleted notes) are only visible through list_changes
+        return self._owned(self._table().select(columns).is_('deleted_at', 'null'))
+
+    def _list_query(self, limit, after, fields, tags, match_any):
+        if tags:
+            return self._tagged_query(limit, after, tags, match_any)
+        columns = NOTE_COLUMNS
+        if fields:
+            # PostgREST can't truncate, so previews are cut here from the content column
+            wanted = {'content' if f == 'preview' else f for f in fields}
+            columns = ','.join(sorted(wanted))
+        query = self._select_live(columns)
+        if after:
+            updated_at, note_id = after
+            query = query.or_(f'updated_at.lt."{updated_at}",'
+                              f'and(updated_at.eq."{updated_at}",id.lt.{note_id})')
+        query = query.order('updated_at', desc=True).order('id', desc=True)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    def _tagged_query(self, limit, after, tags, match_any):
+        # notes_by_tags() (alembic 0006, scoped by owner since 0008) runs the filter on the tag index in one round trip
+        params = {'tag_names': list(tags), 'match_any': match_any, 'lim': limit, 'owner_id': current_user_id()}
+        if after:
+            params.update(after_updated_at=after[0], after_id=after[1])
+        # the function returns whole note rows
+        return self.client.rpc('notes_by_tags', params).select(NOTE_COLUMNS)
+
+    def _agenda_query(self, start, end, after, limit, fields):
+        columns = NOTE_COLUMNS
+        if fields:
+            columns = ','.join(sorted({'content' if f == 'preview' else f for f in fields}))
+        query = self._select_live(columns).not_.is_('event_date', 'null')
+        if after:
+            # the index range starts at the cursor's day, so a page costs the same however deep it is
+            start = max(start or after[0], after[0])
+        if start:
+            query = query.gte('event_date', start)
+        if end:
+            query = query.lte('event_date', end)
+        if after:
+            event_date, start_time, note_id = after
+            if start_time is None:
+                same_day = f'and(start_time.is.null,id.gt.{note_id})'
+            else:
+                same_day = f'or(start_time.gt."{start_time}",start_time.is.null,' \
+                           f'and(start_time.eq."{start_time}",id.gt.{note_id}))'
+            query = query.or_(f'event_date.gt.{event_date},and(event_date.eq.{event_date},{same_day})')
+        # ascending order puts NULL start_times last on Postgres, as ix_note_agenda (alembic 0007) is built
+        return query.order('event_date').order('start_time').order('id').limit(limit)
+
+    def _get_query(self, note_id):
+        return self._select_live().eq('id', note_id).limit(1)
+
+    def _create_query(self, fields):
+        now = datetime.utcnow().isoformat()
+        return self._table().insert(dict(_write_row(fields), created_at=now, updated_at=now,
+                                         user_id=current_user_id()))
+
+    def _update_query(self, note_id, fields):
+        # the note_bump_version trigger (alembic 0005) increments version
+        row = dict(_write_row(fields), updated_at=datetime.utcnow().isoformat())
+        return self._owned(self._table().update(row).eq('id', note_id).is_('deleted_at', 'null'))
+
+    def _delete_query(self, note_id):
+        now = datetime.utcnow().isoformat()
+        return self._owned(self._table().update({'deleted_at': now, 'updated_at': now})
+                           .eq('id', note_id).is_('deleted_at', 'null'))
+
+    def _tag_counts_query(self):
+        return self.client.rpc('tag_counts', {'owner_id': current_user_id()})
+
+    def _search_query(self, terms, limit, offset):
+        # ranked tsvector search, see the search_notes() function in alembic revisions 0003 and 0008
+        return self.client.rpc('search_notes', {
+            'q': ' & '.join(terms) + ':*', 'lim': limit, 'off': offset, 'owner_id': current_user_id(),
+        })
+
+    def _substring_query(self, query, limit, offset):
+        # without the search_notes() function (migrations not applied). PostgREST reads '*' as '%' in
+        # patterns, so it becomes a one-character wildcard; the quoted value may hold ',' and ')'
+        pattern = '%' + escape_like(query).replace('*', '_') + '%'
+        value = '"' + pattern.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return (self._select_live()
+                .or_(f'title.ilike.{value},content.ilike.{value}')
+                .order('updated_at', desc=True)
+                .range(offset, offset + limit - 1))
+
+
+class SupabaseNoteStore(_SupabaseQueries, NoteStore):
+    @classmethod
+    def from_env(cls):
+        from supabase import create_client
+        return cls(create_client(*_supabase_env()))
+
+    def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        rows = self._list_query(limit, after, fields, tags, match_any).execute().data or []
+        return [project(_note(r), fields) for r in rows]
+
+    def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        rows = self._agenda_query(start, end, after, limit, fields).execute().data or []
+        return [project(_note(r), fields) for r in rows]
+
+    def get_note(self, note_id):
+        response = self._get_query(note_id).execute()
+        if not response.data:
+            raise NoteNotFoundError(note_id)
+        return _note(response.data[0])
+
+    def create_note(self, fields):
+        return _note(self._create_query(fields).execute().data[0])
+
+    def update_note(self, note_id, fields):
+        response = self._update_query(note_id, fields).execute()
+        if not response.data:
+            raise NoteNotFoundError(note_id)
+        return _note(response.data[0])
+
+    def patch_note(self, note_id, fields, expected_version, new_version=None):
+        row = dict(_write_row(fields), updated_at=datetime.utcnow().isoformat(),
+                   version=new_version or expected_version + 1)
+        query = (self._table().update(row)
+                 .eq('id', note_id).eq('version', expected_version).is_('deleted_at', 'null'))
+        response = self._owned(query).execute()
+        if not response.data:
+            raise VersionConflictError(self.get_note(note_id))
+        return _note(response.data[0])
+
+    def delete_note(self, note_id):
+        self._delete_query(note_id).execute()
+
+    def apply_batch(self, creates=(), updates=(), deletes=()):
+        # one apply_note_batch() call (alembic 0010): one transaction, and updates change only the
+        # keys they carry, in place, so concurrent edits of other columns survive and versions are bumped
+        merged = {}
+        for note_id, fields in updates:
+            merged.setdefault(note_id, {}).update(fields)
+        result = self.client.rpc('apply_note_batch', {
+            'creates': [_write_row(fields) for fields in creates],
+            'updates': [dict(_write_row(fields), id=note_id) for note_id, fields in merged.items()],
+            'deletes': sorted(set(deletes)),
+            'owner_id': current_user_id(),
+        }).execute().data or {}
+        created = [_note(r) for r in result.get('created') or []]
+        return created, {r['id']: _note(r) for r in result.get('updated') or []}
+
+    def list_changes(self, after=None, limit=100):
+        query = self._owned(self._table().select(f'{NOTE_COLUMNS},deleted_at'))
+        if after:
+            updated_at, note_id = after
+            query = query.or_(f'updated_at.gt."{updated_at}",'
+                              f'and(updated_at.eq."{updated_at}",id.gt.{note_id})')
+        rows = query.order('updated_at').order('id').limit(limit).execute().data or []
+        changes = []
+        for row in rows:
+            if row.get('deleted_at'):
+                changes.append(tombstone(row['id'], row['updated_at']))
+            else:
+                changes.append(_note(row))
+        return changes
+
+    def iter_notes(self, batch_size=1000):
+        # keyset pages by id; a page is one request and only one page is held at a time
+        last_id = None
+        while True:
+            query = self._select_live()
+            if last_id is not None:
+                query = query.gt('id', last_id)
+            rows = query.order('id').limit(batch_size).execute().data or []
+            yield from (_note(r) for r in rows)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1]['id']
+
+    def tag_counts(self):
+        return self._tag_counts_query().execute().data or []
+
+    def search_notes(self, query, limit=50, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        try:
+            return [_note(r) for r in self._search_query(terms, limit, offset).execute().data or []]
+        except APIError:
+            pass
+        rows = self._substring_query(query, limit, offset).execute().data or []
+        return [dict(_note(r), rank=None, snippet=None) for r in rows]
+
+
+class AsyncSupabaseNoteStore(_SupabaseQueries):
+    """The request-path calls of SupabaseNoteStore as coroutines, for the ASGI mode.
+
+    Covers the reads and single-note writes the async views use (src/routes/note_async.py);
+    batches, the change feed, exports and buffered PATCHes stay on the sync store. Each
+    call is timed as a `store.<method>` span, like TimedNoteStore does for the sync store.
+    """
+
+    @classmethod
+    def from_env(cls):
+        from src.aio import postgrest_client
+        return cls(postgrest_client(*_supabase_env()))
+
+    @staticmethod
+    async def _rows(name, query):
+        with span(f'store.{name}'):
+            return (await query.execute()).data or []
+
+    async def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        rows = await self._rows('list_notes', self._list_query(limit, after, fields, tags, match_any))
+        return [project(_note(r), fields) for r in rows]
+
+    async def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        rows = await self._rows('list_agenda', self._agenda_query(start, end, after, limit, fields))
+        return [project(_note(r), fields) for r in rows]
+
+    async def get_note(self, note_id):
+        rows = await self._rows('get_note', self._get_query(note_id))
+        if not rows:
+            raise NoteNotFoundError(note_id)
+        return _note(rows[0])
+
+    async def create_note(self, fields):
+        return _note((await self._rows('create_note', self._create_query(fields)))[0])
+
+    async def update_note(self, note_id, fields):
+        rows = await self._rows('update_note', self._update_query(note_id, fields))
+        if not rows:
+            raise NoteNotFoundError(note_id)
+        return _note(rows[0])
+
+    async def delete_note(self, note_id):
+        await self._rows('delete_note', self._delete_query(note_id))
+
+    async def tag_counts(self):
+        return await self._rows('tag_counts', self._tag_counts_query())
+
+    async def search_notes(self, query, limit=50, offset=0):
+        terms = search_terms(query)
+        if not terms:
+            return []
+        try:
+            return [_note(r) for r in await self._rows('search_notes', self._search_query(terms, limit, offset))]
+        except APIError:
+            pass
+        rows = await self._rows('search_notes', self._substring_query(query, limit, offset))
+        return [dict(_note(r), rank=None, snippet=None) for r in rows]
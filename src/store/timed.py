@@ -0,0 +1,56 @@
+"""NoteStore wrapper that times every backend call as a `store.<method>` span (see src/metrics.py)."""
+from src.metrics import span
+from src.store.note_store import NoteStore
+
+
+class TimedNoteStore(NoteStore):
+    def __init__(self, store):
+        self.store = store
+
+    def list_notes(self, limit=None, after=None, fields=None, tags=None, match_any=False):
+        with span('store.list_notes'):
+            return self.store.list_notes(limit=limit, after=after, fields=fields, tags=tags, match_any=match_any)
+
+    def list_agenda(self, start=None, end=None, after=None, limit=50, fields=None):
+        with span('store.list_agenda'):
+            return self.store.list_agenda(start=start, end=end, after=after, limit=limit, fields=fields)
+
+    def get_note(self, note_id):
+        with span('store.get_note'):
+            return self.store.get_note(note_id)
+
+    def create_note(self, fields):
+        with span('store.create_note'):
+            return self.store.create_note(fields)
+
+    def update_note(self, note_id, fields):
+        with span('store.update_note'):
+            return self.store.update_note(note_id, fields)
+
+    def patch_note(self, note_id, fields, expected_version, new_version=None):
+        with span('store.patch_note'):
+            return self.store.patch_note(note_id, fields, expected_version, new_version)
+
+    def delete_note(self, note_id):
+        with span('store.delete_note'):
+            return self.store.delete_note(note_id)
+
+    def apply_batch(self, creates=(), updates=(), deletes=()):
+        with span('store.apply_batch'):
+            return self.store.apply_batch(creates, updates, deletes)
+
+    def list_changes(self, after=None, limit=100):
+        with span('store.list_changes'):
+            return self.store.list_changes(after=after, limit=limit)
+
+    def iter_notes(self, batch_size=1000):
+        # a generator consumed while the response streams; timing it here would only measure its creation
+        return self.store.iter_notes(batch_size)
+
+    def tag_counts(self):
+        with span('store.tag_counts'):
+            return self.store.tag_counts()
+
+    def search_notes(self, query, limit=50, offset=0):
+        with span('store.search_notes'):
+            return self.store.search_notes(query, limit=limit, offset=offset)
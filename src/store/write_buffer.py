@@ -0,0 +1,252 @@
+"""Write-behind buffer that coalesces bursts of PATCHes to the same note.
+
+The first PATCH of a note within a window is held in memory; later PATCHes
+within the window are merged into it, and one compare-and-set write goes to
+the store when the window closes. Reads of a buffered note see the buffered
+state, and any other write to the note (PUT, DELETE, batch) flushes it first.
+
+A write that fails is not dropped. If another writer changed the note first
+(the compare-and-set fails), the buffered edits are lost: that is recorded and
+the next PATCH of the note gets a 409 with the stored note, so the client
+learns about it. Any other error puts the edits back in the buffer to be
+retried, and a flush that a PUT, DELETE or batch asked for raises it, so that
+write fails instead of overwriting the edits.
+
+The buffer lives in one process: reads and writes served by another worker
+neither see the buffered state nor flush it. It is meant for a single worker.
+
+WRITE_BEHIND_WINDOW sets the window in seconds; 0 writes every PATCH through
+immediately. It defaults to 0 on Vercel, where a frozen serverless instance
+could never flush, and with more than one worker (WEB_CONCURRENCY > 1, as read
+by gunicorn and uvicorn), and to 5 seconds elsewhere.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import datetime
+
+from src.current_user import as_user, current_user_id
+from src.store.note_store import VersionConflictError
+
+logger = logging.getLogger(__name__)
+
+# notes whose buffered edits were lost, remembered until their next PATCH
+LOST_MAX = 4096
+
+
+def default_window():
+    single_worker = int(os.environ.get('WEB_CONCURRENCY') or 1) <= 1
+    default = '5' if single_worker and not os.environ.get('VERCEL') else '0'
+    return float(os.environ.get('WRITE_BEHIND_WINDOW', default))
+
+
+class _Pending:
+    __slots__ = ('note', 'fields', 'db_version', 'deadline', 'user_id')
+
+    def __init__(self, note, db_version, deadline, user_id):
+        self.note = note              # the note as clients now see it
+        self.fields = {}              # changed fields not yet written
+        self.db_version = db_version  # version currently stored in the database
+        self.deadline = deadline
+        self.user_id = user_id        # the note's owner; the flush writes on their behalf
+
+
+class WriteBehindBuffer:
+    def __init__(self, store, window, app=None):
+        self.store = store
+        self.window = window
+        self.app = app
+        self._pending = {}
+        self._flushing = {}  # entries being written; still the freshest state of their note
+        self._lost = OrderedDict()  # note id -> owner, for buffered edits a concurrent write won over
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self.writes_buffered = 0
+        self.writes_flushed = 0
+        self.writes_lost = 0
+        self.flush_errors = 0
+
+    def current(self, note_id):
+        """Return the buffered state of a note, or None if nothing is pending."""
+        with self._lock:
+            entry = self._pending.get(note_id) or self._flushing.get(note_id)
+            return dict(entry.note) if entry and entry.user_id == current_user_id() else None
+
+    def submit(self, note, fields):
+        """Record ``fields`` as the next version of ``note`` and return that version.
+
+        ``note`` must be the current state (from current() or the store), and
+        the caller must already have checked the client's version against it.
+        """
+        if self.window <= 0:
+            return self.store.patch_note(note['id'], fields, note['version'])
+        with self._lock:
+            entry = self._pending.get(note['id'])
+            if entry is None:
+                entry = _Pending(dict(note), note['version'], time.monotonic() + self.window, current_user_id())
+                self._pending[note['id']] = entry
+                self._wakeup.notify()
+            elif entry.note['version'] != note['version']:
+                raise VersionConflictError(dict(entry.note))
+            entry.fields.update(fields)
+            entry.note.update(fields, version=entry.note['version'] + 1,
+                              updated_at=datetime.utcnow().isoformat())
+            self.writes_buffered += 1
+            self._ensure_thread()
+            return dict(entry.note)
+
+    def lost_edits(self, note_id):
+        """True (once) if buffered edits of the note were lost to a concurrent write.
+
+        The PATCH route answers 409 then, even if the client's version happens
+        to match the one the other writer left.
+        """
+        with self._lock:
+            if self._lost.get(note_id, False) != current_user_id():
+                return False
+            del self._lost[note_id]
+            return True
+
+    def flush(self, note_id=None):
+        """Write one pending note (or all of them) to the store now.
+
+        Raises the first error other than a version conflict; the entries that
+        failed that way stay buffered and are retried.
+        """
+        with self._lock:
+            if note_id is None:
+                entries = list(self._pending.values())
+                self._pending.clear()
+            else:
+                entry = self._pending.pop(note_id, None)
+                entries = [entry] if entry else []
+                # the write that asked for the flush supersedes edits that were lost
+                self._lost.pop(note_id, None)
+            for entry in entries:
+                self._flushing[entry.note['id']] = entry
+        error = None
+        for entry in entries:
+            try:
+                self._write(entry)
+            except Exception as e:
+                error = error or e
+            finally:
+                with self._lock:
+                    if self._flushing.get(entry.note['id']) is entry:
+                        del self._flushing[entry.note['id']]
+        if error is not None:
+            raise error
+
+    def discard_user(self, user_id):
+        """Drop the buffered edits of user_id's notes without writing them (the user is being deleted)."""
+        with self._lock:
+            for note_id in [nid for nid, e in self._pending.items() if e.user_id == user_id]:
+                del self._pending[note_id]
+            for note_id in [nid for nid, owner in self._lost.items() if owner == user_id]:
+                del self._lost[note_id]
+
+    def _write(self, entry):
+        note_id = entry.note['id']
+        try:
+            with self.app.app_context() if self.app is not None else nullcontext(), as_user(entry.user_id):
+                self.store.patch_note(note_id, entry.fields, entry.db_version, entry.note['version'])
+        except VersionConflictError as e:
+            # someone wrote through another process since we buffered; their write wins
+            logger.warning('Lost buffered edits of note %s: %s', note_id, e)
+            with self._lock:
+                self.writes_lost += 1
+                self._lost[note_id] = entry.user_id
+                self._lost.move_to_end(note_id)
+                while len(self._lost) > LOST_MAX:
+                    self._lost.popitem(last=False)
+            return
+        except Exception:
+            logger.exception('Failed to flush buffered edits of note %s, will retry', note_id)
+            self._retry(entry)
+            raise
+        self.writes_flushed += 1
+
+    def _retry(self, entry):
+        """Put a failed entry back in the buffer, under any edits submitted while it was being written."""
+        with self._lock:
+            self.flush_errors += 1
+            newer = self._pending.get(entry.note['id'])
+            if newer is not None:
+                # newer edits were buffered on top of this entry's state: write both, from the stored version
+                entry.fields.update(newer.fields)
+                entry.note = newer.note
+            entry.deadline = time.monotonic() + max(self.window, 1)
+            self._pending[entry.note['id']] = entry
+            self._wakeup.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                now = time.monotonic()
+                due = [nid for nid, e in self._pending.items() if e.deadline <= now]
+                if not due:
+                    wait = min(e.deadline for e in self._pending.values()) - now
+                    self._wakeup.wait(timeout=wait)
+                    continue
+            for note_id in due:
+                try:
+                    self.flush(note_id)
+                except Exception:
+                    # logged by _write, and the entry is buffered again
+                    pass
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.error('Buffered edits of %d note(s) were not written', len(self._pending))
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending), 'buffered': self.writes_buffered,
+                    'flushed': self.writes_flushed, 'lost': self.writes_lost, 'errors': self.flush_errors}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer(store, app=None):
+    """Return the process-wide buffer, creating it on first use.
+
+    ``app`` is pushed as app context around background flushes (the SQL store needs one).
+    """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = WriteBehindBuffer(store, default_window(), app=app)
+    return _buffer
+
+
+def flush_pending(note_id=None):
+    """Flush buffered edits before another write touches the note (no-op if nothing was buffered)."""
+    if _buffer is not None:
+        _buffer.flush(note_id)
+
+
+def discard_user(user_id):
+    if _buffer is not None:
+        _buffer.discard_user(user_id)
+
+
+def pending_note(note_id):
+    return _buffer.current(note_id) if _buffer is not None else None
@@ -0,0 +1,139 @@
+"""Splitting long notes into chunks for translation.
+
+split_for_translation() packs paragraphs into chunks of a token budget and keeps
+fenced code blocks and surrounding whitespace out of them, so the translated
+chunks can be joined back into a document with the original layout.
+"""
+import re
+
+# opening/closing line of a fenced code block (``` or ~~~, up to 3 spaces of indent)
+_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_LIST_ITEM = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s')
+_SENTENCE_END = re.compile(r'(?<=[.!?。！？；;])\s*')
+
+
+def estimate_tokens(text):
+    """Rough token count without a tokenizer: one per CJK character, one per 4 other characters."""
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + (len(text) - wide + 3) // 4
+
+
+def _blocks(text):
+    """Yield (text, kind) covering the whole input; kind is 'code', 'gap' (blank lines) or 'text'."""
+    lines = text.splitlines(keepends=True)
+    i = 0
+    while i < len(lines):
+        fence = _FENCE.match(lines[i])
+        if fence:
+            marker = fence.group(1)
+            j = i + 1
+            while j < len(lines):
+                closing = lines[j].strip()
+                if closing.startswith(marker) and set(closing) == {marker[0]}:
+                    break
+                j += 1
+            yield ''.join(lines[i:j + 1]), 'code'
+            i = j + 1
+            continue
+        j = i
+        if not lines[i].strip():
+            while j < len(lines) and not lines[j].strip():
+                j += 1
+            yield ''.join(lines[i:j]), 'gap'
+        else:
+            while j < len(lines) and lines[j].strip() and not _FENCE.match(lines[j]):
+                j += 1
+            yield ''.join(lines[i:j]), 'text'
+        i = j
+
+
+def _split_block(block, max_tokens):
+    """Break a paragraph that is over budget at list items, then lines, then sentences, then characters."""
+    lines = block.splitlines(keepends=True)
+    if len(lines) > 1:
+        units, current = [], ''
+        for line in lines:
+            # continuation lines stay with their list item
+            if current and (_LIST_ITEM.match(line) or not _LIST_ITEM.match(current)):
+                units.append(current)
+                current = ''
+            current += line
+        units.append(current)
+    else:
+        units = [part for part in _SENTENCE_END.split(block) if part]
+        # split() drops the whitespace after each sentence; put it back so the pieces rejoin exactly
+        rebuilt, pos = [], 0
+        for part in units:
+            start = block.index(part, pos)
+            if rebuilt:
+                rebuilt[-1] += block[pos:start]
+            rebuilt.append(part)
+            pos = start + len(part)
+        if rebuilt:
+            rebuilt[-1] += block[pos:]
+        units = rebuilt
+
+    out = []
+    for unit in units:
+        if estimate_tokens(unit) <= max_tokens:
+            out.append(unit)
+        elif unit != block:
+            out.extend(_split_block(unit, max_tokens))
+        else:
+            # one unbreakable run: cut it by characters
+            step = max(1, max_tokens)
+            out.extend(unit[k:k + step] for k in range(0, len(unit), step))
+    return out
+
+
+def split_for_translation(text, max_tokens=800):
+    """Split text into [(piece, translate)] whose concatenation is exactly the input.
+
+    Paragraphs (and list items, for oversized lists) are packed into chunks of at most max_tokens.
+    Fenced code blocks and the whitespace around chunks are kept verbatim (translate=False), so a
+    document reassembled from translated chunks keeps its original layout.
+    """
+    pieces = []
+    current, size = [], 0
+
+    def emit(piece, translate):
+        if not piece:
+            return
+        if pieces and not translate and not pieces[-1][1]:
+            pieces[-1] = (pieces[-1][0] + piece, False)
+        else:
+            pieces.append((piece, translate))
+
+    def flush():
+        nonlocal size
+        chunk = ''.join(current)
+        core = chunk.strip()
+        if core:
+            start = chunk.index(core)
+            emit(chunk[:start], False)
+            emit(core, True)
+            emit(chunk[start + len(core):], False)
+        else:
+            emit(chunk, False)
+        current.clear()
+        size = 0
+
+    for block, kind in _blocks(text):
+        if kind == 'code':
+            flush()
+            emit(block, False)
+        elif kind == 'gap':
+            if current:
+                current.append(block)
+            else:
+                emit(block, False)
+        else:
+            parts = [block] if estimate_tokens(block) <= max_tokens else _split_block(block, max_tokens)
+            for part in parts:
+                tokens = estimate_tokens(part)
+                if current and size + tokens > max_tokens:
+                    flush()
+                current.append(part)
+                size += tokens
+    flush()
+    return pieces
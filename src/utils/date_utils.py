@@ -1,5 +1,44 @@
 import re
 from datetime import datetime, date as date_cls, timedelta
+from functools import lru_cache
+
+# All patterns are compiled once and the slow ones are only run from the first place they can
+# match. The rules (and their priority order) are unchanged from the original per-call
+# implementation; scripts/bench_date_utils.py checks the output against it.
+
+_WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+_WEEKDAYS = {name: i for i, name in enumerate(_WEEKDAY_NAMES)}
+_CN_WEEKDAYS = {'一': 0, '二': 1, '三': 2, '四': 3, '五': 4, '六': 5, '日': 6}
+_MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9,
+           'oct': 10, 'nov': 11, 'dec': 12}
+_WD = '|'.join(_WEEKDAY_NAMES)
+# 'sep' is tried before 'sept' on purpose: that is how the original alternation matched
+_MON = 'jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec'
+
+_SPACE = re.compile(r'\s+')
+_IN_DAYS = re.compile(r'in\s+(\d+)\s+day')
+_NEXT_WEEKDAY = re.compile(r'next\s+(' + _WD + ')')
+_ON_DAY_MONTH = re.compile(r'on\s+(\d{1,2})(?:st|nd|rd|th)?\s*(' + _MON + ')')
+_CN_WEEKDAY = re.compile(r'(周|星期)([一二三四五六日])')
+# anything strptime could accept for the numeric formats below
+_NUMERIC_DATE = re.compile(r'[\d\s]+[-/][\d\s]+[-/][\d\s]+')
+_NUMERIC_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+
+_TOMORROW = re.compile(r'\btomorrow\b')
+_YESTERDAY = re.compile(r'\byesterday\b')
+_TODAY = re.compile(r'\btoday\b')
+_WEEKDAY_WORD = re.compile(r'\b(' + _WD + r')\b')
+# per weekday: its english name and the chinese names, in the order the original checked them
+_WEEKDAY_ALIASES = (('monday', '星期一', '周一'), ('tuesday', '星期二', '周二'), ('wednesday', '星期三', '周三'),
+                    ('thursday', '星期四', '周四'), ('friday', '星期五', '周五'), ('saturday', '星期六', '周六'),
+                    ('sunday', '星期日', '周日', '星期天'))
+_ON_DIGIT = re.compile(r'on\s+\d')
+
+_CLOCK_TIME = re.compile(r'(\d{1,2}:\d{2}\s*(am|pm)?)')
+_AMPM_TIME = re.compile(r'(\d{1,2}\s*(am|pm))')
+_HH_MM = re.compile(r'^(\d{1,2}):(\d{2})$')
+_HH_MM_AMPM = re.compile(r'^(\d{1,2})(?::(\d{2}))?\s*(am|pm)$')
+_HHMM = re.compile(r'^(\d{2})(\d{2})$')
 
 
 def _strip_edge_punct(s: str) -> str:
@@ -9,26 +48,36 @@ def _strip_edge_punct(s: str) -> str:
     return s.strip().strip(" \t\n\r,.;:!，。！？'")
 
 
-def normalize_date(date_str: str):
-    """Normalize a date string into ISO YYYY-MM-DD if possible.
-    Keeps original string if no parseable date is found.
-    Handles relative terms like 'tomorrow', 'yesterday', Chinese '明天/昨天', 'in 2 days', weekdays and some common numeric formats.
-    """
-    if not date_str:
-        return None
-    ds = str(date_str)
-    if not ds.strip():
-        return None
-    s = _strip_edge_punct(ds).lower()
-    today = date_cls.today()
+def _days_until(today, weekday, skip_today=False):
+    days_ahead = (weekday - today.weekday() + 7) % 7
+    if skip_today and days_ahead == 0:
+        days_ahead = 7
+    return (today + timedelta(days=days_ahead)).isoformat()
 
-    # direct ISO-like formats (allow spaces around hyphens)
-    iso_candidate = re.sub(r"\s+", "", ds)
+
+def _day_month(today, day, month):
+    """'20 oct' as the next such date (this year, or next year if it has passed); None if invalid."""
     try:
-        parsed = datetime.fromisoformat(iso_candidate)
-        return parsed.date().isoformat()
+        d = date_cls(today.year, month, day)
+        if d < today:
+            d = date_cls(today.year + 1, month, day)
+        return d.isoformat()
     except Exception:
-        pass
+        return None
+
+
+# Relative words depend on the day, so results are memoized per (input, today)
+@lru_cache(maxsize=4096)
+def _normalize_date(ds: str, today: date_cls):
+    s = _strip_edge_punct(ds).lower()
+
+    # direct ISO-like formats (allow spaces around hyphens); every ISO form starts with a 4-digit year
+    iso_candidate = _SPACE.sub('', ds)
+    if iso_candidate[:4].isdigit():
+        try:
+            return datetime.fromisoformat(iso_candidate).date().isoformat()
+        except Exception:
+            pass
 
     # common keywords (english and chinese)
     if s in ('tomorrow', 'tmr', 'tomorow', '明天'):
@@ -39,89 +88,67 @@ def normalize_date(date_str: str):
         return today.isoformat()
 
     # phrases like 'in 2 days'
-    m = re.search(r'in\s+(\d+)\s+day', s)
-    if m:
-        days = int(m.group(1))
-        return (today + timedelta(days=days)).isoformat()
-
-    # 'next monday' or just weekday name
-    weekdays = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
-                '周一': 0, '周二': 1, '周三': 2, '周四': 3, '周五': 4, '周六': 5, '周日': 6, '星期一': 0, '星期二': 1,
-                '星期三': 2, '星期四': 3, '星期五': 4, '星期六': 5, '星期日': 6}
-    m = re.search(r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', s)
+    m = _IN_DAYS.search(s)
     if m:
-        wd = weekdays[m.group(1)]
-        days_ahead = (wd - today.weekday() + 7) % 7
-        days_ahead = days_ahead if days_ahead != 0 else 7
-        return (today + timedelta(days=days_ahead)).isoformat()
+        return (today + timedelta(days=int(m.group(1)))).isoformat()
 
-    # plain weekday like 'monday' - pick nearest upcoming (including today)
-    m = re.match(r'^(monday|tuesday|wednesday|thursday|friday|saturday|sunday)$', s)
+    # 'next monday' or just weekday name - plain weekday picks nearest upcoming (including today)
+    m = _NEXT_WEEKDAY.search(s)
     if m:
-        wd = weekdays[m.group(1)]
-        days_ahead = (wd - today.weekday() + 7) % 7
-        if days_ahead == 0:
-            return today.isoformat()
-        return (today + timedelta(days=days_ahead)).isoformat()
-
-    # chinese weekday names
-    for name in ('星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日', '星期天', '周一', '周二', '周三', '周四', '周五', '周六', '周日'):
-        if name in s:
-            wd = weekdays.get(name.replace('星期', '星期').replace('周', '周')) if name in weekdays else None
-            # fallback: match by mapping
-            for k, v in weekdays.items():
-                if k in ('星期一','星期二','星期三','星期四','星期五','星期六','星期日','周一','周二','周三','周四','周五','周六','周日') and k in s:
-                    wd = v
-                    break
-            if wd is not None:
-                days_ahead = (wd - today.weekday() + 7) % 7
-                return (today + timedelta(days=days_ahead)).isoformat()
-
-    # 'on 20 Oct' or numeric date patterns
-    m = re.search(r'on\s+(\d{1,2})(?:st|nd|rd|th)?\s*(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)', s)
+        return _days_until(today, _WEEKDAYS[m.group(1)], skip_today=True)
+    if s in _WEEKDAYS:
+        return _days_until(today, _WEEKDAYS[s])
+
+    # chinese weekday names: any 周X wins over 星期X, and the earliest weekday wins within each
+    found = {}
+    for m in _CN_WEEKDAY.finditer(s):
+        wd = _CN_WEEKDAYS[m.group(2)]
+        found[m.group(1)] = min(wd, found.get(m.group(1), wd))
+    if found:
+        return _days_until(today, found.get('周', found.get('星期')))
+
+    # 'on 20 Oct'
+    m = _ON_DAY_MONTH.search(s)
     if m:
-        day = int(m.group(1))
-        mon_str = m.group(2)
-        mon_map = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9,
-                   'oct': 10, 'nov': 11, 'dec': 12}
-        mon = mon_map.get(mon_str, None)
-        if mon:
-            year = today.year
+        d = _day_month(today, int(m.group(1)), _MONTHS[m.group(2)])
+        if d:
+            return d
+
+    # try common numeric date formats
+    if _NUMERIC_DATE.fullmatch(s):
+        for fmt in _NUMERIC_FORMATS:
             try:
-                d = date_cls(year, mon, day)
-                if d < today:
-                    d = date_cls(year + 1, mon, day)
-                return d.isoformat()
+                return datetime.strptime(s, fmt).date().isoformat()
             except Exception:
                 pass
 
-    # try common numeric date formats
-    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d'):
-        try:
-            parsed = datetime.strptime(s, fmt)
-            return parsed.date().isoformat()
-        except Exception:
-            pass
-
     # fallback: return original (trimmed) string so frontend can handle free-form
     return _strip_edge_punct(ds)
 
 
-def normalize_time(time_str: str):
-    if not time_str:
+def normalize_date(date_str: str, today: date_cls = None):
+    """Normalize a date string into ISO YYYY-MM-DD if possible.
+    Keeps original string if no parseable date is found.
+    Handles relative terms like 'tomorrow', 'yesterday', Chinese '明天/昨天', 'in 2 days', weekdays and some common numeric formats.
+    Relative terms are resolved against `today` (default: the current date).
+    """
+    if not date_str:
         return None
-    ts = str(time_str)
-    if not ts.strip():
+    ds = str(date_str)
+    if not ds.strip():
         return None
+    return _normalize_date(ds, today or date_cls.today())
+
+
+@lru_cache(maxsize=4096)
+def _normalize_time(ts: str):
     s = _strip_edge_punct(ts).lower().replace('.', '')
     # if already HH:MM
-    m = re.match(r'^(\d{1,2}):(\d{2})$', s)
+    m = _HH_MM.match(s)
     if m:
-        hh = int(m.group(1))
-        mm = int(m.group(2))
-        return f"{hh:02d}:{mm:02d}"
+        return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
     # am/pm like '5pm' or '5:30pm'
-    m = re.match(r'^(\d{1,2})(?::(\d{2}))?\s*(am|pm)$', s)
+    m = _HH_MM_AMPM.match(s)
     if m:
         hh = int(m.group(1))
         mm = int(m.group(2) or 0)
@@ -132,82 +159,113 @@ def normalize_time(time_str: str):
             hh = 0
         return f"{hh:02d}:{mm:02d}"
     # 24h without colon like '1730'
-    m = re.match(r'^(\d{2})(\d{2})$', s)
+    m = _HHMM.match(s)
     if m:
         return f"{int(m.group(1)):02d}:{int(m.group(2)):02d}"
     return _strip_edge_punct(ts)
 
 
-def extract_date_from_text(text: str):
-    if not text:
+def normalize_time(time_str: str):
+    if not time_str:
+        return None
+    ts = str(time_str)
+    if not ts.strip():
+        return None
+    return _normalize_time(ts)
+
+
+def normalize_many(values, kind='date', today: date_cls = None):
+    """Normalize a batch of date (kind='date') or time (kind='time') strings, e.g. for bulk imports.
+
+    Same results as calling normalize_date/normalize_time on each value; "today" is read once
+    for the whole batch and repeated values are only parsed once.
+    """
+    if kind not in ('date', 'time'):
+        raise ValueError("kind must be 'date' or 'time'")
+    today = today or date_cls.today()
+    seen = {}
+    out = []
+    for value in values:
+        key = value if isinstance(value, str) else str(value) if value else None
+        if key not in seen:
+            if not value or not key.strip():
+                seen[key] = None
+            elif kind == 'date':
+                seen[key] = _normalize_date(key, today)
+            else:
+                seen[key] = _normalize_time(key)
+        out.append(seen[key])
+    return out
+
+
+def _may_contain_date(s):
+    # cheap substring checks first: most text has none of these and skips the regex searches
+    return ('day' in s or 'tmr' in s or 'tomorrow' in s or 'tonight' in s or '天' in s or '星期' in s
+            or '周' in s or _ON_DIGIT.search(s) is not None)
+
+
+def _search_from(pattern, s, literal, back=0):
+    """pattern.search(s) for a pattern whose matches contain `literal` at most `back` characters in.
+
+    Patterns that start with a word boundary scan slowly in Python's re; starting at the first
+    occurrence of the literal (found at memchr speed) gives the same leftmost match, and the
+    boundary check still sees the character before the start position.
+    """
+    i = s.find(literal)
+    return None if i < 0 else pattern.search(s, max(0, i - back))
+
+
+def _extract_date(s, today):
+    if not _may_contain_date(s):
         return None
-    s = text.lower()
-    today = date_cls.today()
     # english keywords
-    if re.search(r'\btomorrow\b', s) or 'tmr' in s or '明天' in s:
+    if 'tmr' in s or '明天' in s or _search_from(_TOMORROW, s, 'tomorrow'):
         return (today + timedelta(days=1)).isoformat()
-    if re.search(r'\byesterday\b', s) or 'yday' in s or '昨天' in s:
+    if 'yday' in s or '昨天' in s or _search_from(_YESTERDAY, s, 'yesterday'):
         return (today - timedelta(days=1)).isoformat()
-    if re.search(r'\btoday\b', s) or 'tonight' in s or '今天' in s:
+    if 'tonight' in s or '今天' in s or _search_from(_TODAY, s, 'today'):
         return today.isoformat()
-    m = re.search(r'in\s+(\d+)\s+day', s)
+    m = _IN_DAYS.search(s)
     if m:
-        days = int(m.group(1))
-        return (today + timedelta(days=days)).isoformat()
+        return (today + timedelta(days=int(m.group(1)))).isoformat()
     # next weekday
-    weekdays = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6}
-    m = re.search(r'next\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', s)
+    m = _NEXT_WEEKDAY.search(s)
     if m:
-        wd = weekdays[m.group(1)]
-        days_ahead = (wd - today.weekday() + 7) % 7
-        days_ahead = days_ahead if days_ahead != 0 else 7
-        return (today + timedelta(days=days_ahead)).isoformat()
-    m = re.search(r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', s)
+        return _days_until(today, _WEEKDAYS[m.group(1)], skip_today=True)
+    # every weekday name ends in 'day', at most 6 characters after its start ('wednesday')
+    m = _search_from(_WEEKDAY_WORD, s, 'day', back=6)
     if m:
-        wd = weekdays[m.group(1)]
-        days_ahead = (wd - today.weekday() + 7) % 7
-        return (today + timedelta(days=days_ahead)).isoformat()
-    # chinese weekdays
-    for idx, names in enumerate([('monday', '星期一', '周一'), ('tuesday', '星期二', '周二'), ('wednesday', '星期三', '周三'),
-                                 ('thursday', '星期四', '周四'), ('friday', '星期五', '周五'), ('saturday', '星期六', '周六'),
-                                 ('sunday', '星期日', '周日', '星期天')]):
+        return _days_until(today, _WEEKDAYS[m.group(1)])
+    # weekday names inside words and chinese weekdays: the earliest weekday wins
+    for wd, names in enumerate(_WEEKDAY_ALIASES):
         for name in names:
             if name in s:
-                wd = idx
-                days_ahead = (wd - today.weekday() + 7) % 7
-                return (today + timedelta(days=days_ahead)).isoformat()
+                return _days_until(today, wd)
     # english 'on 20 Oct'
-    m = re.search(r'on\s+(\d{1,2})(?:st|nd|rd|th)?\s*(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)', s)
+    m = _ON_DAY_MONTH.search(s)
     if m:
-        day = int(m.group(1))
-        mon_str = m.group(2)
-        mon_map = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'sept': 9,
-                   'oct': 10, 'nov': 11, 'dec': 12}
-        mon = mon_map.get(mon_str, None)
-        if mon:
-            year = today.year
-            try:
-                d = date_cls(year, mon, day)
-                if d < today:
-                    d = date_cls(year + 1, mon, day)
-                return d.isoformat()
-            except Exception:
-                pass
+        return _day_month(today, int(m.group(1)), _MONTHS[m.group(2)])
     return None
 
 
+def extract_date_from_text(text: str, today: date_cls = None):
+    if not text:
+        return None
+    return _extract_date(text.lower(), today or date_cls.today())
+
+
 def extract_time_from_text(text: str):
     if not text:
         return None
     s = text.lower()
-    # look for patterns like 5pm, 7:30pm, 19:00
-    m = re.search(r'(\d{1,2}:\d{2}\s*(am|pm)?)', s)
-    if m:
-        return normalize_time(m.group(1))
-    m = re.search(r'(\d{1,2}\s*(am|pm))', s)
+    # every match needs a digit; plain ascii text without one can skip the scans
+    if s.isascii() and not any(c in s for c in '0123456789'):
+        return None
+    # look for patterns like 5pm, 7:30pm, 19:00 (a clock time anywhere beats an earlier "5pm")
+    m = _CLOCK_TIME.search(s)
     if m:
         return normalize_time(m.group(1))
-    m = re.search(r'(\b\d{2}:\d{2}\b)', s)
+    m = _AMPM_TIME.search(s)
     if m:
         return normalize_time(m.group(1))
     return None
@@ -0,0 +1,155 @@
+"""Rule-based note generation for short prompts such as "Badminton tmr 5pm @polyu".
+
+The date and time come from date_utils, tags from #hashtags, @places and a small
+keyword table, and the title from whatever words are left. A confidence score
+says how sure the rules are; below LOCAL_GENERATE_MIN_CONFIDENCE (default 0.75)
+the caller should ask the model instead. LOCAL_GENERATE=0 turns the fast path off.
+"""
+import os
+import re
+
+from src.utils.date_utils import extract_date_from_text, extract_time_from_text
+
+_HASHTAG = re.compile(r'#(\w+)')
+# "@7pm" is a time, not a place
+_PLACE = re.compile(r'@(?!\d)([\w][\w.\-]*)')
+# words and phrases that extract_date_from_text / extract_time_from_text understand,
+# with the "at"/"on"/"by"/"@" that joins them to the rest of the prompt
+_DATE_TIME = re.compile(
+    r'(?:\b(?:at|on|by)\s+|@\s*)?'
+    r'(?:\b(?:next\s+)?(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b'
+    r'|\bin\s+\d+\s+days?\b'
+    r'|\bon\s+\d{1,2}(?:st|nd|rd|th)?\s*(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b'
+    r'|\b(?:tomorrow|tomorow|tmr|yesterday|yday|today|tonight)\b'
+    r'|\d{1,2}:\d{2}\s*(?:am|pm)?\b|\b\d{1,2}\s*(?:am|pm)\b'
+    r'|明天|昨天|今天|(?:星期|周)[一二三四五六日天])',
+    re.IGNORECASE)
+_FILLER = re.compile(r"^(?:remember to|remind me to|don'?t forget to|need to|have to|todo:?|to do:?|记得|提醒我)\s*",
+                     re.IGNORECASE)
+_CJK = re.compile(r'[⺀-鿿豈-﫿]')
+
+KEYWORD_TAGS = {
+    'sports': ('badminton', 'football', 'soccer', 'basketball', 'tennis', 'volleyball', 'gym', 'workout', 'running',
+               'run', 'swim', 'swimming', 'yoga', 'hike', 'hiking', '羽毛球', '篮球', '足球', '网球', '健身', '跑步', '游泳'),
+    'meeting': ('meeting', 'meet', 'standup', 'sync', 'interview', '会议', '开会', '面试'),
+    'study': ('class', 'lecture', 'exam', 'homework', 'assignment', 'study', 'tutorial', '上课', '考试', '作业', '复习'),
+    'food': ('lunch', 'dinner', 'breakfast', 'brunch', '午饭', '晚饭', '早餐', '吃饭'),
+    'shopping': ('buy', 'shopping', 'groceries', '购物', '买'),
+    'health': ('doctor', 'dentist', 'hospital', 'medicine', '看医生', '医院', '牙医'),
+    'travel': ('flight', 'train', 'airport', 'trip', '航班', '机场', '旅行'),
+    'social': ('party', 'birthday', '聚会', '生日'),
+}
+# keywords that describe the activity only loosely; they get the category tag but not a tag of their own
+_GENERIC_KEYWORDS = {'meet', 'run', 'buy', 'study', 'sync', '买'}
+_KEYWORDS = {word: category for category, words in KEYWORD_TAGS.items() for word in words}
+# English words that carry no detail of their own
+_STOPWORDS = {'a', 'an', 'the', 'and', 'or', 'with', 'for', 'to', 'of', 'in', 'at', 'on', 'by', 'about', 'my', 'our',
+              'some'}
+
+MAX_TAGS = 3
+
+
+def _language(text):
+    return 'chinese' if _CJK.search(text) else 'english'
+
+
+def _target_language(target):
+    target = (target or 'English').strip().lower()
+    if target in ('chinese', 'zh', '中文', 'simplified chinese', 'traditional chinese'):
+        return 'chinese'
+    if target in ('english', 'en'):
+        return 'english'
+    return target
+
+
+def _display_place(place):
+    return place[:1].upper() + place[1:] if place.islower() else place
+
+
+def generate_locally(prompt: str, target_language: str = 'English'):
+    """Build {title, content, tags, date, time} from the prompt without a model. Returns (note, confidence)."""
+    text = ' '.join((prompt or '').split())
+    language = _language(text)
+    if not text or _target_language(target_language) != language:
+        # translating into another language needs the model
+        return None, 0.0
+
+    hashtags = _HASHTAG.findall(text)
+    places = _PLACE.findall(text)
+    date = extract_date_from_text(text)
+    time = extract_time_from_text(text)
+
+    subject = _PLACE.sub(' ', _HASHTAG.sub(' ', text))
+    subject = _DATE_TIME.sub(' ', subject)
+    subject = _FILLER.sub('', ' '.join(subject.split()).strip(' ,.;:!，。！？'))
+    subject = subject.strip(' ,.;:!，。！？')
+    if not subject and hashtags:
+        subject = hashtags[0]
+    if not subject:
+        return None, 0.0
+
+    words = subject.split() if language == 'english' else list(subject.replace(' ', ''))
+    keywords = [w for w in re.findall(r'\w+', subject.lower()) if w in _KEYWORDS]
+    if language == 'chinese':
+        keywords = [w for w in _KEYWORDS if _CJK.match(w) and w in subject]
+
+    tags = []
+    for tag in [*(h.lower() for h in hashtags),
+                *(k for k in keywords if k not in _GENERIC_KEYWORDS),
+                *(_KEYWORDS[k] for k in keywords),
+                *(p.lower() for p in places)]:
+        if tag not in tags:
+            tags.append(tag)
+
+    confidence = 0.5
+    if keywords or hashtags:
+        confidence += 0.25
+    if date or time:
+        confidence += 0.15
+    if places:
+        confidence += 0.1
+    if language == 'english':
+        # free text the rules don't understand ("with Anna", "about the budget") goes into the note as it is
+        leftover = [w for w in re.findall(r'\w+', subject.lower()) if w not in _KEYWORDS and w not in _STOPWORDS]
+        confidence -= 0.1 * len(leftover)
+    limit = 4 if language == 'english' else 8
+    if len(words) > limit + 2:
+        confidence -= 0.5
+    elif len(words) > limit:
+        confidence -= 0.2
+    # numbers the date/time rules did not understand ("3点", "room 5") may be a time or a detail we would mangle
+    if re.search(r'\d', subject):
+        confidence -= 0.4
+
+    place = _display_place(places[0]) if places else None
+    if language == 'english':
+        title = ' '.join(w[:1].upper() + w[1:] for w in words[:4])
+        if place and len(words) < 4:
+            title += f' at {place}'
+        content = subject[:1].upper() + subject[1:]
+        if place:
+            content += f' at {place}'
+        if date:
+            content += f' on {date}'
+        if time:
+            content += f' at {time}'
+        content += '.'
+    else:
+        title = subject[:limit]
+        content = ''.join(part for part in (date and f'{date} ', time and f'{time} ', subject) if part)
+        if place:
+            content += f'，地点：{place}'
+        content += '。'
+
+    note = {'title': title, 'content': content, 'tags': tags[:MAX_TAGS], 'date': date, 'time': time}
+    return note, round(max(confidence, 0.0), 2)
+
+
+def local_note(prompt: str, target_language: str = 'English'):
+    """The locally generated note when the rules are confident enough, else None."""
+    if os.environ.get('LOCAL_GENERATE', '1') == '0':
+        return None
+    note, confidence = generate_locally(prompt, target_language)
+    if note is None or confidence < float(os.environ.get('LOCAL_GENERATE_MIN_CONFIDENCE', 0.75)):
+        return None
+    return note
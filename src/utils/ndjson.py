@@ -0,0 +1,86 @@
+"""Streaming NDJSON (one JSON value per line) for note export and import.
+
+Everything here works chunk by chunk, so memory use depends on the chunk and
+line size, never on the size of the whole file.
+"""
+import json
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_BYTES = 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def encode_lines(records, chunk_size=CHUNK_SIZE):
+    """Serialize records as NDJSON, yielding byte chunks of roughly chunk_size."""
+    buffer, size = [], 0
+    for record in records:
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of byte chunks into one gzip file, chunk by chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Read a binary stream in chunks, gunzipping it on the fly when it starts with the gzip magic bytes."""
+    chunk = stream.read(chunk_size)
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == GZIP_MAGIC else None
+    while chunk:
+        if decompressor is None:
+            yield chunk
+        else:
+            # bounded output per call, so a small, highly compressed upload can't balloon in memory
+            data = decompressor.decompress(chunk, chunk_size)
+            while True:
+                if data:
+                    yield data
+                if not decompressor.unconsumed_tail:
+                    break
+                data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+        chunk = stream.read(chunk_size)
+    if decompressor is not None:
+        if not decompressor.eof:
+            raise ValueError('Truncated gzip stream')
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+def iter_lines(chunks, max_line=MAX_LINE_BYTES):
+    """Split byte chunks into lines, yielding (line_number, line).
+
+    line is None for lines longer than max_line bytes; they are skipped
+    without being buffered.
+    """
+    buffer, number, too_long = b'', 0, False
+    for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b'\n', start)
+            if end < 0:
+                break
+            piece = chunk[start:end]
+            number += 1
+            yield number, None if too_long or len(buffer) + len(piece) > max_line else buffer + piece
+            buffer, too_long, start = b'', False, end + 1
+        rest = chunk[start:]
+        if too_long or len(buffer) + len(rest) > max_line:
+            buffer, too_long = b'', True
+        else:
+            buffer += rest
+    if buffer or too_long:
+        yield number + 1, None if too_long else buffer
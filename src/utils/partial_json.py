@@ -0,0 +1,57 @@
+import json
+import re
+
+_decoder = json.JSONDecoder()
+# skips separators (and any stray text such as a ```json fence) up to the next "key":
+_KEY = re.compile(r'[^"]*"((?:[^"\\]|\\.)*)"\s*:\s*')
+# an escape sequence cut off at the end of the buffer
+_TRAILING_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{0,3})?$')
+
+
+class PartialObjectReader:
+    """Read the top-level fields of a JSON object while it is still being streamed.
+
+    feed() returns the (key, value) pairs that became complete with the new text;
+    partial() returns the decoded prefix of a string value that is still arriving.
+    Nested values are only reported once they are complete.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.fields = {}
+
+    def feed(self, text: str):
+        self.buffer += text
+        completed = []
+        while True:
+            match = _KEY.match(self.buffer, self.pos)
+            if not match:
+                break
+            try:
+                value, end = _decoder.raw_decode(self.buffer, match.end())
+            except ValueError:
+                break
+            # a number or literal at the very end of the buffer may still be growing
+            if end == len(self.buffer) and not isinstance(value, (str, list, dict)):
+                break
+            key = json.loads(f'"{match.group(1)}"')
+            self.fields[key] = value
+            completed.append((key, value))
+            self.pos = end
+        return completed
+
+    def partial(self):
+        """(key, text so far) for a string value that has started but not finished, else None."""
+        match = _KEY.match(self.buffer, self.pos)
+        if not match or self.buffer[match.end():match.end() + 1] != '"':
+            return None
+        raw = self.buffer[match.end() + 1:]
+        trailing = _TRAILING_ESCAPE.search(raw)
+        # an even run of backslashes is a complete escaped backslash, not a cut-off escape
+        if trailing and (len(raw[:trailing.start()]) - len(raw[:trailing.start()].rstrip('\\'))) % 2 == 0:
+            raw = raw[:trailing.start()]
+        try:
+            return json.loads(f'"{match.group(1)}"'), json.loads(f'"{raw}"')
+        except ValueError:
+            return None
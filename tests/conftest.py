@@ -0,0 +1,70 @@
+"""Shared fixtures: the app on a throwaway SQLite database and both note stores.
+
+The environment is set before src.main is imported: it reads DATABASE_URL at
+import time. The Supabase store runs over the in-memory PostgREST fake of
+scripts/benchmark/fake_supabase.py, so no network or credentials are needed.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WORK_DIR = tempfile.mkdtemp(prefix='notes-tests-')
+
+# PATCHes are written through: tests/test_write_buffer.py runs the buffer on its own
+os.environ.update(DATABASE_URL=f"sqlite:///{os.path.join(WORK_DIR, 'app.db')}", NOTE_STORE='sql', NOTE_CACHE='0',
+                  JOB_QUEUE_PATH=os.path.join(WORK_DIR, 'jobs.db'), WRITE_BEHIND_WINDOW='0')
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts', 'benchmark'))
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app, migrate_database
+    migrate_database()
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    from src.models.note import db
+    with app.app_context():
+        yield
+        db.session.rollback()
+        # note_tag and tag follow the notes; the FTS triggers take live notes out of the index
+        for table in ('note_tag', 'note', 'tag'):
+            db.session.execute(db.text(f'DELETE FROM {table}'))
+        db.session.commit()
+
+
+@pytest.fixture
+def sql_store(app_context):
+    from src.store.sql_store import SqlNoteStore
+    return SqlNoteStore()
+
+
+@pytest.fixture
+def client(app, sql_store):
+    """Flask test client; the app serves the SQL store, emptied after the test like sql_store."""
+    return app.test_client()
+
+
+@pytest.fixture
+def fake_supabase():
+    from fake_supabase import FakeSupabaseClient
+    return FakeSupabaseClient()
+
+
+@pytest.fixture
+def supabase_store(fake_supabase):
+    from src.store.supabase_store import SupabaseNoteStore
+    return SupabaseNoteStore(fake_supabase)
+
+
+@pytest.fixture(params=['sql', 'supabase'])
+def store(request):
+    """Each NoteStore backend in turn."""
+    return request.getfixturevalue(f'{request.param}_store')
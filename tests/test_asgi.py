@@ -0,0 +1,112 @@
+"""src/asgi.py: coroutine views and the thread bridge serve requests like the WSGI app does."""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from src.store.note_store import get_note_store, set_async_note_store, set_note_store
+
+
+@pytest.fixture
+def asgi(supabase_store, fake_supabase, monkeypatch):
+    from fake_supabase import FakeAsyncSupabaseClient
+    from src import asgi
+    from src.store import write_buffer
+    from src.store.supabase_store import AsyncSupabaseNoteStore
+
+    previous = get_note_store()
+    set_note_store(supabase_store)
+    set_async_note_store(AsyncSupabaseNoteStore(FakeAsyncSupabaseClient(fake_supabase)))
+    # the view table is built on the first request, for the async store of the moment
+    monkeypatch.setattr(asgi, '_views', None)
+    # and the write buffer for the store of the moment
+    monkeypatch.setattr(write_buffer, '_buffer', None)
+    yield asgi
+    set_note_store(previous)
+    set_async_note_store(None)
+
+
+def _call(asgi, *requests):
+    """Send (method, url, kwargs) requests one after the other through the ASGI app; returns the responses."""
+    async def run():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return [await client.request(method, url, **kwargs) for method, url, kwargs in requests]
+    return asyncio.run(run())
+
+
+def test_async_views_serve_note_crud(asgi):
+    assert 'note.create_note' in asgi._async_views()
+    created, = _call(asgi, ('POST', '/api/notes', {'json': {'title': 'hello', 'content': 'world', 'tags': 'a,b'}}))
+    assert created.status_code == 201
+    note = created.json()
+    assert note['tags'] == ['a', 'b']
+    fetched, missing = _call(asgi, ('GET', f"/api/notes/{note['id']}", {}), ('GET', '/api/notes/999', {}))
+    assert fetched.status_code == 200 and fetched.json() == note
+    # the app's after_request hooks ran: metrics
+    assert 'server-timing' in fetched.headers
+    assert missing.status_code == 404 and missing.json() == {'error': 'Note not found'}
+
+
+def test_async_views_run_before_request_hooks(asgi):
+    # src/current_user.py refuses the header unless TRUST_USER_HEADER=1
+    response, = _call(asgi, ('GET', '/api/notes', {'headers': {'X-User-Id': '1'}}))
+    assert response.status_code == 400
+
+
+def test_options_does_not_run_the_view(asgi, fake_supabase):
+    preflight, plain = _call(asgi, ('OPTIONS', '/api/notes', {'headers': {
+        'Origin': 'http://example.com', 'Access-Control-Request-Method': 'POST'}}), ('OPTIONS', '/api/notes', {}))
+    assert preflight.status_code == 200
+    assert preflight.headers['access-control-allow-origin'] in ('*', 'http://example.com')
+    assert plain.status_code == 200 and plain.content == b''
+    assert set(plain.headers['allow'].split(', ')) >= {'GET', 'POST', 'OPTIONS'}
+    assert fake_supabase.requests == 0
+
+
+def test_sync_views_get_the_request_body(asgi, supabase_store):
+    note = supabase_store.create_note({'title': 'draft', 'content': 'abc', 'tags': [], 'event_date': None,
+                                       'start_time': None})
+    # PATCH has no coroutine version: it runs in the thread pool
+    assert 'note.patch_note' not in asgi._async_views()
+    body = {'version': note['version'], 'content_ops': [{'pos': 3, 'delete': 0, 'insert': 'def'}]}
+    patched, = _call(asgi, ('PATCH', f"/api/notes/{note['id']}", {'json': body}))
+    assert patched.status_code == 200
+    assert patched.json()['content'] == 'abcdef'
+
+
+def test_sync_views_stream_their_response(asgi, supabase_store):
+    ids = [supabase_store.create_note({'title': f'n{i}', 'content': '', 'tags': [], 'event_date': None,
+                                       'start_time': None})['id'] for i in range(3)]
+    response, = _call(asgi, ('GET', '/api/notes/export', {}))
+    assert response.status_code == 200
+    assert [json.loads(line)['id'] for line in response.text.splitlines()] == ids
+
+
+def test_disconnect_cancels_async_view(asgi, fake_supabase):
+    fake_supabase.latency = 5
+    sent = []
+
+    async def run():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # the client goes away while the view waits on Supabase
+            await asyncio.sleep(0.05)
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/notes/1', 'root_path': '', 'query_string': b'',
+                 'headers': [(b'host', b'test')], 'http_version': '1.1', 'scheme': 'http'}
+        await asgi.app(scope, receive, send)
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - start < 2
+    assert sent == []
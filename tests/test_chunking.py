@@ -0,0 +1,68 @@
+"""Splitting long notes for translation and putting the translations back together."""
+import pytest
+
+from src import llm
+from src.utils.chunking import estimate_tokens, split_for_translation
+
+DOCUMENT = '''# Trip plan
+
+Day one: fly to Osaka. Check in at the hotel near the station. Dinner at the market.
+
+- pack the passport
+- pack the charger
+  (the one with two ports)
+- buy a rail pass
+
+```python
+print("do not translate me")
+```
+
+   Day two: Kyoto temples, then back to Osaka for the night.  
+第三天：去奈良喂鹿。下午回大阪。晚上收拾行李。
+
+'''
+
+
+@pytest.mark.parametrize('max_tokens', [1, 5, 20, 50, 800])
+def test_pieces_rebuild_the_input(max_tokens):
+    pieces = split_for_translation(DOCUMENT, max_tokens)
+    assert ''.join(piece for piece, _ in pieces) == DOCUMENT
+    assert all(piece for piece, _ in pieces)
+    # chunks to translate carry no surrounding whitespace and stay within budget
+    for piece, translate in pieces:
+        if translate:
+            assert piece == piece.strip()
+            assert estimate_tokens(piece) <= max_tokens or len(piece) <= max_tokens
+
+
+def test_code_blocks_are_not_translated():
+    pieces = split_for_translation(DOCUMENT, 20)
+    code = next(piece for piece, _ in pieces if 'print(' in piece)
+    assert ('```python' in code and not dict(pieces)[code])
+    assert all('print(' not in piece for piece, translate in pieces if translate)
+
+
+def test_short_text_is_one_chunk():
+    assert split_for_translation('  Hello world.\n') == [('  ', False), ('Hello world.', True), ('\n', False)]
+    assert split_for_translation('') == []
+
+
+def test_translations_are_reassembled_in_place(monkeypatch):
+    monkeypatch.setattr(llm, 'TRANSLATE_CHUNK_TOKENS', 20)
+    monkeypatch.setattr(llm, '_translate_chunk', lambda text, target: f'<{text.upper()}>')
+    short, document = llm.translate_many(['hi', DOCUMENT], 'English')
+    assert short == '<HI>'
+    expected = ''.join(f'<{piece.upper()}>' if translate else piece
+                       for piece, translate in split_for_translation(DOCUMENT, 20))
+    assert document == expected
+    assert 'print("do not translate me")' in document
+
+
+def test_a_failed_chunk_fails_only_its_text():
+    layouts = [split_for_translation('one. two.', 1), split_for_translation('three', 800)]
+    outputs = [f'T{i}' for i in range(sum(t for layout in layouts for _, t in layout))]
+    error = RuntimeError('model down')
+    outputs[0] = error
+    first, second = llm._reassemble(layouts, outputs)
+    assert first is error
+    assert second == outputs[-1]
@@ -0,0 +1,109 @@
+"""Response compression (src/compression.py) and the JSON provider (src/json_provider.py)."""
+import decimal
+import gzip
+import json
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+
+from src import compression
+from src.json_provider import OrjsonProvider, StdJSONProvider, orjson
+
+# COMPRESS_MIN_BYTES is read when the app is set up: the default 1024 applies
+LONG = 'All work and no play makes Jack a dull boy. ' * 100
+
+
+def _note(client, content):
+    response = client.post('/api/notes', json={'title': 'note', 'content': content, 'tags': 'a'})
+    return response.get_json()
+
+
+def test_large_json_is_gzipped(client):
+    note = _note(client, LONG)
+    plain = client.get(f"/api/notes/{note['id']}", headers={'Accept-Encoding': 'identity'})
+    compressed = client.get(f"/api/notes/{note['id']}", headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert len(compressed.data) < len(plain.data)
+    assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_brotli_is_preferred_when_installed(client):
+    note = _note(client, LONG)
+    response = client.get(f"/api/notes/{note['id']}", headers={'Accept-Encoding': 'gzip, br'})
+    if compression.brotli is None:
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Encoding' not in client.get(f"/api/notes/{note['id']}",
+                                                    headers={'Accept-Encoding': 'br'}).headers
+    else:
+        assert response.headers['Content-Encoding'] == 'br'
+        assert json.loads(compression.brotli.decompress(response.data)) == note
+
+
+def test_small_responses_are_sent_as_is(client):
+    note = _note(client, 'short')
+    response = client.get(f"/api/notes/{note['id']}", headers={'Accept-Encoding': 'gzip, br'})
+    assert response.content_length < 1024
+    assert 'Content-Encoding' not in response.headers
+    # another request's Accept-Encoding may still get a compressed body
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_streamed_export_is_left_alone(client):
+    _note(client, LONG)
+    response = client.get('/api/notes/export', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert json.loads(response.data)['content'] == LONG
+
+
+def test_compressed_etag_is_weak_and_revalidates(client):
+    note = _note(client, LONG)
+    url = f"/api/notes/{note['id']}"
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    strong, weak = plain.headers['ETag'], compressed.headers['ETag']
+    assert not strong.startswith('W/')
+    assert weak == f'W/{strong}'
+    revalidated = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': weak})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+
+PAYLOAD = {
+    'z_first': 'insertion order is kept',
+    'unicode': '笔记 — café 🎉',
+    'escapes': 'quote " backslash \\ newline \n tab \t',
+    'numbers': [0, -1, 2 ** 53, 0.1, 1.5, True, None],
+    'when': datetime(2026, 10, 17, 8, 30, tzinfo=timezone.utc),
+    'day': date(2026, 10, 17),
+    'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'amount': decimal.Decimal('12.50'),
+    'nested': {'tags': ['a', 'b'], 'empty': {}, 'list': []},
+    1: 'non-string key',
+}
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_orjson_matches_the_standard_provider(app):
+    std, fast = StdJSONProvider(app), OrjsonProvider(app)
+    assert json.loads(fast.dumps(PAYLOAD)) == json.loads(std.dumps(PAYLOAD))
+    assert list(json.loads(fast.dumps(PAYLOAD))) == list(json.loads(std.dumps(PAYLOAD)))
+    with app.test_request_context():
+        assert fast.response(PAYLOAD).get_data() == std.response(PAYLOAD).get_data()
+    # beyond orjson's 64-bit integers: falls back to the standard library
+    assert fast.dumps({'big': 2 ** 70}) == std.dumps({'big': 2 ** 70})
+    text = '{"a": [1, 2.5, "x"], "b": null, "c": NaN}'
+    assert repr(fast.loads(text)) == repr(std.loads(text))
+    with pytest.raises(ValueError):
+        fast.loads('{"a": ')
+
+
+def test_api_responses_use_the_configured_provider(app, client):
+    assert isinstance(app.json, OrjsonProvider if orjson is not None else StdJSONProvider)
+    note = _note(client, 'café')
+    body = client.get(f"/api/notes/{note['id']}").data
+    assert 'café'.encode() in body
+    with app.test_request_context():
+        assert body == StdJSONProvider(app).response(note).get_data()
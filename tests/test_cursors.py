@@ -0,0 +1,32 @@
+"""Opaque pagination cursors (src/store/note_store.py)."""
+import pytest
+
+from src.store.note_store import decode_agenda_cursor, decode_cursor, encode_agenda_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    note = {'id': 42, 'updated_at': '2026-10-17T08:30:00.123456', 'title': 'ignored'}
+    cursor = encode_cursor(note)
+    assert decode_cursor(cursor) == ('2026-10-17T08:30:00.123456', 42)
+    # URL-safe, without the base64 padding
+    assert not set(cursor) & set('+/=')
+
+
+def test_agenda_cursor_round_trip():
+    timed = {'id': 7, 'event_date': '2026-10-20', 'start_time': '09:30'}
+    untimed = {'id': 8, 'event_date': '2026-10-20', 'start_time': None}
+    assert decode_agenda_cursor(encode_agenda_cursor(timed)) == ('2026-10-20', '09:30', 7)
+    assert decode_agenda_cursor(encode_agenda_cursor(untimed)) == ('2026-10-20', None, 8)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', 'WzFd', encode_cursor({'id': 'x', 'updated_at': 'y'})])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_cursors_are_not_interchangeable():
+    with pytest.raises(ValueError):
+        decode_agenda_cursor(encode_cursor({'id': 1, 'updated_at': '2026-10-17T00:00:00'}))
+    with pytest.raises(ValueError):
+        decode_cursor(encode_agenda_cursor({'id': 1, 'event_date': '2026-10-20', 'start_time': None}))
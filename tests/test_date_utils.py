@@ -0,0 +1,21 @@
+"""src/utils/date_utils.py against the frozen original implementation (scripts/bench_date_utils.py)."""
+from datetime import date
+
+import bench_date_utils
+from src.utils import date_utils
+
+
+def test_golden_corpus():
+    assert bench_date_utils.check()
+
+
+def test_examples():
+    today = date(2025, 10, 15)  # a Wednesday
+    assert date_utils.normalize_date('tomorrow', today) == '2025-10-16'
+    assert date_utils.normalize_date('next monday', today) == '2025-10-20'
+    assert date_utils.normalize_date('20/10/2025', today) == '2025-10-20'
+    # anything it doesn't understand is passed through as it is
+    assert date_utils.normalize_date('soon', today) == 'soon'
+    assert date_utils.normalize_time('5:30pm') == '17:30'
+    assert date_utils.extract_date_from_text('Badminton tmr 5pm @polyu', today) == '2025-10-16'
+    assert date_utils.extract_time_from_text('Badminton tmr 5pm @polyu') == '17:00'
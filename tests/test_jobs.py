@@ -0,0 +1,144 @@
+"""The SQLite job queue of src/jobs.py: order, deduplication and cancellation."""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src import jobs
+from src.jobs import CANCELLED, DONE, QUEUED, RUNNING, JobQueue, JobWorkers
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_claim_by_priority_then_age(queue):
+    low, _ = queue.enqueue('translate', {'n': 1})
+    high, _ = queue.enqueue('translate', {'n': 2}, priority=5)
+    older, _ = queue.enqueue('translate', {'n': 3}, priority=1)
+    newer, _ = queue.enqueue('translate', {'n': 4}, priority=1)
+    order = []
+    while (claimed := queue.claim()) is not None:
+        order.append(claimed[0]['id'])
+    assert order == [high['id'], older['id'], newer['id'], low['id']]
+    assert queue.get(high['id'])['status'] == RUNNING
+
+
+def test_identical_pending_job_is_reused(queue):
+    job, created = queue.enqueue('translate', {'text': 'hi'}, user_id=1)
+    again, created_again = queue.enqueue('translate', {'text': 'hi'}, priority=3, user_id=1)
+    assert created and not created_again
+    assert again['id'] == job['id']
+    # the more urgent duplicate moved it up
+    assert queue.get(job['id'])['priority'] == 3
+    # another user's identical request is a job of its own
+    assert queue.enqueue('translate', {'text': 'hi'}, user_id=2)[1]
+    queue.claim()
+    queue.finish(job['id'], result={'ok': True})
+    # once finished, the same request runs again
+    assert queue.enqueue('translate', {'text': 'hi'}, user_id=1)[1]
+
+
+def test_unique_index_allows_one_pending_job_per_key(queue):
+    job, _ = queue.enqueue('translate', {'text': 'hi'})
+    row = queue._conn.execute('SELECT * FROM job WHERE id = ?', (job['id'],)).fetchone()
+    insert = ('INSERT INTO job (id, kind, payload, dedupe_key, priority, status, created_at) '
+              'VALUES (?, ?, ?, ?, 0, ?, ?)')
+    with pytest.raises(sqlite3.IntegrityError):
+        queue._conn.execute(insert, ('dup', row['kind'], row['payload'], row['dedupe_key'], QUEUED, time.time()))
+    # finished jobs don't count
+    queue._conn.execute(insert, ('old', row['kind'], row['payload'], row['dedupe_key'], DONE, time.time()))
+
+
+def test_cancel_queued_job(queue):
+    job, _ = queue.enqueue('translate', {'text': 'hi'})
+    cancelled = queue.cancel(job['id'])
+    assert cancelled['status'] == CANCELLED and cancelled['finished_at'] is not None
+    assert queue.claim() is None
+    assert queue.cancel('missing') is None
+
+
+def test_cancel_running_job(queue):
+    job, _ = queue.enqueue('translate', {'text': 'hi'})
+    queue.claim()
+    assert queue.cancel(job['id'])['status'] == RUNNING
+    assert queue.cancel_requested(job['id'])
+    # the identical request no longer joins the job being cancelled
+    assert queue.enqueue('translate', {'text': 'hi'})[1]
+    queue.finish(job['id'], result={'text': 'late'})
+    finished = queue.get(job['id'])
+    assert (finished['status'], finished['result']) == (CANCELLED, None)
+
+
+def test_running_handler_stops_when_cancelled(queue, monkeypatch):
+    started, steps = threading.Event(), []
+
+    def handler(payload):
+        started.set()
+        while True:
+            jobs.check_cancelled()
+            steps.append(1)
+            time.sleep(0.01)
+
+    monkeypatch.setitem(jobs._handlers, 'loop', handler)
+    JobWorkers(queue, 1).start()
+    job, _ = queue.enqueue('loop', {})
+    assert started.wait(5)
+    queue.cancel(job['id'])
+    assert queue.wait(job['id'], 5)['status'] == CANCELLED
+    count = len(steps)
+    time.sleep(0.05)
+    assert len(steps) == count
+    # outside a job the check is a no-op
+    jobs.check_cancelled()
+
+
+def test_cancellation_reaches_llm_threads(queue, monkeypatch):
+    from src.llm import submit
+    seen = []
+
+    def handler(payload):
+        _wait_for(lambda: queue.cancel_requested(job['id']))
+        try:
+            submit(jobs.check_cancelled).result()
+        except jobs.JobCancelled:
+            seen.append('cancelled')
+            raise
+
+    monkeypatch.setitem(jobs._handlers, 'fan_out', handler)
+    JobWorkers(queue, 1).start()
+    job, _ = queue.enqueue('fan_out', {})
+    _wait_for(lambda: queue.get(job['id'])['status'] == RUNNING)
+    queue.cancel(job['id'])
+    assert queue.wait(job['id'], 5)['status'] == CANCELLED
+    assert seen == ['cancelled']
+
+
+def test_generate_job_hangs_up_on_the_model(app, queue, monkeypatch):
+    from src.routes import note
+    closed = threading.Event()
+
+    def stream_user_notes(language, prompt):
+        try:
+            while True:
+                yield '{"Title": "x'
+                time.sleep(0.01)
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(note, 'stream_user_notes', stream_user_notes)
+    JobWorkers(queue, 1).start()
+    job, _ = queue.enqueue('generate', {'prompt': 'plan the week', 'target_language': 'English'})
+    _wait_for(lambda: queue.get(job['id'])['status'] == RUNNING)
+    queue.cancel(job['id'])
+    assert queue.wait(job['id'], 5)['status'] == CANCELLED
+    assert closed.wait(5)
@@ -0,0 +1,106 @@
+"""src/llm_cache.py: the memory and SQLite tiers, and the model calls they answer."""
+from types import SimpleNamespace
+
+import pytest
+
+from src import llm, llm_cache
+from src.llm_cache import LLMCache, SqliteTier, cache_key
+from src.store.cache import LRUCache
+
+MESSAGES = [{'role': 'user', 'content': 'Translate: hello'}]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'llm_cache.db')
+
+
+def test_key_covers_model_messages_and_params():
+    key = cache_key('m', MESSAGES, temperature=1.0)
+    assert key == cache_key('m', [dict(MESSAGES[0])], temperature=1.0)
+    assert len({key, cache_key('other', MESSAGES, temperature=1.0), cache_key('m', MESSAGES, temperature=0.5),
+                cache_key('m', [{'role': 'user', 'content': 'Translate: hi'}], temperature=1.0)}) == 4
+
+
+def test_disk_hit_is_promoted_to_memory(db_path):
+    LLMCache(LRUCache(), SqliteTier(db_path, ttl=60)).set('k', 'bonjour')
+    # a restarted process: empty memory tier over the same file
+    cache = LLMCache(LRUCache(), SqliteTier(db_path, ttl=60))
+    assert cache.get('k') == 'bonjour'
+    assert cache.memory.get('k') == 'bonjour'
+    assert cache.get('k') == 'bonjour'
+    assert cache.get('missing') is None
+    assert cache.stats() == {'memory_hits': 1, 'disk_hits': 1, 'misses': 1, 'hit_rate': 2 / 3,
+                             'memory_entries': 1, 'persistent': True}
+
+
+def test_expired_entries_are_misses(db_path):
+    cache = LLMCache(LRUCache(ttl=0), SqliteTier(db_path, ttl=-1))
+    cache.set('k', 'stale')
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 1
+    cache.disk.purge_expired()
+    assert cache.disk._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] == 0
+
+
+def test_memory_only(monkeypatch):
+    monkeypatch.setenv('LLM_CACHE_PATH', '')
+    cache = LLMCache.from_env()
+    assert cache.disk is None
+    cache.set('k', 'v')
+    assert cache.get('k') == 'v'
+    assert cache.stats()['persistent'] is False
+
+
+def test_from_env_uses_the_configured_file(db_path, monkeypatch):
+    monkeypatch.setenv('LLM_CACHE_PATH', db_path)
+    LLMCache.from_env().set('k', 'v')
+    assert SqliteTier(db_path, ttl=60).get('k') == 'v'
+
+
+class _FakeModel:
+    """Stands in for the OpenAI client: answers every completion with `reply`."""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=self.reply))])
+
+
+@pytest.fixture
+def cached_model(db_path, monkeypatch):
+    monkeypatch.delenv('LLM_CACHE', raising=False)
+    monkeypatch.setattr(llm_cache, '_cache', LLMCache(LRUCache(), SqliteTier(db_path, ttl=60)))
+    model = _FakeModel('{"Title": "x"}')
+    monkeypatch.setattr(llm, 'get_client', lambda: model)
+    return model
+
+
+def test_repeated_call_is_answered_from_the_cache(cached_model):
+    assert llm.call_llm_model('m', MESSAGES) == cached_model.reply
+    assert llm.call_llm_model('m', MESSAGES) == cached_model.reply
+    assert cached_model.calls == 1
+    llm.call_llm_model('m', MESSAGES, temperature=0.2)
+    assert cached_model.calls == 2
+
+
+def test_rejected_completion_is_not_cached(cached_model):
+    cached_model.reply = 'not json'
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            llm.process_user_notes('English', 'lunch')
+    assert cached_model.calls == 2
+
+
+def test_stats_endpoint(client, cached_model, monkeypatch):
+    llm.call_llm_model('m', MESSAGES)
+    llm.call_llm_model('m', MESSAGES)
+    stats = client.get('/api/llm/cache').get_json()
+    assert (stats['memory_hits'], stats['misses'], stats['memory_entries'], stats['persistent']) == (1, 1, 1, True)
+    assert stats['hit_rate'] == 0.5
+    monkeypatch.setenv('LLM_CACHE', '0')
+    assert client.get('/api/llm/cache').get_json() == {'enabled': False}
@@ -0,0 +1,49 @@
+"""Rule-based note generation (src/utils/local_generate.py)."""
+import pytest
+
+from src.utils.date_utils import extract_date_from_text
+from src.utils.local_generate import generate_locally, local_note
+
+
+def test_short_prompt():
+    note, confidence = generate_locally('Badminton tmr 5pm @polyu')
+    assert note == {'title': 'Badminton at Polyu', 'tags': ['badminton', 'sports', 'polyu'],
+                    'date': extract_date_from_text('tomorrow'), 'time': '17:00',
+                    'content': f"Badminton at Polyu on {extract_date_from_text('tomorrow')} at 17:00."}
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize('prompt', ['Dinner with Anna at 7pm', 'Dinner with Anna @ 7pm', 'Dinner with Anna @7pm'])
+def test_connector_goes_with_the_time(prompt):
+    note, _ = generate_locally(prompt)
+    assert note['title'] == 'Dinner With Anna'
+    assert note['content'] == 'Dinner with Anna at 19:00.'
+    assert note['time'] == '19:00'
+    assert 'at' not in note['title'].lower().split()
+
+
+def test_connector_goes_with_the_date():
+    note, _ = generate_locally('lunch on Monday')
+    assert note['title'] == 'Lunch'
+    assert note['content'] == f"Lunch on {extract_date_from_text('monday')}."
+
+
+def test_leftover_words_lower_confidence():
+    _, plain = generate_locally('Dinner at 7pm')
+    _, with_name = generate_locally('Dinner with Anna at 7pm')
+    _, long_prompt = generate_locally('Meeting with Bob about Q3 budget tomorrow')
+    assert plain == 0.9
+    assert with_name < plain
+    assert long_prompt < 0.75
+
+
+def test_model_is_asked_when_unsure(monkeypatch):
+    assert local_note('Meeting with Bob about Q3 budget tomorrow') is None
+    assert local_note('Gym at 6:30am')['time'] == '06:30'
+    monkeypatch.setenv('LOCAL_GENERATE', '0')
+    assert local_note('Gym at 6:30am') is None
+
+
+def test_other_language_needs_the_model():
+    assert generate_locally('Gym at 6:30am', target_language='Chinese') == (None, 0.0)
+    assert generate_locally('   ') == (None, 0.0)
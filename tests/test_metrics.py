@@ -0,0 +1,88 @@
+"""GET /api/metrics: token-protected Prometheus exposition."""
+import re
+
+import pytest
+
+from src.store import note_store
+from src.store.cache import CachedNoteStore
+
+TOKEN = 'scrape-me'
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+@pytest.fixture
+def scrape(client, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', TOKEN)
+    return lambda: client.get('/api/metrics', headers={'Authorization': f'Bearer {TOKEN}'})
+
+
+def _parse(text):
+    """{family: (type, [(sample name, labels, value), ...])}; fails on anything that isn't exposition format."""
+    families, kinds = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert name not in families, f'{name} declared twice'
+            kinds[name] = kind
+            families[name] = (kind, [])
+            continue
+        match = SAMPLE.match(line)
+        assert match, f'not a sample line: {line!r}'
+        name, labels, value = match.groups()
+        family = next(f for f in (name, re.sub(r'_(bucket|sum|count)$', '', name)) if f in families)
+        families[family][1].append((name, dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels or '')), float(value)))
+    return families
+
+
+def test_metrics_are_off_without_a_token(client, monkeypatch):
+    monkeypatch.delenv('METRICS_TOKEN', raising=False)
+    assert client.get('/api/metrics').status_code == 404
+
+
+@pytest.mark.parametrize('authorization', [None, 'Bearer wrong', f'Basic {TOKEN}', TOKEN])
+def test_metrics_require_the_token(client, monkeypatch, authorization):
+    monkeypatch.setenv('METRICS_TOKEN', TOKEN)
+    headers = {'Authorization': authorization} if authorization else {}
+    response = client.get('/api/metrics', headers=headers)
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'].startswith('Bearer')
+
+
+def test_exposition(client, scrape):
+    # requests are counted once their body has been sent, i.e. on close
+    with client.get('/api/notes') as response:
+        assert response.status_code == 200
+    response = scrape()
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    families = _parse(response.get_data(as_text=True))
+    kind, samples = families['http_requests_total']
+    assert kind == 'counter'
+    assert any(labels == {'method': 'GET', 'route': '/api/notes', 'status': '200'} and value >= 1
+               for _, labels, value in samples)
+    kind, samples = families['http_request_duration_seconds']
+    assert kind == 'histogram'
+    route = {'method': 'GET', 'route': '/api/notes'}
+    buckets = [(labels['le'], value) for name, labels, value in samples
+               if name.endswith('_bucket') and {k: labels[k] for k in route} == route]
+    counts = [value for _, value in buckets]
+    assert counts == sorted(counts) and buckets[-1][0] == '+Inf'
+    count, = [value for name, labels, value in samples if name.endswith('_count') and labels == route]
+    assert counts[-1] == count
+
+
+def test_scrape_reads_cache_stats_without_creating_the_store(scrape, supabase_store, monkeypatch):
+    monkeypatch.setattr(note_store, '_store', None)
+    assert 'note_cache_requests_total' not in _parse(scrape().get_data(as_text=True))
+    assert note_store._store is None
+
+    cache = CachedNoteStore(supabase_store)
+    cache.list_notes()
+    cache.list_notes()
+    monkeypatch.setattr(note_store, '_store', cache)
+    families = _parse(scrape().get_data(as_text=True))
+    assert {labels['result']: value for _, labels, value in families['note_cache_requests_total'][1]} == \
+        {'hit': 1, 'miss': 1}
+    assert families['note_cache_hit_ratio'][1][0][2] == 0.5
@@ -0,0 +1,50 @@
+"""CachedNoteStore: every write retires the writer's cached entries."""
+import threading
+
+from src.current_user import as_user
+from src.store.cache import CachedNoteStore
+
+
+def _fields(title):
+    return {'title': title, 'content': '', 'tags': [], 'event_date': None, 'start_time': None}
+
+
+def test_reads_after_a_write_are_fresh(supabase_store):
+    cache = CachedNoteStore(supabase_store)
+    note = cache.create_note(_fields('before'))
+    assert cache.get_note(note['id'])['title'] == 'before'
+    cache.update_note(note['id'], {'title': 'after'})
+    assert cache.get_note(note['id'])['title'] == 'after'
+    assert [n['title'] for n in cache.list_notes()] == ['after']
+
+
+def test_generations_are_bounded_without_going_back(supabase_store):
+    cache = CachedNoteStore(supabase_store, max_users=1)
+    with as_user(1):
+        note = supabase_store.create_note(_fields('before'))
+        # cached before user 1 ever wrote through the cache
+        assert cache.get_note(note['id'])['title'] == 'before'
+        cache.update_note(note['id'], {'title': 'after'})
+    with as_user(2):
+        cache.create_note(_fields('other'))
+    # user 1's generation made room for user 2's; the entry cached before their write stays unreachable
+    assert cache._generations.stats()['size'] == 1
+    with as_user(1):
+        assert cache.get_note(note['id'])['title'] == 'after'
+
+
+def test_concurrent_writes_get_distinct_generations(supabase_store):
+    cache = CachedNoteStore(supabase_store, max_users=4)
+
+    def invalidate(user_id):
+        with as_user(user_id):
+            for _ in range(200):
+                cache._invalidate()
+
+    threads = [threading.Thread(target=invalidate, args=(user_id,)) for user_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache._last_generation == 1600
+    assert cache._generations.stats()['size'] == 4
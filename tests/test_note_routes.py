@@ -0,0 +1,242 @@
+"""The note endpoints of src/routes/note.py, through the Flask test client."""
+import json
+from datetime import timedelta
+
+import pytest
+
+from src.store import note_store, write_buffer
+from src.store.note_store import decode_cursor, get_note_store
+
+
+def _create(client, title='draft', **fields):
+    response = client.post('/api/notes', json=dict({'title': title, 'content': 'abc', 'tags': ''}, **fields))
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_patch_with_stale_version_returns_server_note(client, sql_store):
+    note = _create(client)
+    current = sql_store.update_note(note['id'], {'title': 'theirs'})
+    response = client.patch(f"/api/notes/{note['id']}", json={'version': note['version'], 'title': 'mine'})
+    assert response.status_code == 409
+    assert response.get_json()['note'] == current
+    assert sql_store.get_note(note['id']) == current
+
+
+def test_patch_after_lost_buffered_edit_conflicts(app, client, sql_store, monkeypatch):
+    # a long window: the test flushes by hand
+    buffer = write_buffer.WriteBehindBuffer(get_note_store(), window=60, app=app)
+    monkeypatch.setattr(write_buffer, '_buffer', buffer)
+    note = _create(client)
+    patched = client.patch(f"/api/notes/{note['id']}", json={'version': note['version'], 'title': 'mine'}).get_json()
+    assert patched['title'] == 'mine'
+    # another worker writes the note before the buffered edit is flushed
+    sql_store.update_note(note['id'], {'title': 'theirs'})
+    buffer.flush()
+    response = client.patch(f"/api/notes/{note['id']}", json={'version': patched['version'], 'content': 'more'})
+    assert response.status_code == 409
+    assert response.get_json()['note']['title'] == 'theirs'
+    # reported once: the client reloads and goes on from the server's version
+    retry = client.patch(f"/api/notes/{note['id']}", json={'version': patched['version'], 'content': 'more'})
+    assert retry.status_code == 200 and retry.get_json()['content'] == 'more'
+    buffer.flush()
+    stored = sql_store.get_note(note['id'])
+    assert (stored['title'], stored['content'], stored['version']) == ('theirs', 'more', retry.get_json()['version'])
+
+
+@pytest.mark.parametrize('body', [
+    {'version': 'one', 'title': 'x'},
+    {'version': None, 'title': 'x'},
+    {'version': 1, 'content_ops': 'abc'},
+    {'version': 1, 'content_ops': [3]},
+    {'version': 1, 'content_ops': [{'pos': 'end', 'insert': 'x'}]},
+    {'version': 1, 'content_ops': [{'pos': 0, 'insert': None}]},
+    {'version': 1, 'content_ops': [{'pos': 10, 'delete': 1}]},
+])
+def test_malformed_patch_is_rejected(client, sql_store, body):
+    note = _create(client)
+    response = client.patch(f"/api/notes/{note['id']}", json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert sql_store.get_note(note['id']) == note
+
+
+@pytest.mark.parametrize('path', ['/api/notes', '/api/notes?limit=1', '/api/notes/{id}'])
+def test_unchanged_notes_revalidate_with_304(client, path):
+    note = _create(client)
+    url = path.format(id=note['id'])
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+@pytest.mark.parametrize('path', ['/api/notes', '/api/notes/{id}'])
+def test_write_changes_etag(client, path):
+    note = _create(client)
+    url = path.format(id=note['id'])
+    etag = client.get(url).headers['ETag']
+    assert client.put(f"/api/notes/{note['id']}", json={'title': 'renamed'}).status_code == 200
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'renamed' in response.get_data(as_text=True)
+
+
+def _changes(client, since=None, **params):
+    if since:
+        params['since'] = since
+    response = client.get('/api/notes/changes', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_changes_arrive_in_order_with_tombstones(client):
+    kept, gone = _create(client, 'kept'), _create(client, 'gone')
+    client.put(f"/api/notes/{kept['id']}", json={'title': 'kept, renamed'})
+    assert client.delete(f"/api/notes/{gone['id']}").status_code == 204
+    feed = _changes(client)
+    assert [c['id'] for c in feed['changes']] == [kept['id'], gone['id']]
+    assert feed['changes'][0]['title'] == 'kept, renamed'
+    assert feed['changes'][1] == {'id': gone['id'], 'updated_at': feed['changes'][1]['updated_at'], 'deleted': True}
+    assert feed['has_more'] is False
+    # paging through one change at a time gives the same feed
+    pages, since = [], None
+    while True:
+        page = _changes(client, since, limit=1)
+        pages.extend(page['changes'])
+        since = page['cursor']
+        if not page['has_more']:
+            break
+    assert pages == feed['changes']
+
+
+def test_recent_changes_are_sent_again(client):
+    first = _create(client, 'first')
+    feed = _changes(client)
+    assert [c['id'] for c in feed['changes']] == [first['id']]
+    # within SYNC_SAFETY_LAG of now: the cursor stays behind, the next poll repeats the change
+    again = _changes(client, feed['cursor'])
+    assert [c['id'] for c in again['changes']] == [first['id']]
+    assert decode_cursor(again['cursor']) < (first['updated_at'], first['id'])
+    second = _create(client, 'second')
+    assert [c['id'] for c in _changes(client, again['cursor'])['changes']] == [first['id'], second['id']]
+
+
+def test_settled_changes_move_the_cursor(client, monkeypatch):
+    monkeypatch.setattr(note_store, 'SYNC_SAFETY_LAG', timedelta(0))
+    first = _create(client, 'first')
+    feed = _changes(client)
+    assert [c['id'] for c in feed['changes']] == [first['id']]
+    assert _changes(client, feed['cursor'])['changes'] == []
+    second = _create(client, 'second')
+    assert [c['id'] for c in _changes(client, feed['cursor'])['changes']] == [second['id']]
+
+
+def test_malformed_since_is_rejected(client):
+    assert client.get('/api/notes/changes?since=nope').status_code == 400
+
+
+def test_batch_reports_each_operation(client, sql_store):
+    target, doomed = _create(client, 'target'), _create(client, 'doomed')
+    response = client.post('/api/notes/batch', json={'operations': [
+        {'op': 'create', 'note': {'title': 'new', 'content': '', 'tags': 'a,b'}},
+        {'op': 'update', 'id': target['id'], 'note': {'title': 'retitled'}},
+        {'op': 'delete', 'id': doomed['id']},
+        {'op': 'update', 'id': 12345, 'note': {'title': 'missing'}},
+    ]})
+    assert response.status_code == 200
+    created, updated, deleted, missing = response.get_json()['results']
+    assert created['status'] == 201 and created['note']['tags'] == ['a', 'b']
+    assert sql_store.get_note(created['note']['id']) == created['note']
+    assert updated['status'] == 200 and updated['note']['title'] == 'retitled'
+    assert updated['note']['version'] == target['version'] + 1
+    assert deleted == {'status': 204}
+    assert missing == {'status': 404, 'error': 'Note not found'}
+    assert {'id': doomed['id'], 'deleted': True}.items() <= \
+        next(c for c in _changes(client)['changes'] if c['id'] == doomed['id']).items()
+
+
+def test_batch_reports_invalid_operations_at_their_index(client, sql_store):
+    note = _create(client)
+    response = client.post('/api/notes/batch', json=[
+        {'op': 'create', 'note': {'title': 'fine', 'content': ''}},
+        {'op': 'update', 'note': {'title': 'which one?'}},
+        {'op': 'create', 'note': {'title': 'no content'}},
+        'not an object',
+        {'op': 'rename', 'id': note['id']},
+        {'op': 'update', 'id': note['id'], 'note': {'event_date': 'someday'}},
+        {'op': 'update', 'id': note['id'], 'note': {'title': 'renamed'}},
+    ])
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['status'] for r in results] == [201, 400, 400, 400, 400, 400, 200]
+    assert results[1]['error'] == "Missing field: 'id'"
+    assert results[4]['error'] == 'Unknown op: rename'
+    # the valid operations around them were applied
+    assert sql_store.get_note(note['id'])['title'] == 'renamed'
+    assert sorted(n['title'] for n in sql_store.list_notes()) == ['fine', 'renamed']
+
+
+@pytest.mark.parametrize('body', [None, [], {'operations': {}}, {'operations': [{}] * 501}])
+def test_batch_rejects_malformed_bodies(client, body):
+    assert client.post('/api/notes/batch', json=body).status_code == 400
+
+
+def _content(note):
+    return {k: note[k] for k in ('title', 'content', 'tags', 'event_date', 'start_time')}
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_export_import_round_trip(client, sql_store, compressed):
+    _create(client, 'plain')
+    _create(client, 'dated', content='line one\nline "two"', tags='work,Home', event_date='2026-11-02',
+            start_time='07:45')
+    _create(client, 'unicode 笔记', content='emoji 🎉')
+    exported = client.get('/api/notes/export', query_string={'gzip': '1'} if compressed else {})
+    assert exported.status_code == 200
+    assert exported.mimetype == ('application/gzip' if compressed else 'application/x-ndjson')
+    before = sorted((_content(n) for n in sql_store.list_notes()), key=lambda n: n['title'])
+    for note in sql_store.list_notes():
+        sql_store.delete_note(note['id'])
+
+    response = client.post('/api/notes/import', data=exported.data)
+    assert response.status_code == 200
+    assert response.get_json() == {'lines': 3, 'imported': 3, 'failed': 0, 'errors': []}
+    assert sorted((_content(n) for n in sql_store.list_notes()), key=lambda n: n['title']) == before
+
+
+IMPORT_BODY = '\n'.join([
+    '{"title": "first", "content": "ok", "event_date": "2026-11-02"}',
+    '{"title": "broken", ',
+    '["not", "an", "object"]',
+    '{"title": "no content"}',
+    '',
+    '{"title": "bad date", "content": "", "event_date": "the day after never"}',
+    '{"title": "last", "content": "ok", "start_time": "5pm"}',
+]) + '\n'
+
+
+def test_import_reports_bad_lines(client, sql_store):
+    response = client.post('/api/notes/import', data=IMPORT_BODY)
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert (summary['lines'], summary['imported'], summary['failed']) == (7, 2, 4)
+    assert [e['line'] for e in summary['errors']] == [2, 3, 4, 6]
+    assert summary['errors'][0]['error'].startswith('Invalid JSON')
+    assert summary['errors'][1]['error'] == 'Each line must be a JSON object'
+    assert summary['errors'][2]['error'] == 'Title and content are required'
+    notes = {n['title']: n for n in sql_store.list_notes()}
+    assert set(notes) == {'first', 'last'}
+    assert notes['last']['start_time'] == '17:00'
+
+
+def test_import_streams_errors_as_events(client):
+    response = client.post('/api/notes/import', data=IMPORT_BODY, headers={'Accept': 'text/event-stream'})
+    assert response.mimetype == 'text/event-stream'
+    events = [(block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+              for block in response.get_data(as_text=True).strip().split('\n\n')]
+    assert [name for name, _ in events] == ['error'] * 4 + ['done']
+    assert [data['line'] for _, data in events[:4]] == [2, 3, 4, 6]
+    assert events[-1][1] == {'lines': 7, 'imported': 2, 'failed': 4}
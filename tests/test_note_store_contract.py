@@ -0,0 +1,201 @@
+"""The NoteStore contract, run against every backend.
+
+Both stores must hand out the same note dicts (see NoteStore): the routes, the
+cache and the search index don't know which one they talk to.
+"""
+import pytest
+
+from src.current_user import as_user
+from src.store.note_store import NOTE_FIELDS, NoteNotFoundError, VersionConflictError, PREVIEW_CHARS
+
+NOTE_KEYS = {f for f in NOTE_FIELDS if f != 'preview'}
+
+
+def _create(store, title='Groceries', **fields):
+    return store.create_note(dict({'title': title, 'content': f'{title} content', 'tags': ['Home'],
+                                   'event_date': None, 'start_time': None}, **fields))
+
+
+def test_create_returns_note_dict(store):
+    note = _create(store, tags=['Work', 'ideas'], event_date='2026-10-20', start_time='09:30')
+    assert set(note) == NOTE_KEYS
+    assert note['tags'] == ['Work', 'ideas']
+    assert note['event_date'] == '2026-10-20'
+    assert note['start_time'] == '09:30'
+    assert note['version'] == 1
+    assert note['created_at'] == note['updated_at']
+    assert store.get_note(note['id']) == note
+
+
+def test_missing_note(store):
+    with pytest.raises(NoteNotFoundError):
+        store.get_note(12345)
+    with pytest.raises(NoteNotFoundError):
+        store.update_note(12345, {'title': 'x'})
+    store.delete_note(12345)
+
+
+def test_update_changes_only_given_fields(store):
+    note = _create(store, start_time='08:00')
+    updated = store.update_note(note['id'], {'title': 'Renamed', 'tags': []})
+    assert updated['title'] == 'Renamed'
+    assert updated['tags'] == []
+    assert updated['content'] == note['content']
+    assert updated['start_time'] == '08:00'
+    assert updated['version'] == note['version'] + 1
+    assert updated['updated_at'] >= note['updated_at']
+    assert store.get_note(note['id']) == updated
+
+
+def test_patch_checks_version(store):
+    note = _create(store)
+    patched = store.patch_note(note['id'], {'content': 'new'}, note['version'])
+    assert patched['content'] == 'new'
+    assert patched['version'] == note['version'] + 1
+    with pytest.raises(VersionConflictError) as conflict:
+        store.patch_note(note['id'], {'content': 'stale'}, note['version'])
+    assert conflict.value.note == patched
+    assert store.patch_note(note['id'], {'title': 'x'}, patched['version'], new_version=10)['version'] == 10
+
+
+def test_delete_leaves_tombstone(store):
+    kept, gone = _create(store, 'kept'), _create(store, 'gone')
+    store.delete_note(gone['id'])
+    with pytest.raises(NoteNotFoundError):
+        store.get_note(gone['id'])
+    assert [n['id'] for n in store.list_notes()] == [kept['id']]
+    changes = store.list_changes()
+    assert changes[0] == kept
+    assert changes[1]['id'] == gone['id'] and changes[1]['deleted'] is True
+    assert set(changes[1]) == {'id', 'updated_at', 'deleted'}
+    after = (changes[0]['updated_at'], changes[0]['id'])
+    assert [c['id'] for c in store.list_changes(after=after)] == [gone['id']]
+
+
+def test_list_pages_with_cursor(store):
+    ids = [_create(store, f'note {i}')['id'] for i in range(5)]
+    everything = store.list_notes()
+    assert [n['id'] for n in everything] == ids[::-1]
+    assert all(set(n) == NOTE_KEYS for n in everything)
+    pages, after = [], None
+    while True:
+        page = store.list_notes(limit=2, after=after)
+        if not page:
+            break
+        pages.extend(page)
+        after = (page[-1]['updated_at'], page[-1]['id'])
+    assert pages == everything
+
+
+def test_list_fields(store):
+    _create(store, content='x' * (PREVIEW_CHARS + 10), tags=['a'])
+    note, = store.list_notes(fields=('updated_at', 'id', 'preview', 'tags'))
+    assert set(note) == {'updated_at', 'id', 'preview', 'tags'}
+    assert note['preview'] == 'x' * PREVIEW_CHARS
+    assert note['tags'] == ['a']
+
+
+def test_tag_filter_and_counts(store):
+    both = _create(store, 'both', tags=['Work', 'urgent'])
+    work = _create(store, 'work', tags=['work'])
+    _create(store, 'none', tags=[])
+    assert [n['id'] for n in store.list_notes(tags=['urgent', 'work'])] == [both['id']]
+    assert [n['id'] for n in store.list_notes(tags=['urgent', 'work'], match_any=True)] == [work['id'], both['id']]
+    tagged, = store.list_notes(tags=['urgent'])
+    assert tagged == both
+    assert store.tag_counts() == [{'tag': 'work', 'count': 2}, {'tag': 'urgent', 'count': 1}]
+
+
+def test_agenda_order_and_cursor(store):
+    late = _create(store, 'late', event_date='2026-10-20', start_time='18:00')
+    untimed = _create(store, 'untimed', event_date='2026-10-20')
+    early = _create(store, 'early', event_date='2026-10-20', start_time='08:15')
+    next_day = _create(store, 'next day', event_date='2026-10-21', start_time='07:00')
+    _create(store, 'undated')
+    agenda = store.list_agenda()
+    assert [n['id'] for n in agenda] == [early['id'], late['id'], untimed['id'], next_day['id']]
+    assert agenda[0] == early
+    assert [n['id'] for n in store.list_agenda(start='2026-10-21')] == [next_day['id']]
+    assert [n['id'] for n in store.list_agenda(end='2026-10-20', limit=1)] == [early['id']]
+    pages, after = [], None
+    while True:
+        page = store.list_agenda(after=after, limit=1)
+        if not page:
+            break
+        pages.extend(page)
+        after = (page[-1]['event_date'], page[-1]['start_time'], page[-1]['id'])
+    assert pages == agenda
+
+
+def test_apply_batch(store):
+    target, doomed = _create(store, 'target', start_time='10:00'), _create(store, 'doomed')
+    created, updated = store.apply_batch(
+        creates=[{'title': 'first', 'content': '', 'tags': ['b'], 'event_date': '2026-11-01', 'start_time': '12:00'},
+                 {'title': 'second', 'content': '', 'tags': [], 'event_date': None, 'start_time': None}],
+        updates=[(target['id'], {'title': 'retitled', 'tags': ['c']}), (12345, {'title': 'missing'})],
+        deletes=[doomed['id']])
+    assert [n['title'] for n in created] == ['first', 'second']
+    assert all(set(n) == NOTE_KEYS for n in created)
+    assert created[0]['tags'] == ['b'] and created[0]['start_time'] == '12:00'
+    assert store.get_note(created[0]['id']) == created[0]
+    assert list(updated) == [target['id']]
+    note = updated[target['id']]
+    assert set(note) == NOTE_KEYS
+    assert (note['title'], note['tags'], note['content'], note['start_time']) == \
+        ('retitled', ['c'], target['content'], '10:00')
+    assert note['version'] == target['version'] + 1
+    assert store.get_note(target['id']) == note
+    with pytest.raises(NoteNotFoundError):
+        store.get_note(doomed['id'])
+
+
+def test_apply_batch_skips_missing_and_deleted_notes(store):
+    live, deleted = _create(store, 'live'), _create(store, 'deleted')
+    store.delete_note(deleted['id'])
+    created, updated = store.apply_batch(updates=[(deleted['id'], {'title': 'back'}), (live['id'], {'content': 'x'})],
+                                         deletes=[12345, deleted['id']])
+    assert created == []
+    assert list(updated) == [live['id']] and updated[live['id']]['content'] == 'x'
+    with pytest.raises(NoteNotFoundError):
+        store.get_note(deleted['id'])
+    assert [n['id'] for n in store.list_notes()] == [live['id']]
+    assert store.apply_batch() == ([], {})
+
+
+def test_iter_notes(store):
+    ids = [_create(store, f'note {i}')['id'] for i in range(5)]
+    store.delete_note(ids[2])
+    notes = list(store.iter_notes(batch_size=2))
+    assert [n['id'] for n in notes] == [i for i in ids if i != ids[2]]
+    assert notes[0] == store.get_note(ids[0])
+
+
+def test_search_hits(store):
+    hit = _create(store, 'Quarterly budget', content='numbers for the budget review', start_time='09:00')
+    _create(store, 'Shopping', content='milk and eggs')
+    store.delete_note(_create(store, 'Old budget')['id'])
+    results = store.search_notes('budg')
+    assert [r['id'] for r in results] == [hit['id']]
+    result = results[0]
+    assert set(result) == NOTE_KEYS | {'rank', 'snippet'}
+    assert {k: result[k] for k in NOTE_KEYS} == hit
+    assert '<mark>' in result['snippet']
+    assert store.search_notes('  ') == []
+
+
+def test_notes_are_scoped_to_their_owner(store):
+    with as_user(1):
+        mine = _create(store, 'mine', tags=['private'])
+        assert [n['id'] for n in store.list_notes()] == [mine['id']]
+    shared = _create(store, 'shared', tags=['private'])
+    assert [n['id'] for n in store.list_notes()] == [shared['id']]
+    with pytest.raises(NoteNotFoundError):
+        store.get_note(mine['id'])
+    store.delete_note(mine['id'])
+    assert store.tag_counts() == [{'tag': 'private', 'count': 1}]
+    assert [n['id'] for n in store.search_notes('mine')] == []
+    with as_user(2):
+        assert store.list_notes() == []
+        assert store.list_changes() == []
+    with as_user(1):
+        assert store.get_note(mine['id']) == mine
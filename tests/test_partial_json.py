@@ -0,0 +1,52 @@
+"""Reading a streamed JSON object field by field (src/utils/partial_json.py)."""
+import json
+
+from src.utils.partial_json import PartialObjectReader
+
+
+def _feed_all(text, step):
+    reader, completed = PartialObjectReader(), []
+    for i in range(0, len(text), step):
+        completed.extend(reader.feed(text[i:i + step]))
+    return reader, completed
+
+
+def test_fields_complete_in_order_whatever_the_chunking():
+    note = {'Title': 'Badminton', 'Notes': 'Court 3, bring "rackets" \\ shoes\n', 'Tags': ['sports', '运动'],
+            'Date': '2026-10-18', 'Priority': 12, 'Done': False, 'Meta': {'a': [1, 2]}}
+    text = '```json\n' + json.dumps(note, ensure_ascii=False) + '\n```'
+    for step in (1, 2, 3, 7, len(text)):
+        reader, completed = _feed_all(text, step)
+        assert completed == list(note.items())
+        assert reader.fields == note
+
+
+def test_number_at_the_end_waits_for_more():
+    reader = PartialObjectReader()
+    assert reader.feed('{"Count": 12') == []
+    assert reader.feed('3, ') == [('Count', 123)]
+
+
+def test_partial_string():
+    reader = PartialObjectReader()
+    reader.feed('{"Title": "Hi", "Notes": "first line\\')
+    # the cut-off escape is held back
+    assert reader.partial() == ('Notes', 'first line')
+    reader.feed('nsecond \\u4f')
+    assert reader.partial() == ('Notes', 'first line\nsecond ')
+    reader.feed('60')
+    assert reader.partial() == ('Notes', 'first line\nsecond 你')
+
+
+def test_escaped_backslash_is_kept():
+    reader = PartialObjectReader()
+    reader.feed('{"Notes": "C:\\\\')
+    assert reader.partial() == ('Notes', 'C:\\')
+
+
+def test_no_partial_for_other_values():
+    reader = PartialObjectReader()
+    reader.feed('{"Tags": ["a", "b"')
+    assert reader.partial() is None
+    reader.feed('], ')
+    assert reader.partial() is None
@@ -0,0 +1,76 @@
+"""The in-memory search indexes follow writes made elsewhere and stay bounded."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.current_user import as_user
+from src.search import service
+from src.store.note_store import get_note_store, set_note_store
+
+
+@pytest.fixture
+def indexes(supabase_store, tmp_path, monkeypatch):
+    monkeypatch.setenv('SEARCH_INDEX_PATH', str(tmp_path / 'search_index.pkl'))
+    monkeypatch.setattr(service, '_indexes', service.OrderedDict())
+    monkeypatch.setattr(service, '_dirty', {})
+    # read the change feed on every search unless a test says otherwise
+    monkeypatch.setattr(service, 'CATCH_UP_INTERVAL', 0)
+    previous = get_note_store()
+    set_note_store(supabase_store)
+    yield supabase_store
+    set_note_store(previous)
+
+
+def _create(store, title):
+    return store.create_note({'title': title, 'content': '', 'tags': [], 'event_date': None, 'start_time': None})
+
+
+def test_search_catches_up_with_other_writers(indexes):
+    store = indexes
+    first = _create(store, 'alpha budget')
+    assert [hit['id'] for hit in service.search('budget')] == [first['id']]
+    # written and deleted through another worker: this process' handlers never saw them
+    second = _create(store, 'beta budget')
+    assert {hit['id'] for hit in service.search('budget')} == {first['id'], second['id']}
+    store.delete_note(first['id'])
+    store.update_note(second['id'], {'title': 'beta plan'})
+    assert service.search('budget') == []
+    assert [hit['id'] for hit in service.search('plan')] == [second['id']]
+
+
+def test_feed_is_read_at_most_once_per_interval(indexes, fake_supabase, monkeypatch):
+    monkeypatch.setattr(service, 'CATCH_UP_INTERVAL', 60)
+    first = _create(indexes, 'alpha budget')
+    assert [hit['id'] for hit in service.search('budget')] == [first['id']]
+    second = _create(indexes, 'beta budget')
+    requests = fake_supabase.requests
+    assert [hit['id'] for hit in service.search('budget')] == [first['id']]
+    assert fake_supabase.requests == requests
+    monkeypatch.setattr(service, 'CATCH_UP_INTERVAL', 0)
+    assert {hit['id'] for hit in service.search('budget')} == {first['id'], second['id']}
+
+
+def test_cursor_stays_behind_late_commits(indexes, fake_supabase):
+    first = _create(indexes, 'alpha budget')
+    service.search('budget')
+    entry = service._indexes[None]
+    assert entry.cursor is None or entry.cursor < (first['updated_at'], first['id'])
+    # stamped before the note already read, committed after the search read the feed
+    late = _create(indexes, 'late budget')
+    stamped = datetime.fromisoformat(first['updated_at']) - timedelta(milliseconds=1)
+    fake_supabase.tables['note'][late['id']]['updated_at'] = stamped.isoformat()
+    assert {hit['id'] for hit in service.search('budget')} == {first['id'], late['id']}
+
+
+def test_indexes_are_bounded(indexes, monkeypatch):
+    monkeypatch.setattr(service, 'MAX_USERS', 2)
+    for user_id in (1, 2, 3):
+        with as_user(user_id):
+            note = _create(indexes, f'note of {user_id}')
+            service.search('note')
+            service.index_note(note)
+    assert list(service._indexes) == [2, 3]
+    # the evicted index is loaded again from its snapshot
+    with as_user(1):
+        assert [hit['title'] for hit in service.search('note')] == ['note of 1']
+    assert list(service._indexes) == [3, 1]
@@ -0,0 +1,71 @@
+"""Failed flushes of the write-behind buffer are kept or reported, never dropped silently."""
+import pytest
+
+from src.store.write_buffer import WriteBehindBuffer
+
+
+class _Unavailable(Exception):
+    pass
+
+
+class _FlakyStore:
+    """Wraps a store; patch_note fails while `down` is set."""
+
+    def __init__(self, store):
+        self.store = store
+        self.down = False
+
+    def patch_note(self, *args, **kwargs):
+        if self.down:
+            raise _Unavailable('store unavailable')
+        return self.store.patch_note(*args, **kwargs)
+
+
+@pytest.fixture
+def buffer(supabase_store):
+    # a long window: the tests flush by hand, the background thread never gets there first
+    return WriteBehindBuffer(_FlakyStore(supabase_store), window=60)
+
+
+def _note(store):
+    return store.create_note({'title': 'draft', 'content': '', 'tags': [], 'event_date': None, 'start_time': None})
+
+
+def test_edits_are_merged_into_one_write(buffer, supabase_store):
+    note = _note(supabase_store)
+    first = buffer.submit(note, {'title': 'a'})
+    second = buffer.submit(first, {'content': 'b'})
+    assert buffer.current(note['id']) == second
+    buffer.flush(note['id'])
+    stored = supabase_store.get_note(note['id'])
+    assert (stored['title'], stored['content'], stored['version']) == ('a', 'b', second['version'])
+    assert buffer.current(note['id']) is None
+
+
+def test_lost_edits_are_reported_once(buffer, supabase_store):
+    note = _note(supabase_store)
+    buffered = buffer.submit(note, {'title': 'mine'})
+    # another worker writes the note meanwhile
+    supabase_store.update_note(note['id'], {'title': 'theirs'})
+    buffer.flush()
+    assert supabase_store.get_note(note['id'])['title'] == 'theirs'
+    assert buffer.stats()['lost'] == 1
+    # the other write left the note at the version this client holds: only the record tells
+    assert supabase_store.get_note(note['id'])['version'] == buffered['version']
+    assert buffer.lost_edits(note['id']) is True
+    assert buffer.lost_edits(note['id']) is False
+
+
+def test_failed_write_is_kept_and_retried(buffer, supabase_store):
+    note = _note(supabase_store)
+    first = buffer.submit(note, {'title': 'kept'})
+    buffer.store.down = True
+    with pytest.raises(_Unavailable):
+        buffer.flush(note['id'])
+    assert buffer.current(note['id']) == first
+    second = buffer.submit(first, {'content': 'more'})
+    buffer.store.down = False
+    buffer.flush()
+    stored = supabase_store.get_note(note['id'])
+    assert (stored['title'], stored['content'], stored['version']) == ('kept', 'more', second['version'])
+    assert buffer.stats()['errors'] == 1